@@ -0,0 +1,406 @@
+import argparse
+import asyncio
+import datetime
+import inspect
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# このフォルダのbacpypes3・bacpypesがライブラリ本体より優先して読み込まれないように検索パスから外す
+sys.path = [p for p in sys.path if os.path.abspath(p or os.curdir) != BASE_DIR]
+
+# region 定数宣言
+
+# 室外機ごとの室内機の台数
+INDOOR_UNIT_NUMBERS = (5, 4, 5, 4)
+
+# 読み取りに使う点（DummyDevice）
+DUMMY_DEVICE_ID = 9
+READ_OBJECT = 'analogInput:6'
+WRITE_OBJECT = 'analogValue:1'
+COV_OBJECT = 'analogValue:4'
+
+# 計測に使うDevice ID（bacpypes3とbacpypesで重ならないようにする）
+BACPYPES3_DEVICE_ID = 100
+BACPYPES_DEVICE_ID = 130
+
+# endregion
+
+# region 集計
+
+def summarize(samples:list):
+    """応答時間の一覧を集計する
+
+    Args:
+        samples (list): 応答時間[sec]の一覧
+
+    Returns:
+        dict: 回数, 平均, 最小, p50, p95, p99, 最大[sec]
+    """
+    if len(samples) == 0:
+        return {'count': 0}
+    ordered = sorted(samples)
+
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100.0 * (len(ordered) - 1))))]
+
+    return {
+        'count': len(ordered),
+        'mean': sum(ordered) / len(ordered),
+        'min': ordered[0],
+        'p50': percentile(50),
+        'p95': percentile(95),
+        'p99': percentile(99),
+        'max': ordered[-1],
+    }
+
+def get_poll_calls(comm, zone_number:int, occupant_number:int):
+    """通信ユーティリティの全てのget_*・is_*の呼び出しを列挙する
+
+    引数の名前から室内機・室外機・テナント・ゾーン・執務者のいずれの点かを判断する。
+    基底クラス（日時関連など）のメソッドは含まない。
+
+    Args:
+        comm (object): 通信ユーティリティ
+        zone_number (int): テナントごとのゾーン数
+        occupant_number (int): テナントごとの執務者数
+
+    Returns:
+        list: (メソッド名, 引数のタプル)のリスト
+    """
+    cls = type(comm)
+    tenants = list(cls.Tenant) if hasattr(cls, 'Tenant') else []
+    indoor_units = [(o, i) for o, n in enumerate(INDOOR_UNIT_NUMBERS, start=1) for i in range(1, n + 1)]
+    arguments = {
+        (): [()],
+        ('oUnitIndex',): [(o,) for o in range(1, len(INDOOR_UNIT_NUMBERS) + 1)],
+        ('oUnitIndex', 'iUnitIndex'): indoor_units,
+        ('tenant',): [(t,) for t in tenants],
+        ('tenant', 'zone_number'): [(t, z) for t in tenants for z in range(1, zone_number + 1)],
+        ('tenant', 'occupant_index'): [(t, oc) for t in tenants for oc in range(1, occupant_number + 1)],
+    }
+
+    calls = []
+    for name, fnc in vars(cls).items():
+        if not (name.startswith('get_') or name.startswith('is_')) or not callable(fnc):
+            continue
+        params = tuple(inspect.signature(fnc).parameters)[1:]
+        for args in arguments[params]:
+            calls.append((name, args))
+    return calls
+
+# endregion
+
+# region bacpypes3（asyncio）
+
+def run_bacpypes3(args):
+    """bacpypes3の通信ユーティリティを計測する
+
+    Args:
+        args (argparse.Namespace): コマンドライン引数
+
+    Returns:
+        dict: 計測結果
+    """
+    sys.path.insert(0, os.path.join(BASE_DIR, 'bacpypes3'))
+    return asyncio.run(_run_bacpypes3(args))
+
+async def _run_bacpypes3(args):
+    import BACnetHub
+    import COVSubscriptionManager
+    from bacpypes3.primitivedata import Real
+    from VRFSystemCommunicator import VRFSystemCommunicator
+    from VentilationSystemCommunicator import VentilationSystemCommunicator
+    from OccupantCommunicator import OccupantCommunicator
+    from EnvironmentCommunicator import EnvironmentCommunicator
+
+    hub = BACnetHub.BACnetHub(BACPYPES3_DEVICE_ID, 'benchmark')
+    comms = [cls(BACPYPES3_DEVICE_ID, emulator_ip=args.emulator_ip, time_out_sec=args.time_out, hub=hub) for cls in (VRFSystemCommunicator, VentilationSystemCommunicator, OccupantCommunicator, EnvironmentCommunicator)]
+    pv_rw = comms[0]
+    dummy = args.emulator_ip + ':' + str(0xBAC0 + DUMMY_DEVICE_ID)
+    results = {'library': 'bacpypes3'}
+
+    # 暖機
+    for _ in range(args.warmup):
+        await pv_rw.read_present_value(dummy, READ_OBJECT)
+
+    # 1点の読み取り・書き込み
+    samples = []
+    for _ in range(args.iterations):
+        started = time.perf_counter()
+        val = await pv_rw.read_present_value(dummy, READ_OBJECT)
+        if val[0]: samples.append(time.perf_counter() - started)
+    results['read_latency'] = summarize(samples)
+
+    samples = []
+    for n in range(args.iterations):
+        started = time.perf_counter()
+        val = await pv_rw.write_present_value(dummy, WRITE_OBJECT, Real(n % 100))
+        if val[0]: samples.append(time.perf_counter() - started)
+    results['write_latency'] = summarize(samples)
+
+    # 建物全体の読み取り（逐次・並行）
+    calls = [(comm, name, call_args) for comm in comms for name, call_args in get_poll_calls(comm, args.zones, args.occupants)]
+    started = time.perf_counter()
+    succeeded = 0
+    for comm, name, call_args in calls:
+        val = await getattr(comm, name)(*call_args)
+        if val[0]: succeeded += 1
+    sequential = time.perf_counter() - started
+
+    started = time.perf_counter()
+    vals = await asyncio.gather(*[getattr(comm, name)(*call_args) for comm, name, call_args in calls])
+    concurrent = time.perf_counter() - started
+    results['poll'] = {
+        'points': len(calls),
+        'succeeded': succeeded,
+        'sequential_sec': sequential,
+        'concurrent_sec': concurrent,
+        'concurrent_succeeded': sum(1 for val in vals if val[0]),
+    }
+
+    # COV（書き込みからコールバックまでの時間）
+    cov_manager = COVSubscriptionManager.COVSubscriptionManager(pv_rw, lifetime_sec=3600, issue_confirmed_notifications=False)
+    received = asyncio.Event()
+    received_time = [0.0]
+
+    async def on_changed(addr, obj_id, value):
+        received_time[0] = time.perf_counter()
+        received.set()
+
+    samples = []
+    subscribed = await cov_manager.subscribe(dummy, COV_OBJECT, on_changed)
+    if subscribed[0]:
+        await asyncio.sleep(0.2)
+        for n in range(args.iterations):
+            received.clear()
+            started = time.perf_counter()
+            await pv_rw.write_present_value(dummy, COV_OBJECT, Real(1000 + n))
+            try:
+                await asyncio.wait_for(received.wait(), args.time_out)
+                samples.append(received_time[0] - started)
+            except asyncio.TimeoutError:
+                pass
+        await cov_manager.unsubscribe_all()
+    results['cov_latency'] = summarize(samples)
+    results['cov_notifications'] = cov_manager.stats()
+
+    results['request_statistics'] = pv_rw.stats()['counters']
+    hub.close()
+
+    # 通信ユーティリティ1つあたりのメモリ（専用のHub・共有のHub）
+    results['memory_per_instance_bytes'] = {
+        'own_hub': await _measure_bacpypes3_memory(VRFSystemCommunicator, args, None),
+        'shared_hub': await _measure_bacpypes3_memory(VRFSystemCommunicator, args, BACnetHub.BACnetHub(BACPYPES3_DEVICE_ID + 1, 'benchmark')),
+    }
+    return results
+
+async def _measure_bacpypes3_memory(cls, args, hub):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    comms = [cls(BACPYPES3_DEVICE_ID + 2 + n, emulator_ip=args.emulator_ip, hub=hub) for n in range(args.instances)]
+    for comm in comms: comm.bacdevice # ソケットは最初の要求まで開かれないため、ここで開いておく
+    await asyncio.sleep(0.1)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    if hub is None:
+        for comm in comms: comm.hub.close()
+    else:
+        hub.close()
+    return (after - before) / args.instances
+
+# endregion
+
+# region bacpypes（スレッド・IOCB）
+
+def run_bacpypes(args):
+    """bacpypesの通信ユーティリティを計測する
+
+    bacpypesは1プロセスで1つの通信スレッドを前提とするため、メモリは最初の1インスタンスで計測する。
+
+    Args:
+        args (argparse.Namespace): コマンドライン引数
+
+    Returns:
+        dict: 計測結果
+    """
+    sys.path.insert(0, os.path.join(BASE_DIR, 'bacpypes'))
+    import PresentValueReadWriter
+    from bacpypes.core import deferred
+    from bacpypes.pdu import Address
+    from bacpypes.apdu import SubscribeCOVRequest
+    from bacpypes.iocb import IOCB
+    from bacpypes.primitivedata import Real
+    from VRFSystemCommunicator import VRFSystemCommunicator
+    from VentilationSystemCommunicator import VentilationSystemCommunicator
+    from OccupantCommunicator import OccupantCommunicator
+    from EnvironmentCommunicator import EnvironmentCommunicator
+
+    class CovProbe(PresentValueReadWriter.PresentValueReadWriter):
+        """COV通知を受けた時刻を記録する"""
+
+        def __init__(self, *args, **kwargs):
+            self.received = threading.Event()
+            self.received_time = 0.0
+            super().__init__(*args, **kwargs)
+
+        def do_UnconfirmedCOVNotificationRequest(self, apdu):
+            self.received_time = time.perf_counter()
+            self.received.set()
+
+    results = {'library': 'bacpypes'}
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    vrf = VRFSystemCommunicator(BACPYPES_DEVICE_ID, target_ip=args.emulator_ip, time_out_sec=args.time_out)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    results['memory_per_instance_bytes'] = {'own_hub': after - before}
+
+    comms = [vrf] + [cls(BACPYPES_DEVICE_ID + n, target_ip=args.emulator_ip, time_out_sec=args.time_out) for n, cls in enumerate((VentilationSystemCommunicator, OccupantCommunicator, EnvironmentCommunicator), start=1)]
+    dummy = args.emulator_ip + ':' + str(0xBAC0 + DUMMY_DEVICE_ID)
+
+    # 暖機
+    for _ in range(args.warmup):
+        vrf.read_present_value(dummy, READ_OBJECT, Real)
+
+    # 1点の読み取り・書き込み
+    samples = []
+    for _ in range(args.iterations):
+        started = time.perf_counter()
+        val = vrf.read_present_value(dummy, READ_OBJECT, Real)
+        if val[0]: samples.append(time.perf_counter() - started)
+    results['read_latency'] = summarize(samples)
+
+    samples = []
+    for n in range(args.iterations):
+        started = time.perf_counter()
+        val = vrf.write_present_value(dummy, WRITE_OBJECT, Real(n % 100))
+        if val[0]: samples.append(time.perf_counter() - started)
+    results['write_latency'] = summarize(samples)
+
+    # 建物全体の読み取り（同期処理のAPIのみであるため逐次）
+    calls = [(comm, name, call_args) for comm in comms for name, call_args in get_poll_calls(comm, args.zones, args.occupants)]
+    started = time.perf_counter()
+    succeeded = 0
+    for comm, name, call_args in calls:
+        val = getattr(comm, name)(*call_args)
+        if val[0]: succeeded += 1
+    results['poll'] = {
+        'points': len(calls),
+        'succeeded': succeeded,
+        'sequential_sec': time.perf_counter() - started,
+    }
+
+    # COV（書き込みからコールバックまでの時間）
+    probe = CovProbe(BACPYPES_DEVICE_ID + 10, target_ip=args.emulator_ip, time_out_sec=args.time_out)
+    request = SubscribeCOVRequest(
+        subscriberProcessIdentifier=1,
+        monitoredObjectIdentifier=('analogValue', int(COV_OBJECT.split(':')[1])),
+        issueConfirmedNotifications=False,
+        lifetime=3600,
+    )
+    request.pduDestination = Address(dummy)
+    iocb = IOCB(request)
+    iocb.set_timeout(args.time_out, err=TimeoutError)
+    deferred(probe.request_io, iocb)
+    iocb.wait()
+
+    samples = []
+    if iocb.ioResponse:
+        time.sleep(0.2)
+        for n in range(args.iterations):
+            probe.received.clear()
+            started = time.perf_counter()
+            vrf.write_present_value(dummy, COV_OBJECT, Real(1000 + n))
+            if probe.received.wait(args.time_out):
+                samples.append(probe.received_time - started)
+    results['cov_latency'] = summarize(samples)
+    return results
+
+# endregion
+
+# region 全体の処理
+
+def _start_stand_in(args):
+    """代替エミュレータを別プロセスで起動し、起動を待つ"""
+    process = subprocess.Popen(
+        [sys.executable, '-u', os.path.join(BASE_DIR, 'bacpypes3', 'Shizuku2StandIn.py'), '--ip', args.emulator_ip],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    process.stdout.readline()
+    return process
+
+def _run_target(target, args):
+    """計測対象ごとに別プロセスで計測する（bacpypesとbacpypes3のモジュール名が重なるため）"""
+    command = [sys.executable, os.path.abspath(__file__), '--target', target] + [
+        '--emulator-ip', args.emulator_ip, '--iterations', str(args.iterations), '--warmup', str(args.warmup),
+        '--instances', str(args.instances), '--zones', str(args.zones), '--occupants', str(args.occupants),
+        '--time-out', str(args.time_out)]
+    completed = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    lines = completed.stdout.strip().splitlines()
+    if completed.returncode != 0 or len(lines) == 0:
+        return {'library': target, 'error': 'exit code ' + str(completed.returncode)}
+    return json.loads(lines[-1])
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=BASE_DIR, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description='bacpypes3とbacpypesの通信ユーティリティの応答時間・処理量を計測する')
+    parser.add_argument('--emulator-ip', default='127.0.0.1', help='エミュレータのIP Address')
+    parser.add_argument('--start-stand-in', action='store_true', help='代替エミュレータ（bacpypes3/Shizuku2StandIn.py）を起動して計測する')
+    parser.add_argument('--targets', default='bacpypes3,bacpypes', help='計測対象（カンマ区切り）')
+    parser.add_argument('--target', default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--iterations', type=int, default=200, help='1点の読み取り・書き込み・COVの計測回数')
+    parser.add_argument('--warmup', type=int, default=20, help='計測前の読み取り回数')
+    parser.add_argument('--instances', type=int, default=10, help='メモリの計測に使うインスタンス数（bacpypes3のみ）')
+    parser.add_argument('--zones', type=int, default=9, help='テナントごとのゾーン数')
+    parser.add_argument('--occupants', type=int, default=99, help='テナントごとの執務者数')
+    parser.add_argument('--time-out', type=float, default=1.0, help='タイムアウトまでの時間[sec]')
+    parser.add_argument('--output', default=None, help='結果を書き出すJSONファイル（省略時は標準出力）')
+    args = parser.parse_args()
+
+    # 子プロセス：1つの対象を計測して結果を1行のJSONで出力する
+    if args.target is not None:
+        results = run_bacpypes3(args) if args.target == 'bacpypes3' else run_bacpypes(args)
+        sys.stdout.flush()
+        print(json.dumps(results))
+        sys.stdout.flush()
+        os._exit(0) # bacpypesの通信スレッドを待たずに終了する
+
+    stand_in = _start_stand_in(args) if args.start_stand_in else None
+    try:
+        report = {
+            'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+            'git_commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'config': {k: v for k, v in vars(args).items() if k not in ('target', 'output')},
+            'results': {target: _run_target(target, args) for target in args.targets.split(',')},
+        }
+    finally:
+        if stand_in is not None:
+            stand_in.terminate()
+            stand_in.wait()
+
+    text = json.dumps(report, indent=2)
+    if args.output is None:
+        print(text)
+    else:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+
+if __name__ == "__main__":
+    main()
+
+# endregion
@@ -0,0 +1,98 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PACKAGE_DIR = os.path.join(BASE_DIR, 'bacpypes3')
+
+# region 計測コード（子プロセスで実行する）
+
+# パッケージとして読み込む（ライブラリのbacpypes3と名前が重ならないように別名で読み込む）
+_PACKAGE_IMPORT = '''
+import importlib.util, json, sys, time
+t = time.perf_counter()
+spec = importlib.util.spec_from_file_location('shizuku_bacpypes3', {init!r}, submodule_search_locations=[{dir!r}])
+module = importlib.util.module_from_spec(spec)
+sys.modules[spec.name] = module
+spec.loader.exec_module(module)
+elapsed = time.perf_counter() - t
+print(json.dumps({{'ms': elapsed * 1000, 'eager': sorted(m for m in sys.modules if m == 'bacpypes3' or m.startswith('bacpypes3.'))[:5]}}))
+'''
+
+# スクリプトとして通信ユーティリティを読み込み、インスタンスを作成する（ソケットは開かない）
+_SCRIPT_IMPORT = '''
+import json, sys, time
+sys.path.insert(0, {dir!r})
+t = time.perf_counter()
+import VRFSystemCommunicator
+imported = time.perf_counter()
+comm = VRFSystemCommunicator.VRFSystemCommunicator(id=199)
+constructed = time.perf_counter()
+print(json.dumps({{'ms': (imported - t) * 1000, 'construct_ms': (constructed - imported) * 1000, 'eager': [] if comm.hub._BACnetHub__bacdevice is None else ['NormalApplication']}}))
+'''
+
+# endregion
+
+# region 計測
+
+def measure(code:str, repeat:int):
+    """コードを新しいプロセスで繰り返し実行し、所要時間を集計する
+
+    Args:
+        code (str): 実行するコード（結果を1行のJSONで出力する）
+        repeat (int): 繰り返し回数
+
+    Returns:
+        dict: 所要時間の最小値と中央値[ms], 先読みされたもの
+    """
+    results = []
+    for _ in range(repeat):
+        # このフォルダのbacpypes3がライブラリ本体より優先して読み込まれないようにフォルダの外で実行する
+        out = subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(BASE_DIR), capture_output=True, text=True, check=True)
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    summary = {
+        'min_ms': min(r['ms'] for r in results),
+        'median_ms': statistics.median(r['ms'] for r in results),
+        'eager': results[-1]['eager'],
+    }
+    if 'construct_ms' in results[0]:
+        summary['construct_median_ms'] = statistics.median(r['construct_ms'] for r in results)
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description='bacpypes3の通信ユーティリティの読み込み時間を計測し、上限を超えていないか確認する')
+    parser.add_argument('--repeat', type=int, default=5, help='計測回数')
+    parser.add_argument('--package-budget-ms', type=float, default=50, help='パッケージの読み込み時間の上限[ms]')
+    parser.add_argument('--import-budget-ms', type=float, default=1500, help='通信ユーティリティの読み込み時間の上限[ms]')
+    parser.add_argument('--construct-budget-ms', type=float, default=50, help='通信ユーティリティのインスタンス作成時間の上限[ms]')
+    args = parser.parse_args()
+
+    package = measure(_PACKAGE_IMPORT.format(init=os.path.join(PACKAGE_DIR, '__init__.py'), dir=PACKAGE_DIR), args.repeat)
+    script = measure(_SCRIPT_IMPORT.format(dir=PACKAGE_DIR), args.repeat)
+    print(json.dumps({'package_import': package, 'communicator_import': script}, indent=2))
+
+    # 中央値が上限を超えた場合と、使う前に読み込まれたもの（ソケットを含む）がある場合を失敗とする
+    failures = []
+    if args.package_budget_ms < package['median_ms']:
+        failures.append('package import: {:.1f} ms > {:.1f} ms'.format(package['median_ms'], args.package_budget_ms))
+    if 0 < len(package['eager']):
+        failures.append('package import loaded ' + ', '.join(package['eager']))
+    if args.import_budget_ms < script['median_ms']:
+        failures.append('communicator import: {:.1f} ms > {:.1f} ms'.format(script['median_ms'], args.import_budget_ms))
+    if args.construct_budget_ms < script['construct_median_ms']:
+        failures.append('communicator construction: {:.1f} ms > {:.1f} ms'.format(script['construct_median_ms'], args.construct_budget_ms))
+    if 0 < len(script['eager']):
+        failures.append('communicator construction built ' + ', '.join(script['eager']))
+
+    for failure in failures:
+        print('FAILED: ' + failure, file=sys.stderr)
+    sys.exit(1 if 0 < len(failures) else 0)
+
+if __name__ == "__main__":
+    main()
+
+# endregion
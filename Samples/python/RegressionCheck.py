@@ -0,0 +1,233 @@
+import argparse
+import asyncio
+import datetime
+import os
+import subprocess
+import sys
+import time
+import traceback
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# このフォルダのbacpypes3・bacpypesがライブラリ本体より優先して読み込まれないように検索パスから外し、通信ユーティリティのフォルダを加える
+sys.path = [p for p in sys.path if os.path.abspath(p or os.curdir) != BASE_DIR]
+sys.path.insert(0, os.path.join(BASE_DIR, 'bacpypes3'))
+
+from bacpypes3.primitivedata import Real
+
+from BACnetHub import BACnetHub
+from PresentValueReadWriter import PresentValueReadWriter
+from COVSubscriptionManager import COVSubscriptionManager
+from DateTimeCommunicator import DateTimeCommunicator
+from SimulationClock import ClockSnapshot, _next_cron_time, _to_ns
+
+# region 定数宣言
+
+# 確認に使う点（DummyDevice）
+DUMMY_DEVICE_ID = 9
+WRITE_OBJECT = 'analogValue:1'
+COV_OBJECT = 'analogValue:4'
+
+# 確認に使うDevice ID（Benchmark.pyと重ならないようにする）
+DEVICE_ID = 160
+
+# endregion
+
+# region 確認項目
+
+async def check_cache_invalidation(hub:BACnetHub, args):
+    """キャッシュした値が有効期間中は使われ、破棄や自身の書き込み、COV通知の後には読み直されることを確認する"""
+    dummy = args.emulator_ip + ':' + str(0xBAC0 + DUMMY_DEVICE_ID)
+    pv_rw = PresentValueReadWriter(DEVICE_ID, emulator_ip=args.emulator_ip, hub=hub)
+    other = PresentValueReadWriter(DEVICE_ID, emulator_ip=args.emulator_ip, hub=hub)
+    pv_rw.enable_cache({'analogValue': 3600})
+
+    assert (await pv_rw.write_present_value(dummy, WRITE_OBJECT, Real(10)))[0], 'write failed'
+    assert await pv_rw.read_present_value(dummy, WRITE_OBJECT) == (True, 10), 'value after own write'
+
+    # 他の書き込みはキャッシュに反映されない
+    assert (await other.write_present_value(dummy, WRITE_OBJECT, Real(20)))[0], 'write failed'
+    assert await pv_rw.read_present_value(dummy, WRITE_OBJECT) == (True, 10), 'cached value was not used'
+    assert await pv_rw.read_present_values(dummy, [WRITE_OBJECT], use_cache=False) == [(True, 20)], 'uncached read'
+
+    pv_rw.invalidate_cache(dummy, WRITE_OBJECT)
+    assert (await other.write_present_value(dummy, WRITE_OBJECT, Real(25)))[0], 'write failed'
+    assert await pv_rw.read_present_value(dummy, WRITE_OBJECT) == (True, 25), 'value after invalidate_cache'
+
+    assert (await pv_rw.write_present_value(dummy, WRITE_OBJECT, Real(30)))[0], 'write failed'
+    assert await pv_rw.read_present_value(dummy, WRITE_OBJECT) == (True, 30), 'value after own write'
+
+    # Hubで共有するCOVSubscriptionManagerがCOV通知を受けると、同じHubの通信ユーティリティのキャッシュが破棄される
+    cov_manager = COVSubscriptionManager.shared(hub)
+    assert (await cov_manager.subscribe(dummy, COV_OBJECT))[0], 'subscribe failed'
+    try:
+        assert (await other.write_present_value(dummy, COV_OBJECT, Real(100)))[0], 'write failed'
+        await asyncio.sleep(0.5)
+        assert await pv_rw.read_present_value(dummy, COV_OBJECT) == (True, 100), 'read failed'
+        assert (await other.write_present_value(dummy, COV_OBJECT, Real(200)))[0], 'write failed'
+        await asyncio.sleep(0.5)
+        assert await pv_rw.read_present_value(dummy, COV_OBJECT) == (True, 200), 'cache was not cleared by COV notification'
+    finally:
+        await cov_manager.unsubscribe(dummy, COV_OBJECT)
+
+async def check_clock_snapshot(hub:BACnetHub, args):
+    """シミュレーション日時の計算（加速・一時停止）と、エミュレータとの同期を確認する"""
+    base_sim = datetime.datetime(2026, 8, 1, 9, 0)
+    clock = ClockSnapshot(60.0, base_sim, base_sim, False, 1000, _to_ns(base_sim))
+    assert clock.sim_ns(1000 + 2000000000) == _to_ns(base_sim) + 120000000000, 'accelerated time'
+    assert clock._replace(is_paused=True).sim_ns(1000 + 2000000000) == _to_ns(base_sim), 'paused time'
+
+    base_real = datetime.datetime.today() - datetime.timedelta(seconds=10)
+    clock = ClockSnapshot.create(60.0, base_real, base_sim, False)
+    expected = _to_ns(base_sim + datetime.timedelta(seconds=600))
+    assert abs(clock.anchor_sim_ns - expected) < 1000000000, 'time from base date times'
+    clock = ClockSnapshot.create(60.0, base_real, base_sim, True)
+    assert clock.anchor_sim_ns == _to_ns(base_sim), 'time while paused'
+
+    # 同期した時計とエミュレータの現在日時のずれは1回の往復の間に進む時間程度に収まる
+    dt_comm = DateTimeCommunicator(DEVICE_ID, emulator_ip=args.emulator_ip, hub=hub)
+    assert await dt_comm.clock.sync(), 'sync failed'
+    acc = await dt_comm.get_acceleration_rate()
+    assert acc[0] and dt_comm.clock.snapshot.acc_rate == acc[1], 'acceleration rate'
+    address, objid = dt_comm._date_time_point(DateTimeCommunicator._member.CurrentDateTimeInSimulation)
+    val = (await dt_comm.read_present_values(address, [objid], use_cache=False))[0]
+    assert val[0], 'read of current date time failed'
+    assert abs((dt_comm.current_date_time() - val[1]).total_seconds()) <= max(1.0, acc[1]), 'clock differs from emulator'
+
+async def check_every_cron(hub:BACnetHub, args):
+    """every・cronの予定時刻と、加速度の変化に合わせた待機時間の計算し直しを確認する"""
+    saturday = datetime.datetime(2026, 8, 1, 10, 15)
+    assert _next_cron_time(saturday, [9, 17], [0, 30], 0, None) == datetime.datetime(2026, 8, 1, 17, 0), 'same day'
+    assert _next_cron_time(saturday.replace(hour=17, minute=30), [9, 17], [0, 30], 0, None) == datetime.datetime(2026, 8, 2, 9, 0), 'next day'
+    assert _next_cron_time(saturday, [9], [0], 0, {0}) == datetime.datetime(2026, 8, 3, 9, 0), 'weekday'
+
+    dt_comm = DateTimeCommunicator(DEVICE_ID, emulator_ip=args.emulator_ip, hub=hub)
+    assert await dt_comm.subscribe_date_time_cov(), 'subscribe failed'
+    acc = dt_comm.clock.snapshot.acc_rate
+    try:
+        # 処理が間に合わずに過ぎた時刻は飛ばす
+        period = datetime.timedelta(seconds=0.25 * acc)
+        ticks = []
+        async for tick in dt_comm.clock.every(period):
+            ticks.append(tick)
+            if len(ticks) == 1:
+                await asyncio.sleep(0.6)
+            if len(ticks) == 3:
+                break
+        assert ticks[2] - ticks[1] == period, 'period of every'
+        assert 2 * period < ticks[1] - ticks[0] and (ticks[1] - ticks[0]) % period == datetime.timedelta(0), 'missed ticks were not skipped'
+
+        # 待機中に加速度を10倍にすると残りの待ち時間が1/10になる
+        started = time.perf_counter()
+        sleeping = asyncio.create_task(dt_comm.clock.sleep(datetime.timedelta(seconds=2.0 * acc)))
+        await asyncio.sleep(0.2)
+        assert await dt_comm.change_acceleration_rate(acc * 10), 'change of acceleration rate failed'
+        await asyncio.wait_for(sleeping, 2.0)
+        assert time.perf_counter() - started < 1.0, 'sleep was not rescheduled'
+    finally:
+        await dt_comm.change_acceleration_rate(acc)
+        await dt_comm.aunsubscribe_date_time_cov()
+
+async def check_write_suppression(hub:BACnetHub, args):
+    """最後に書き込んだ値と同じ値の書き込みが抑制されることを確認する"""
+    dummy = args.emulator_ip + ':' + str(0xBAC0 + DUMMY_DEVICE_ID)
+    pv_rw = PresentValueReadWriter(DEVICE_ID, emulator_ip=args.emulator_ip, hub=hub)
+    pv_rw.enable_write_suppression(0)
+
+    for value in (40, 40, 41, 41):
+        assert (await pv_rw.write_present_value(dummy, WRITE_OBJECT, Real(value)))[0], 'write failed'
+    stats = pv_rw.stats()
+    assert (stats['sent_writes'], stats['suppressed_writes']) == (2, 2), 'sent/suppressed: ' + str((stats['sent_writes'], stats['suppressed_writes']))
+
+    pv_rw.clear_write_shadow(dummy, WRITE_OBJECT)
+    assert (await pv_rw.write_present_value(dummy, WRITE_OBJECT, Real(41)))[0], 'write failed'
+    assert pv_rw.stats()['sent_writes'] == 3, 'write after clear_write_shadow was suppressed'
+
+async def check_cov_coalescing(hub:BACnetHub, args):
+    """コールバックの実行中に届いた通知が最新の値にまとめられることを確認する"""
+    dummy = args.emulator_ip + ':' + str(0xBAC0 + DUMMY_DEVICE_ID)
+    pv_rw = PresentValueReadWriter(DEVICE_ID, emulator_ip=args.emulator_ip, hub=hub)
+    cov_manager = COVSubscriptionManager(pv_rw)
+    values = []
+
+    async def on_changed(addr, obj_id, value):
+        values.append(value)
+        await asyncio.sleep(0.3)
+
+    assert (await cov_manager.subscribe(dummy, COV_OBJECT, on_changed))[0], 'subscribe failed'
+    try:
+        await asyncio.sleep(0.5)
+        values.clear()
+        for n in range(20):
+            assert (await pv_rw.write_present_value(dummy, COV_OBJECT, Real(5000 + n)))[0], 'write failed'
+        await asyncio.sleep(1.5)
+
+        stats = cov_manager.stats()
+        assert 0 < len(values) < 20, 'callbacks: ' + str(len(values))
+        assert values[-1] == 5019, 'last value: ' + str(values[-1])
+        assert cov_manager.get_value(dummy, COV_OBJECT) == (True, 5019), 'mirror'
+        assert 0 < stats['coalesced'] and stats['callback_errors'] == 0, str(stats)
+    finally:
+        await cov_manager.unsubscribe_all()
+
+CHECKS = [check_cache_invalidation, check_clock_snapshot, check_every_cron, check_write_suppression, check_cov_coalescing]
+
+# endregion
+
+# region 全体の処理
+
+def _start_stand_in(args):
+    """代替エミュレータを別プロセスで起動し、起動を待つ"""
+    process = subprocess.Popen(
+        [sys.executable, '-u', os.path.join(BASE_DIR, 'bacpypes3', 'Shizuku2StandIn.py'), '--ip', args.emulator_ip],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    process.stdout.readline()
+    return process
+
+async def run_checks(args):
+    """確認項目を順に実行する
+
+    Args:
+        args (argparse.Namespace): コマンドライン引数
+
+    Returns:
+        list: 失敗した確認項目の名前と理由のリスト
+    """
+    hub = BACnetHub(DEVICE_ID, 'regression')
+    failures = []
+    try:
+        for check in CHECKS:
+            started = time.perf_counter()
+            try:
+                await check(hub, args)
+                print('OK     {} ({:.2f} s)'.format(check.__name__, time.perf_counter() - started))
+            except Exception as err:
+                print('FAILED {}: {}'.format(check.__name__, repr(err)))
+                if not isinstance(err, AssertionError):
+                    traceback.print_exc()
+                failures.append((check.__name__, err))
+    finally:
+        hub.close()
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description='代替エミュレータを使ってbacpypes3の通信ユーティリティの動作を確認する')
+    parser.add_argument('--emulator-ip', default='127.0.0.1', help='エミュレータのIP Address')
+    parser.add_argument('--no-stand-in', action='store_true', help='代替エミュレータを起動せず、動作中のエミュレータで確認する')
+    args = parser.parse_args()
+
+    stand_in = None if args.no_stand_in else _start_stand_in(args)
+    try:
+        failures = asyncio.run(run_checks(args))
+    finally:
+        if stand_in is not None:
+            stand_in.terminate()
+            stand_in.wait()
+
+    print('{} of {} checks failed'.format(len(failures), len(CHECKS)))
+    sys.exit(1 if 0 < len(failures) else 0)
+
+if __name__ == "__main__":
+    main()
+
+# endregion
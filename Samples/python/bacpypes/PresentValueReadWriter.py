@@ -1,20 +1,39 @@
 import threading
 import time
 import datetime
+from collections import deque
+from concurrent.futures import Future
 
 from bacpypes.core import run, deferred, stop
 from bacpypes.pdu import Address
-from bacpypes.apdu import ReadPropertyRequest, WritePropertyRequest, SubscribeCOVPropertyRequest
+from bacpypes.apdu import ReadPropertyRequest, WritePropertyRequest, SubscribeCOVRequest, UnconfirmedRequestPDU, SimpleAckPDU, ComplexAckPDU
 from bacpypes.app import BIPSimpleApplication
 from bacpypes.local.device import LocalDeviceObject
 from bacpypes.primitivedata import ObjectIdentifier, Enumerated, Real, Integer, BitString, Boolean, Unsigned
 from bacpypes.object import get_datatype
 from bacpypes.iocb import IOCB
-from bacpypes.basetypes import DateTime, Date, Time, PropertyReference
+from bacpypes.basetypes import DateTime, Date, Time
 from bacpypes.constructeddata import Any
 
 from bacpypes.core import enable_sleeping
 
+# BACnet通信を処理するスレッド（bacpypesのコアはプロセスで1つのため、全インスタンスで共有する）
+_core_thread = None
+_core_lock = threading.Lock()
+
+def _start_core():
+    """BACnet通信を処理するスレッドを起動する（起動済みの場合には何もしない）
+
+    Returns:
+        threading.Thread: BACnet通信を処理するスレッド
+    """
+    global _core_thread
+    with _core_lock:
+        if _core_thread is None or not _core_thread.is_alive():
+            _core_thread = threading.Thread(target = run, daemon=True)
+            _core_thread.start()
+        return _core_thread
+
 class PresentValueReadWriter(BIPSimpleApplication):
     """BACnet通信でPresent valueを読み書きするクラス
     """  
@@ -23,6 +42,15 @@ class PresentValueReadWriter(BIPSimpleApplication):
 
     DATETIMECONTROLLER_EXCLUSIVE_PORT = 0xBAC0 + DATETIMECONTROLLER_DEVICE_ID
 
+    # 通信の準備が整うまでの待機時間の上限[sec]
+    START_TIME_OUT = 5.0
+
+    # 1つの通信先に対して同時に送信する要求数の上限（Invoke IDは0～255）
+    MAX_IN_FLIGHT = 32
+
+    # 確認なしのCOV通知で登録した場合に、通知の取りこぼしを確認する間隔[sec]
+    SEQUENCE_CHECK_SEC = 10.0
+
     def __init__(self, id, name = 'anonymous device', target_ip='127.0.0.1', time_out_sec = 1.0):
         """インスタンスを初期化する
 
@@ -41,11 +69,34 @@ class PresentValueReadWriter(BIPSimpleApplication):
         # DateTimeControllerのIPアドレスを保存
         self.dtc_id = target_ip + ':' + str(self.DATETIMECONTROLLER_EXCLUSIVE_PORT)
 
-        # DateTimeのCOV登録状況
+        # 最後に書き込んだ値（enable_write_suppressionで有効化する）
+        self._write_shadow = None
+        self._write_refresh_interval = 0
+        self._write_shadow_lock = threading.Lock()
+
+        # 抑制した書き込みと送信した書き込みの回数
+        self.suppressed_write_count = 0
+        self.sent_write_count = 0
+
+        # 応答待ちの要求（(アドレス, Invoke ID)をキーとする）と、通信先ごとの応答待ちの数・送信待ちの要求
+        self._in_flight = {}
+        self._in_flight_count = {}
+        self._waiting = {}
+
+        # DateTimeのCOV登録状況と、確認付きの通知を要求したか否か・通知の取りこぼしを見つけた回数
         self.dtcov_scribed = False
-        self.acc_rate = 0
-        self.base_real_datetime = datetime.datetime.today()
-        self.base_sim_datetime = datetime.datetime.today()
+        self.dtcov_confirmed = True
+        self.missed_notification_count = 0
+
+        # 日時の更新を担うスレッド（COV通知が続いた場合には更新中の通知をまとめて1回だけ再更新する）
+        self._date_time_worker = None
+        self._date_time_refresh = threading.Event()
+        self._date_time_lock = threading.Lock()
+
+        # 日時を計算するための加速度・現実時間の基準日時・シミュレーション上の基準日時
+        # （更新中の値を読まないように、3つをまとめたtupleを1回の代入で差し替える）
+        now = datetime.datetime.today()
+        self._date_time = (0, now, now)
             
         this_device = LocalDeviceObject(
             objectName=name,
@@ -55,13 +106,16 @@ class PresentValueReadWriter(BIPSimpleApplication):
             vendorIdentifier=15,
             )
 
-        # 別スレッドでBACnet通信を処理
-        self.core = threading.Thread(target = run, daemon=True)
-        self.core.start()
-
-        # BACnetコントローラを用意
+        # BACnetコントローラを用意（UDPソケットはここで開かれる）
         BIPSimpleApplication.__init__(self, this_device, target_ip + ':' + str(0xBAC0 + id))
-        time.sleep(1) # 起動まで待機が必要のようだ
+
+        # 別スレッドでBACnet通信を処理し、ソケットを含めて処理が回り始めるまで待機
+        # 通信スレッドで実行される関数が呼ばれた時点で、ソケットは受信待ちの対象に含まれている
+        self.core = _start_core()
+        self._ready = threading.Event()
+        deferred(self._ready.set)
+        if not self._ready.wait(self.START_TIME_OUT):
+            raise TimeoutError('BACnet core did not start within ' + str(self.START_TIME_OUT) + ' sec')
 
         # idが0 (47808)以外だとWhoisが効かない。修正必要。
         # self.who_is()
@@ -70,6 +124,66 @@ class PresentValueReadWriter(BIPSimpleApplication):
         # おそらく通信処理の合間に待機する処理が有効になるのだろう
         enable_sleeping()
 
+# region 書き込み抑制関連
+
+    def enable_write_suppression(self, refresh_interval_sec = 60.0):
+        """最後に書き込んだ値と同じ値の書き込みを抑制する
+
+        Args:
+            refresh_interval_sec (float): 同じ値であっても再度書き込むまでの時間[sec]（0以下の場合には再度書き込まない）
+        """
+        with self._write_shadow_lock:
+            self._write_refresh_interval = refresh_interval_sec
+            self._write_shadow = {}
+
+    def disable_write_suppression(self):
+        """書き込みの抑制を無効にする
+        """
+        with self._write_shadow_lock:
+            self._write_shadow = None
+
+    def clear_write_shadow(self, addr = None, obj_id = None):
+        """最後に書き込んだ値の記録を消去し、次回の書き込みを必ず送信させる
+
+        Args:
+            addr (string): 通信先のBACnet Deviceのアドレス（Noneの場合には全て消去する）
+            obj_id (string): 通信先のBACnet DeviceのオブジェクトID（Noneの場合には全て消去する）
+        """
+        with self._write_shadow_lock:
+            if self._write_shadow is None:
+                return
+            if addr is None or obj_id is None:
+                self._write_shadow.clear()
+            else:
+                self._write_shadow.pop((addr, ObjectIdentifier(obj_id).value), None)
+
+    def _check_redundant_write(self, addr, obj_id, value):
+        """書き込みを抑制するか否かを判定し、回数を数える"""
+        with self._write_shadow_lock:
+            if self._write_shadow is not None:
+                entry = self._write_shadow.get((addr, ObjectIdentifier(obj_id).value))
+                if entry is not None:
+                    last_value, written_time = entry
+                    expired = 0 < self._write_refresh_interval <= time.monotonic() - written_time
+                    if not expired and last_value == value:
+                        self.suppressed_write_count += 1
+                        return True
+            self.sent_write_count += 1
+            return False
+
+    def _update_write_shadow(self, addr, obj_id, value, success):
+        with self._write_shadow_lock:
+            if self._write_shadow is None:
+                return
+            # 失敗した場合には機器の状態が不明であるため次回は必ず送信する
+            key = (addr, ObjectIdentifier(obj_id).value)
+            if success:
+                self._write_shadow[key] = (value, time.monotonic())
+            else:
+                self._write_shadow.pop(key, None)
+
+# endregion
+
 # region readproperty関連
 
     def read_present_value(self, addr, obj_id, data_type):
@@ -87,13 +201,15 @@ class PresentValueReadWriter(BIPSimpleApplication):
         request = self._make_request(addr, obj_id, True)
 
         iocb = IOCB(request)
-        #iocb_id_send=iocb.ioID % 256 #結果の誤配信を回避するためIDを一時保存
         iocb.set_timeout(self.time_out, err=TimeoutError)
         deferred(self.request_io, iocb)
 
         # 通信完了まで待機
         iocb.wait()
 
+        return self._read_result(iocb, data_type)
+
+    def _read_result(self, iocb, data_type):
         # 通信失敗
         if iocb.ioError:
             return False, str(iocb.ioError)
@@ -102,13 +218,7 @@ class PresentValueReadWriter(BIPSimpleApplication):
         elif iocb.ioResponse:
             apdu = iocb.ioResponse
 
-            # IDを確認/異なるスレッドのレスポンスが届くことがあるため（参考：https://github.com/JoelBender/bacpypes/issues/333）
-            #iocb_id_responce = apdu.apduInvokeID
-            #if(iocb_id_responce != iocb_id_send):
-            #    time.sleep(0.5)
-            #    return False,'IOCB ID Error'
-
-            # 型変換して出力
+            # 型変換して出力（応答はconfirmationでInvoke IDを照合済み）
             val = apdu.propertyValue.cast_out(data_type)
             if (isinstance(val, DateTime)):
                 return True, datetime.datetime(
@@ -120,6 +230,53 @@ class PresentValueReadWriter(BIPSimpleApplication):
                     second=val.time[2])
             else:
                 return True, val
+
+    def read_present_value_future(self, addr, obj_id, data_type):
+        """Read property requestでPresent valueを読み取る（Futureを返す）
+
+        Args:
+            addr (string): 通信先のBACnet Deviceのアドレス（xxx.xxx.xxx.xxx:port）
+            obj_id (string): 通信先のBACnet DeviceのオブジェクトID
+            data_type (Union[Real,Boolean,Integer,DateTime,str]): データの種別(bacpypes.primitivedata)
+
+        Returns:
+            concurrent.futures.Future: 結果は読み取り成功の真偽, Present value
+        """
+        iocb, future = self._make_read_iocb(addr, obj_id, data_type)
+        deferred(self.request_io, iocb)
+        return future
+
+    def read_many(self, requests):
+        """複数のPresent valueをまとめて送信して読み取る（同期処理）
+
+        全ての要求を一度に送信し、全ての応答を待つ。通信先ごとの同時要求数はMAX_IN_FLIGHTまでに制限される。
+
+        Args:
+            requests (list): (通信先のBACnet Deviceのアドレス, オブジェクトID, データの種別)のリスト
+
+        Returns:
+            list: 要求の順に並べた(読み取り成功の真偽, Present value)のリスト
+        """
+        iocbs, futures = [], []
+        for addr, obj_id, data_type in requests:
+            iocb, future = self._make_read_iocb(addr, obj_id, data_type)
+            iocbs.append(iocb)
+            futures.append(future)
+        deferred(self._request_ios, iocbs)
+        return [future.result() for future in futures]
+
+    def _make_read_iocb(self, addr, obj_id, data_type):
+        iocb = IOCB(self._make_request(addr, obj_id, True))
+        future = Future()
+        iocb.add_callback(lambda iocb: self._set_future_result(future, self._read_result, iocb, data_type))
+        return iocb, future
+
+    def _set_future_result(self, future, result_fnc, *args):
+        # 結果の解釈で例外が発生した場合にもFutureを完了させる（完了しないと結果を待つスレッドが止まり続ける）
+        try:
+            future.set_result(result_fnc(*args))
+        except Exception as err:
+            future.set_exception(err)
         
     def read_present_value_async(self, addr, obj_id, data_type, call_back_fnc):
         """Read property requestでPresent valueを読み取る（非同期処理）
@@ -193,6 +350,10 @@ class PresentValueReadWriter(BIPSimpleApplication):
         Returns:
             bool: 書き込み成功の真偽
         """        
+        # 書き込み抑制が有効で、最後に書き込んだ値と同じであれば送信しない
+        if self._check_redundant_write(addr, obj_id, value):
+            return True, str(value)
+
         request = self._make_request(addr, obj_id, False)
         request.propertyValue.cast_in(value)
 
@@ -203,13 +364,68 @@ class PresentValueReadWriter(BIPSimpleApplication):
         # 通信完了まで待機
         iocb.wait()
 
+        return self._write_result(iocb, addr, obj_id, value)
+
+    def _write_result(self, iocb, addr, obj_id, value):
         # 通信失敗
         if iocb.ioError:
+            self._update_write_shadow(addr, obj_id, value, False)
             return False, str(iocb.ioError)
 
         # 通信成功
         elif iocb.ioResponse:
+            self._update_write_shadow(addr, obj_id, value, True)
             return True, str(value)
+
+    def write_present_value_future(self, addr, obj_id, value):
+        """Write property requestでPresent valueを書き込む（Futureを返す）
+
+        Args:
+            addr (string): 通信先のBACnet Deviceのアドレス（xxx.xxx.xxx.xxx:port）
+            obj_id (string): 通信先のBACnet DeviceのオブジェクトID
+            value (Union[Real,Boolean,Integer,DateTime]): Present value
+
+        Returns:
+            concurrent.futures.Future: 結果は書き込み成功の真偽, 書き込んだ値またはエラー文
+        """
+        iocb, future = self._make_write_iocb(addr, obj_id, value)
+        if iocb is not None:
+            deferred(self.request_io, iocb)
+        return future
+
+    def write_many(self, requests):
+        """複数のPresent valueをまとめて送信して書き込む（同期処理）
+
+        全ての要求を一度に送信し、全ての応答を待つ。通信先ごとの同時要求数はMAX_IN_FLIGHTまでに制限される。
+
+        Args:
+            requests (list): (通信先のBACnet Deviceのアドレス, オブジェクトID, Present value)のリスト
+
+        Returns:
+            list: 要求の順に並べた(書き込み成功の真偽, 書き込んだ値またはエラー文)のリスト
+        """
+        iocbs, futures = [], []
+        for addr, obj_id, value in requests:
+            iocb, future = self._make_write_iocb(addr, obj_id, value)
+            if iocb is not None:
+                iocbs.append(iocb)
+            futures.append(future)
+        deferred(self._request_ios, iocbs)
+        return [future.result() for future in futures]
+
+    def _make_write_iocb(self, addr, obj_id, value):
+        future = Future()
+
+        # 書き込み抑制が有効で、最後に書き込んだ値と同じであれば送信しない
+        if self._check_redundant_write(addr, obj_id, value):
+            future.set_result((True, str(value)))
+            return None, future
+
+        request = self._make_request(addr, obj_id, False)
+        request.propertyValue.cast_in(value)
+        iocb = IOCB(request)
+        iocb.add_callback(lambda iocb: self._set_future_result(future, self._write_result, iocb, addr, obj_id, value))
+        return iocb, future
         
     def write_present_value_async(self, addr, obj_id, value, call_back_fnc):
         """Write property requestでPresent valueを書き込む（非同期処理）
@@ -224,14 +440,22 @@ class PresentValueReadWriter(BIPSimpleApplication):
                 bool:書き込み成功の真偽,
                 str:書き込み失敗時のエラー文
         """        
+        # 書き込み抑制が有効で、最後に書き込んだ値と同じであれば送信しない
+        if self._check_redundant_write(addr, obj_id, value):
+            if(call_back_fnc != None):
+                call_back_fnc(addr, obj_id, True, None)
+            return
+
         request = self._make_request(addr, obj_id, False)        
         request.propertyValue.cast_in(value)
 
         iocb = IOCB(request)
-        iocb.add_callback(self._complete_write_present_value_async, addr, obj_id, call_back_fnc)
+        iocb.add_callback(self._complete_write_present_value_async, addr, obj_id, value, call_back_fnc)
         deferred(self.request_io, iocb)
         
-    def _complete_write_present_value_async(self, iocb, addr, obj_id, call_back_fnc):
+    def _complete_write_present_value_async(self, iocb, addr, obj_id, value, call_back_fnc):
+        self._update_write_shadow(addr, obj_id, value, iocb.ioResponse is not None and not iocb.ioError)
+
         if(call_back_fnc == None) :
             return
         
@@ -247,11 +471,15 @@ class PresentValueReadWriter(BIPSimpleApplication):
 
 # region datetime COV関連
 
-    def subscribe_date_time_cov(self):
+    def subscribe_date_time_cov(self, issue_confirmed_notifications = True):
         """シミュレーション日時の加速度に関するCOVを登録する
 
+        確認なしの通知では、エミュレータが確認応答を待たずに済む代わりに通知が失われ得る。
+        そのため、加速度が変わるたびに更新される現実時間の基準日時を一定間隔で読み取り、
+        手元の値と異なれば通知を取りこぼしたものとして日時を更新し直す。
+
         Args:
-            monitored_ip (str): DateTimeControllerオブジェクトのIPアドレス(xxx.xxx.xxx.xxxの形式)
+            issue_confirmed_notifications (bool): 確認付きのCOV通知を要求するか否か
 
         Returns:
             bool: 登録が成功したか否か
@@ -261,16 +489,16 @@ class PresentValueReadWriter(BIPSimpleApplication):
         if self.dtcov_scribed:
             return self._update_date_time()
                         
-        request = SubscribeCOVPropertyRequest(
+        request = SubscribeCOVRequest(
             subscriberProcessIdentifier=self.id,
             monitoredObjectIdentifier=("analogOutput",2), # 加速度
-            monitoredPropertyIdentifier=PropertyReference(propertyIdentifier='presentValue'),
-            covIncrement=0,
+            issueConfirmedNotifications=issue_confirmed_notifications,
+            lifetime=0, # 無期限
         )
         request.pduDestination = Address(self.dtc_id)
 
         iocb = IOCB(request)
-        # iocb.set_timeout(self.time_out, err=TimeoutError)
+        iocb.set_timeout(self.time_out, err=TimeoutError)
         deferred(self.request_io, iocb)
 
         # 通信完了まで待機
@@ -283,45 +511,182 @@ class PresentValueReadWriter(BIPSimpleApplication):
         # 通信成功
         elif iocb.ioResponse:
             self.dtcov_scribed = True
-            return self._update_date_time()
+            self.dtcov_confirmed = issue_confirmed_notifications
+            success = self._update_date_time()
+
+            # 確認なしの通知では取りこぼしの確認のために更新用のスレッドを動かしておく
+            if not issue_confirmed_notifications:
+                self._start_date_time_worker()
+            return success
 
     def do_ConfirmedCOVNotificationRequest(self, apdu):
-        print('receieve ConfirmedCOVNotificationRequest')
+        self._on_date_time_notification(apdu)
+
+        # 確認応答を返す（返さないとエミュレータが再送する）
+        self.response(SimpleAckPDU(context=apdu))
 
     def do_UnconfirmedCOVNotificationRequest(self, apdu):
+        self._on_date_time_notification(apdu)
+
+    def _on_date_time_notification(self, apdu):
         if(
             apdu.pduSource == self.dtc_id and
             apdu.monitoredObjectIdentifier == ("analogOutput",2) and
             apdu.listOfValues[0].propertyIdentifier == 'presentValue'):
-                # 別スレッドで日時を更新
-                thread = threading.Thread(target=self._update_date_time)
-                thread.start()
+                # 日時の更新を要求（通信スレッドを止めないように更新用のスレッドで処理する）
+                self._request_date_time_update()
 
-    def _update_date_time(self):
-        success = True
-        val = self.read_present_value(self.dtc_id, 'analogOutput:2', Real) #2024.09.19:修正
-        self.acc_rate = val[1] if val[0] else 0
-        # time.sleep(0.1) #これがないとiocbの返り値が別スレッドの値になることがある。本質的な回避策ではないので問題有り
+    def _request_date_time_update(self):
+        """日時の更新を更新用のスレッドに要求する
+
+        更新中に届いた要求は1回の再更新にまとめられる。
+        """
+        self._start_date_time_worker()
+        self._date_time_refresh.set()
+
+    def _start_date_time_worker(self):
+        if self._date_time_worker is None:
+            self._date_time_worker = threading.Thread(target=self._run_date_time_worker, daemon=True)
+            self._date_time_worker.start()
+
+    def _run_date_time_worker(self):
+        while True:
+            # 確認なしの通知の場合には、通知が無くても一定間隔で取りこぼしを確認する
+            if self._date_time_refresh.wait(None if self.dtcov_confirmed else self.SEQUENCE_CHECK_SEC):
+                self._date_time_refresh.clear()
+                self._update_date_time()
+            elif self._is_date_time_notification_missed():
+                self.missed_notification_count += 1
+                self._update_date_time()
+
+    def _is_date_time_notification_missed(self):
+        # 現実時間の基準日時は加速度が変わるたびに更新されるため、手元の値と異なれば通知を取りこぼしている
         val = self.read_present_value(self.dtc_id, 'datetimeValue:3', DateTime)
-        if val[0]:
-            self.base_real_datetime = val[1]
-        else:
-            success = False
-        # time.sleep(0.1) #これがないとiocbの返り値が別スレッドの値になることがある。本質的な回避策ではないので問題有り
-        val = self.read_present_value(self.dtc_id, 'datetimeValue:4', DateTime)
-        if val[0]:
-            self.base_sim_datetime = val[1]
-        else:
-            success = False
-        return success
+        return val[0] and val[1] != self._date_time[1]
+
+    def _update_date_time(self):
+        # 更新用のスレッドとsubscribe_date_time_covからの更新が重ならないようにする
+        with self._date_time_lock:
+            success = True
+            acc_rate, base_real_datetime, base_sim_datetime = self._date_time
+            val = self.read_present_value(self.dtc_id, 'analogOutput:2', Real) #2024.09.19:修正
+            acc_rate = val[1] if val[0] else 0
+            val = self.read_present_value(self.dtc_id, 'datetimeValue:3', DateTime)
+            if val[0]:
+                base_real_datetime = val[1]
+            else:
+                success = False
+            val = self.read_present_value(self.dtc_id, 'datetimeValue:4', DateTime)
+            if val[0]:
+                base_sim_datetime = val[1]
+            else:
+                success = False
+            self._date_time = (acc_rate, base_real_datetime, base_sim_datetime)
+            return success
+
+    @property
+    def acc_rate(self):
+        """加速度[-]
+
+        Returns:
+            float: 加速度[-]
+        """
+        return self._date_time[0]
+
+    @property
+    def base_real_datetime(self):
+        """現実時間の基準日時
+
+        Returns:
+            datetime: 現実時間の基準日時
+        """
+        return self._date_time[1]
+
+    @property
+    def base_sim_datetime(self):
+        """シミュレーション上の基準日時
+
+        Returns:
+            datetime: シミュレーション上の基準日時
+        """
+        return self._date_time[2]
 
     def current_date_time(self):
         """現在の日時を取得する
 
         Returns:
             datetime: 現在の日時
-        """        
-        return (datetime.datetime.today() - self.base_real_datetime) * self.acc_rate + self.base_sim_datetime
+        """
+        acc_rate, base_real_datetime, base_sim_datetime = self._date_time
+        return (datetime.datetime.today() - base_real_datetime) * acc_rate + base_sim_datetime
+
+# endregion
+
+# region 同時要求関連
+
+    def _request_ios(self, iocbs):
+        # 通信スレッドでまとめて要求を処理する
+        for iocb in iocbs:
+            self.request_io(iocb)
+
+    def process_io(self, iocb):
+        # bacpypesの標準の処理は通信先ごとに1件ずつ送信するため、Invoke IDで応答を照合して複数の要求を同時に送信する
+        apdu = iocb.args[0]
+        if isinstance(apdu, UnconfirmedRequestPDU):
+            BIPSimpleApplication.process_io(self, iocb)
+            return
+
+        address = apdu.pduDestination
+        if self._in_flight_count.get(address, 0) < self.MAX_IN_FLIGHT:
+            self._send_io(iocb)
+        else:
+            self._waiting.setdefault(address, deque()).append(iocb)
+
+    def _send_io(self, iocb):
+        apdu = iocb.args[0]
+        self.active_io(iocb)
+
+        # タイムアウトが未設定の要求は送信の時点から計時する
+        if iocb.ioTimeout is None and self.time_out:
+            iocb.set_timeout(self.time_out, err=TimeoutError)
+
+        # 送信するとInvoke IDが割り当てられる
+        self._app_request(apdu)
+        key = (apdu.pduDestination, apdu.apduInvokeID)
+        iocb._in_flight_key = key
+        self._in_flight[key] = iocb
+        self._in_flight_count[apdu.pduDestination] = self._in_flight_count.get(apdu.pduDestination, 0) + 1
+
+    def _release_io(self, iocb):
+        key = getattr(iocb, '_in_flight_key', None)
+        if key is None or self._in_flight.pop(key, None) is None:
+            # 送信待ちのまま中断された要求
+            waiting = self._waiting.get(iocb.args[0].pduDestination)
+            if waiting is not None and iocb in waiting:
+                waiting.remove(iocb)
+            return
+
+        # 空いた枠で送信待ちの要求を送信
+        address = key[0]
+        self._in_flight_count[address] -= 1
+        waiting = self._waiting.get(address)
+        while waiting and self._in_flight_count[address] < self.MAX_IN_FLIGHT:
+            self._send_waiting_io(waiting.popleft())
+        if not waiting:
+            self._waiting.pop(address, None)
+        if self._in_flight_count[address] == 0:
+            del self._in_flight_count[address]
+
+    def _send_waiting_io(self, iocb):
+        try:
+            self._send_io(iocb)
+        except Exception as err:
+            self.abort_io(iocb, err)
+
+    def abort_io(self, iocb, err):
+        # タイムアウトなどで中断された要求の枠を空ける（遅れて届いた応答は破棄される）
+        BIPSimpleApplication.abort_io(self, iocb, err)
+        self._release_io(iocb)
 
 # endregion
 
@@ -337,7 +702,17 @@ class PresentValueReadWriter(BIPSimpleApplication):
         BIPSimpleApplication.response(self, apdu)
 
     def confirmation(self, apdu):
-        BIPSimpleApplication.confirmation(self, apdu)
+        # 応答を送信元とInvoke IDで要求と照合する
+        # タイムアウトした要求への遅れた応答が、同じ通信先への次の要求の結果として扱われないようにする
+        # （参考：https://github.com/JoelBender/bacpypes/issues/333）
+        iocb = self._in_flight.get((apdu.pduSource, apdu.apduInvokeID))
+        if iocb is None:
+            return
+        if isinstance(apdu, (SimpleAckPDU, ComplexAckPDU)):
+            self._release_io(iocb)
+            self.complete_io(iocb, apdu)
+        else:
+            self.abort_io(iocb, apdu)
 
 # endregion
 
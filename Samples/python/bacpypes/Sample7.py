@@ -4,6 +4,9 @@ import VentilationSystemCommunicator as vsc
 def main():
     vsCom = vsc.VentilationSystemCommunicator(26)
 
+    # Skip fan speed commands that have not changed (re-sent every 60 seconds)
+    vsCom.enable_write_suppression(refresh_interval_sec=60.0)
+
     # Enable current_date_time method
     print('Subscribe COV...')
     while not vsCom.subscribe_date_time_cov():
@@ -38,6 +41,7 @@ def main():
                 fs = south_fs if i == 0 or i==1 else north_fs
                 for j in range(i_unit_num[i]):
                     val = vsCom.change_fan_speed(i+1,j+1,fs)
+            print('Writes sent: ' + str(vsCom.sent_write_count) + ', suppressed: ' + str(vsCom.suppressed_write_count))
         time.sleep(1.0)
 
 def get_fan_speed(co2_level):
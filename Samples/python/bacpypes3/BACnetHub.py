@@ -0,0 +1,134 @@
+import asyncio
+import itertools
+import weakref
+
+from bacpypes3.pdu import IPv4Address
+from bacpypes3.ipv4.app import NormalApplication
+from bacpypes3.local.device import DeviceObject
+
+class BACnetHub():
+    """複数の通信ユーティリティで共有するBACnet通信の窓口クラス
+
+    1つのUDPソケット（NormalApplication）と1つのDeviceObjectを持ち、
+    DateTimeCommunicatorやVRFSystemCommunicatorなどの通信ユーティリティから共有される。
+    """
+
+    # region 定数宣言
+
+    # 1つの通信先に対して同時に送信できる要求数の上限（Invoke IDが1バイトであるため）
+    MAX_INVOKE_IDS = 255
+
+    # endregion
+
+    def __init__(self, id:int, name:str='shizukuHub', device_ip:str='127.0.0.1', max_in_flight:int = 32):
+        """インスタンスを初期化する
+
+        Args:
+            id (int): 通信に使うDeviceのID
+            name (str): 通信に使うDeviceの名前
+            device_ip (str): 通信に使うDeviceのIP Address（xxx.xxx.xxx.xxx）
+            max_in_flight (int): 1つの通信先に対して同時に送信する要求数の上限（1～255）
+        """
+
+        # idを保存
+        self.id = id
+        self.name = name
+        self.device_ip = device_ip
+
+        # DeviceObjectとBACnetコントローラは最初に使われる際に用意する（ソケットを開く処理を遅らせる）
+        self.__this_device = None
+        self.__bacdevice = None
+
+        # WritePropertyMultiple・ReadPropertyMultipleを受け付けない通信先のアドレス
+        self.wpm_unsupported = set()
+        self.rpm_unsupported = set()
+
+        # COV登録に使うSubscriber process identifierの払い出し元
+        self.__process_ids = itertools.count(1)
+
+        # 通信先ごとの同時要求数の制限
+        self.max_in_flight = max(1, min(max_in_flight, self.MAX_INVOKE_IDS))
+        self.__windows = {}
+
+        # 応答待ちの読み取り要求（(アドレス, オブジェクトID, プロパティ)をキーとする）
+        self.in_flight_reads = {}
+
+        # キャッシュを有効にした通信ユーティリティ（COV通知を受けた際にまとめてキャッシュを破棄する。破棄されたものは自動で取り除かれる）
+        self.caching_readers = weakref.WeakSet()
+
+        # このHubを使う通信ユーティリティで共有するシミュレーション日時の時計（DateTimeControllerのアドレスをキーとする）と、COVの登録
+        self.clocks = {}
+        self.cov_manager = None
+
+    @property
+    def this_device(self):
+        """通信に使うDeviceObject（最初に参照された際に用意する）
+
+        Returns:
+            DeviceObject: 通信に使うDeviceObject
+        """
+        if self.__this_device is None:
+            self.__this_device = DeviceObject(
+                objectName=self.name,
+                objectIdentifier=self.id,
+                maxApduLengthAccepted=1024,
+                segmentationSupported='segmentedBoth',
+                maxSegmentsAccepted=16,
+                vendorIdentifier=15,
+            )
+        return self.__this_device
+
+    @property
+    def bacdevice(self):
+        """BACnetコントローラ（最初の要求の際に用意し、ソケットを開く）
+
+        Returns:
+            NormalApplication: BACnetコントローラ
+        """
+        if self.__bacdevice is None:
+            ipv4_address = IPv4Address(self.device_ip, int(0xBAC0 + self.id))
+            self.__bacdevice = NormalApplication(self.this_device, ipv4_address)
+        return self.__bacdevice
+
+    def allocate_process_identifier(self):
+        """このHubで重複しないSubscriber process identifierを払い出す
+
+        Returns:
+            int: Subscriber process identifier
+        """
+        return next(self.__process_ids)
+
+    def invalidate_caches(self, address, objid):
+        """このHubを使う全ての通信ユーティリティから、オブジェクトのPresent valueのキャッシュを破棄する
+
+        Args:
+            address (Address): 通信先のBACnet Deviceのアドレス
+            objid (ObjectIdentifier): 通信先のBACnet DeviceのオブジェクトID
+        """
+        for reader in list(self.caching_readers):
+            reader._invalidate(address, objid)
+
+    def get_window(self, address):
+        """通信先ごとの同時要求数を制限するセマフォを取得する
+
+        Args:
+            address (Address): 通信先のBACnet Deviceのアドレス
+
+        Returns:
+            asyncio.Semaphore: 同時要求数を制限するセマフォ
+        """
+        window = self.__windows.get(address)
+        if window is None:
+            window = self.__windows[address] = asyncio.Semaphore(self.max_in_flight)
+        return window
+
+    def close(self):
+        """UDPソケットを閉じる（まだ開いていない場合には何もしない）
+        """
+        if self.__bacdevice is not None:
+            self.__bacdevice.close()
+            self.__bacdevice = None
+
+        # 時計とCOVの登録はソケットとイベントループに結び付いているため、次に使う際に作り直す
+        self.clocks.clear()
+        self.cov_manager = None
@@ -0,0 +1,493 @@
+import asyncio
+from enum import Enum
+from typing import Union
+
+from bacpypes3.pdu import Address
+from bacpypes3.primitivedata import ObjectIdentifier
+from bacpypes3.apdu import ErrorRejectAbortNack, SubscribeCOVRequest
+
+if __package__:
+    from .BACnetHub import BACnetHub
+    from .PresentValueReadWriter import PresentValueReadWriter, RetryPolicy
+else:
+    # スクリプトとして直接読み込まれた場合
+    from BACnetHub import BACnetHub
+    from PresentValueReadWriter import PresentValueReadWriter, RetryPolicy
+
+class SubscriptionHealth(Enum):
+    """COV登録の状態"""
+    SUBSCRIBING = 0
+    """初回の登録中"""
+    HEALTHY = 1
+    """登録済みで、通知が届く状態"""
+    STALE = 2
+    """更新や死活確認に失敗したため、再登録を試みている状態（その間の通知は届かない）"""
+
+class COVSubscriptionManager():
+    """任意のオブジェクトのCOVを登録し、最新のPresent valueを手元に保持するクラス
+
+    COV通知を受けるたびに手元の値（ミラー）を更新し、登録されたコールバックに通知する。
+    ミラーの値はget_valueで通信せずに読み取れる。
+
+    登録は短い有効期間で行い、期限の前に更新する。通知が途絶えた場合にはPresent valueを読み取って死活を確認し、
+    更新や死活確認に失敗した場合（エミュレータの再起動など）には待機時間を延ばしながら再登録を繰り返す。
+    確認なしの通知は失われても検知できないため、確認付きより短い間隔で死活を確認し、取りこぼした変化をミラーに反映する。
+
+    通知が処理より速く届く場合に遅れが積み上がらないように、受信した通知は上限を超えた分を古いものから捨て、
+    コールバックの実行中に届いた値はコールバックごとに最新のものだけを残して、実行が終わった後に1回だけ渡す。
+    """
+
+    @classmethod
+    def shared(cls, hub:BACnetHub, time_out_sec:float = 1.0):
+        """Hubを共有する通信ユーティリティの間で共有するインスタンスを取得する
+
+        インスタンスはHubに保持されるため、Hubを閉じると破棄され、次に取得した際に作り直される。
+
+        Args:
+            hub (BACnetHub): 通信に使うBACnet通信の窓口
+            time_out_sec (float): タイムアウトまでの時間[sec]（そのHubで最初に取得した際のみ使う）
+
+        Returns:
+            COVSubscriptionManager: 共有するインスタンス
+        """
+        if hub.cov_manager is None:
+            # 通信元のキャッシュや書き込み抑制の設定の影響を受けないように専用のPresentValueReadWriterを用意する
+            hub.cov_manager = cls(PresentValueReadWriter(hub.id, time_out_sec=time_out_sec, hub=hub))
+        return hub.cov_manager
+
+    def __init__(self, pv_rw, lifetime_sec:int = 300, issue_confirmed_notifications:bool = True, heartbeat_sec:float = None, resubscribe_policy:RetryPolicy = None, unconfirmed_heartbeat_sec:float = None, max_queued_notifications:int = 16):
+        """インスタンスを初期化する
+
+        Args:
+            pv_rw (PresentValueReadWriter): 通信に使うPresentValueReadWriter
+            lifetime_sec (int): COV登録の有効期間[sec]（有効期間の半分が過ぎた時点で更新する）
+            issue_confirmed_notifications (bool): 確認付きのCOV通知を要求するか否か（subscribeで登録ごとに指定しない場合の既定値）
+            heartbeat_sec (float): 通知が途絶えた際に死活を確認する間隔[sec]。Noneの場合には有効期間の1/5
+            resubscribe_policy (RetryPolicy): 再登録までの待機時間の方針（再登録は成功するまで繰り返す）。Noneの場合には1秒から60秒まで延ばす
+            unconfirmed_heartbeat_sec (float): 確認なしの通知の登録で死活を確認する間隔[sec]。Noneの場合には有効期間の1/20
+            max_queued_notifications (int): 登録ごとに溜めておく未処理の通知の値の上限（超えた場合には古いものから捨てる）
+        """
+        self.pv_rw = pv_rw
+        self.lifetime = lifetime_sec
+        self.issue_confirmed_notifications = issue_confirmed_notifications
+        self.heartbeat = lifetime_sec / 5 if heartbeat_sec is None else heartbeat_sec
+        self.unconfirmed_heartbeat = lifetime_sec / 20 if unconfirmed_heartbeat_sec is None else unconfirmed_heartbeat_sec
+        self.resubscribe_policy = RetryPolicy(base_delay_sec=1.0, max_delay_sec=60.0) if resubscribe_policy is None else resubscribe_policy
+        self.max_queued_notifications = max_queued_notifications
+
+        # 登録の状態が変化した際に呼ばれるコルーチン関数（引数はaddr, obj_id, SubscriptionHealth）
+        self.__health_callbacks = []
+
+        # 再登録の回数と、死活確認で見つかった通知の取りこぼしの回数
+        self.resubscribe_count = 0
+        self.missed_notification_count = 0
+
+        # 受信した通知の数と、上限を超えて捨てた通知・新しい値に置き換えられてコールバックに渡さなかった値の数
+        self.received_notification_count = 0
+        self.dropped_notification_count = 0
+        self.coalesced_notification_count = 0
+
+        # コールバックで発生した例外の数と、最後に発生した例外
+        self.callback_error_count = 0
+        self.last_callback_error = None
+
+        # 登録中のCOV（(アドレス, オブジェクトID)をキーとする）
+        self.__subscriptions = {}
+
+        # 最新のPresent value（(アドレス, オブジェクトID)をキーとする）
+        self.__mirror = {}
+
+        # 実行中のコールバック（ガベージコレクションで破棄されないように保持する）
+        self.__callback_tasks = set()
+
+    # region COV登録
+
+    async def subscribe(self, addr:Union[str,Address], obj_id:Union[str,ObjectIdentifier], callback = None, issue_confirmed_notifications:bool = None):
+        """オブジェクトのCOVを登録する
+
+        既に登録済みの場合にはコールバックだけを追加する（通知の確認の有無は最初の登録のものを使う）。
+
+        Args:
+            addr (Union[str,Address]): 通信先のBACnet Deviceのアドレス（xxx.xxx.xxx.xxx:port）
+            obj_id (Union[str,ObjectIdentifier]): 通信先のBACnet DeviceのオブジェクトID
+            callback (function): Present valueが変化した際に呼ばれるコルーチン関数（引数はaddr, obj_id, Present value）
+            issue_confirmed_notifications (bool): 確認付きのCOV通知を要求するか否か。Noneの場合にはインスタンスの設定値
+
+        Returns:
+            list: 登録成功の真偽, 失敗時のエラー（ErrorRejectAbortNackまたはTimeoutError）
+        """
+        address = self.pv_rw._to_address(addr)
+        objid = self.pv_rw._to_object_identifier(obj_id)
+        key = (address, objid)
+
+        subscription = self.__subscriptions.get(key)
+        if subscription is not None:
+            if callback is not None:
+                subscription.callbacks.append(_Callback(callback))
+            return True, None
+
+        confirmed = self.issue_confirmed_notifications if issue_confirmed_notifications is None else issue_confirmed_notifications
+        subscription = _Subscription(addr, obj_id, address, objid, self.pv_rw.hub.allocate_process_identifier(), confirmed)
+        if callback is not None:
+            subscription.callbacks.append(_Callback(callback))
+        self.__subscriptions[key] = subscription
+
+        started = asyncio.get_running_loop().create_future()
+        subscription.task = asyncio.create_task(self.__run(subscription, started))
+        try:
+            await asyncio.wait_for(asyncio.shield(started), self.pv_rw.time_out)
+        except asyncio.TimeoutError:
+            subscription.task.cancel()
+            del self.__subscriptions[key]
+            return False, TimeoutError('no response from ' + str(address) + ' within ' + str(self.pv_rw.time_out) + ' sec')
+        except (ErrorRejectAbortNack, Exception) as err:
+            subscription.task.cancel()
+            del self.__subscriptions[key]
+            return False, err
+
+        # 最初の通知が届いていなければ現在値を読み取ってミラーを埋める
+        if key not in self.__mirror:
+            val = await self.pv_rw.read_present_value(addr, obj_id)
+            if val[0] and key not in self.__mirror:
+                self.__mirror[key] = val[1]
+
+        return True, None
+
+    async def unsubscribe(self, addr:Union[str,Address], obj_id:Union[str,ObjectIdentifier], callback = None):
+        """オブジェクトのCOVを解除する
+
+        callbackを指定した場合にはそのコールバックだけを取り除き、他のコールバックが残っていなければCOVを解除する
+        （同じインスタンスを共有する他の利用者の登録を解除しないようにする）。
+
+        Args:
+            addr (Union[str,Address]): 通信先のBACnet Deviceのアドレス（xxx.xxx.xxx.xxx:port）
+            obj_id (Union[str,ObjectIdentifier]): 通信先のBACnet DeviceのオブジェクトID
+            callback (function): 取り除くコルーチン関数。Noneの場合には他のコールバックによらず解除する
+
+        Returns:
+            list: 解除成功の真偽, 失敗時のエラー（ErrorRejectAbortNackまたはTimeoutError）
+        """
+        key = (self.pv_rw._to_address(addr), self.pv_rw._to_object_identifier(obj_id))
+        if callback is not None:
+            self.remove_callback(addr, obj_id, callback)
+            subscription = self.__subscriptions.get(key)
+            if subscription is not None and 0 < len(subscription.callbacks):
+                return True, None
+        subscription = self.__subscriptions.pop(key, None)
+        self.__mirror.pop(key, None)
+        if subscription is None:
+            return True, None
+
+        subscription.task.cancel()
+
+        # lifetimeなどを省いたSubscribeCOV要求で登録を取り消す
+        request = SubscribeCOVRequest(
+            subscriberProcessIdentifier=subscription.process_identifier,
+            monitoredObjectIdentifier=subscription.objid,
+            destination=subscription.address
+        )
+        try:
+            await self.pv_rw._request(request)
+            return True, None
+        except (ErrorRejectAbortNack, TimeoutError) as err:
+            return False, err
+
+    async def unsubscribe_all(self):
+        """全てのオブジェクトのCOVを解除する
+        """
+        await asyncio.gather(*[self.unsubscribe(s.addr, s.obj_id) for s in list(self.__subscriptions.values())])
+
+    def add_callback(self, addr:Union[str,Address], obj_id:Union[str,ObjectIdentifier], callback):
+        """登録済みのCOVにコールバックを追加する
+
+        Args:
+            addr (Union[str,Address]): 通信先のBACnet Deviceのアドレス（xxx.xxx.xxx.xxx:port）
+            obj_id (Union[str,ObjectIdentifier]): 通信先のBACnet DeviceのオブジェクトID
+            callback (function): Present valueが変化した際に呼ばれるコルーチン関数（引数はaddr, obj_id, Present value）
+
+        Returns:
+            bool: 追加できたか否か（COVが未登録の場合にはFalse）
+        """
+        subscription = self.__subscriptions.get((self.pv_rw._to_address(addr), self.pv_rw._to_object_identifier(obj_id)))
+        if subscription is None:
+            return False
+        subscription.callbacks.append(_Callback(callback))
+        return True
+
+    def remove_callback(self, addr:Union[str,Address], obj_id:Union[str,ObjectIdentifier], callback):
+        """登録済みのCOVからコールバックを取り除く
+
+        Args:
+            addr (Union[str,Address]): 通信先のBACnet Deviceのアドレス（xxx.xxx.xxx.xxx:port）
+            obj_id (Union[str,ObjectIdentifier]): 通信先のBACnet DeviceのオブジェクトID
+            callback (function): 取り除くコルーチン関数
+        """
+        subscription = self.__subscriptions.get((self.pv_rw._to_address(addr), self.pv_rw._to_object_identifier(obj_id)))
+        if subscription is not None:
+            subscription.callbacks = [c for c in subscription.callbacks if c.function != callback]
+
+    def is_subscribed(self, addr:Union[str,Address], obj_id:Union[str,ObjectIdentifier]):
+        """COVが登録済みか否か
+
+        Args:
+            addr (Union[str,Address]): 通信先のBACnet Deviceのアドレス（xxx.xxx.xxx.xxx:port）
+            obj_id (Union[str,ObjectIdentifier]): 通信先のBACnet DeviceのオブジェクトID
+
+        Returns:
+            bool: COVが登録済みか否か
+        """
+        return (self.pv_rw._to_address(addr), self.pv_rw._to_object_identifier(obj_id)) in self.__subscriptions
+
+    def get_health(self, addr:Union[str,Address], obj_id:Union[str,ObjectIdentifier]):
+        """COV登録の状態を取得する
+
+        Args:
+            addr (Union[str,Address]): 通信先のBACnet Deviceのアドレス（xxx.xxx.xxx.xxx:port）
+            obj_id (Union[str,ObjectIdentifier]): 通信先のBACnet DeviceのオブジェクトID
+
+        Returns:
+            list: 登録の状態（未登録の場合にはNone）, 直近の失敗の原因
+        """
+        subscription = self.__subscriptions.get((self.pv_rw._to_address(addr), self.pv_rw._to_object_identifier(obj_id)))
+        if subscription is None:
+            return None, None
+        return subscription.health, subscription.last_error
+
+    def add_health_callback(self, callback):
+        """COV登録の状態が変化した際に呼ばれるコールバックを追加する
+
+        Args:
+            callback (function): 状態が変化した際に呼ばれるコルーチン関数（引数はaddr, obj_id, SubscriptionHealth）
+        """
+        self.__health_callbacks.append(callback)
+
+    def remove_health_callback(self, callback):
+        """COV登録の状態のコールバックを取り除く
+
+        Args:
+            callback (function): 取り除くコルーチン関数
+        """
+        if callback in self.__health_callbacks:
+            self.__health_callbacks.remove(callback)
+
+    # endregion
+
+    # region ミラーの読み取り
+
+    def get_value(self, addr:Union[str,Address], obj_id:Union[str,ObjectIdentifier]):
+        """手元に保持している最新のPresent valueを取得する（通信しない）
+
+        Args:
+            addr (Union[str,Address]): 通信先のBACnet Deviceのアドレス（xxx.xxx.xxx.xxx:port）
+            obj_id (Union[str,ObjectIdentifier]): 通信先のBACnet DeviceのオブジェクトID
+
+        Returns:
+            list: 値を保持しているか否か, Present value
+        """
+        key = (self.pv_rw._to_address(addr), self.pv_rw._to_object_identifier(obj_id))
+        if key in self.__mirror:
+            return True, self.__mirror[key]
+        return False, None
+
+    def stats(self):
+        """COV通知の統計を取得する
+
+        Returns:
+            dict: 登録数（subscriptions）, 受信した通知（received）・上限を超えて捨てた通知（dropped）・
+                新しい値に置き換えられた値（coalesced）・死活確認で見つかった取りこぼし（missed）の数, 再登録の回数（resubscribed）,
+                コールバックで発生した例外の数（callback_errors）
+        """
+        return {
+            'subscriptions': len(self.__subscriptions),
+            'received': self.received_notification_count,
+            'dropped': self.dropped_notification_count,
+            'coalesced': self.coalesced_notification_count,
+            'missed': self.missed_notification_count,
+            'resubscribed': self.resubscribe_count,
+            'callback_errors': self.callback_error_count,
+        }
+
+    # endregion
+
+    # region COV通知の処理
+
+    async def __run(self, subscription, started):
+        attempt = 0
+        while True:
+            try:
+                async with self.pv_rw.bacdevice.change_of_value(
+                    address=subscription.address,
+                    monitored_object_identifier=subscription.objid,
+                    subscriber_process_identifier=subscription.process_identifier,
+                    issue_confirmed_notifications=subscription.confirmed,
+                    lifetime=self.lifetime
+                ) as scm: #SubscriptionContextManager
+                    # bacpypes3による更新は失敗しても検知できないため、止めて自前で更新する
+                    if scm.refresh_subscription_handle is not None:
+                        scm.refresh_subscription_handle.cancel()
+
+                    if not started.done():
+                        started.set_result(None)
+                    else:
+                        # 再登録までの間に変化した値を反映する
+                        await self.__check_value(subscription)
+                    attempt = 0
+                    self.__set_health(subscription, SubscriptionHealth.HEALTHY, None)
+                    await self.__watch(subscription, scm)
+            except asyncio.CancelledError:
+                raise
+            except (ErrorRejectAbortNack, Exception) as err:
+                if not started.done():
+                    started.set_exception(err)
+                    return
+                self.__set_health(subscription, SubscriptionHealth.STALE, err)
+
+            # 待機時間を延ばしながら再登録を繰り返す
+            await asyncio.sleep(self.resubscribe_policy.get_delay(attempt))
+            attempt += 1
+            self.resubscribe_count += 1
+
+    async def __watch(self, subscription, scm):
+        loop = asyncio.get_running_loop()
+        heartbeat = self.heartbeat if subscription.confirmed else self.unconfirmed_heartbeat
+        renew_at = loop.time() + self.lifetime / 2
+        heartbeat_at = loop.time() + heartbeat
+
+        # 通知の取り出しは途中で取り消すと値を失うため、タイムアウトしても取り消さずに次の待機で引き継ぐ
+        get_task = None
+        try:
+            while True:
+                if get_task is None:
+                    # 未処理の通知が上限を超えた場合には古いものから捨てる（1回の通知にはPresent value以外の値も含まれる）
+                    while self.max_queued_notifications < scm.queue.qsize():
+                        if f"{scm.queue.get_nowait().propertyIdentifier}"=='present-value':
+                            self.dropped_notification_count += 1
+                    get_task = asyncio.create_task(scm.get_value())
+                done, _ = await asyncio.wait([get_task], timeout=max(0, min(renew_at, heartbeat_at) - loop.time()))
+                if get_task in done:
+                    property_identifier, property_value = get_task.result()
+                    get_task = None
+                    if(f"{property_identifier}"=='present-value'):
+                        self.received_notification_count += 1
+                        self.__update(subscription, self.pv_rw._convert_value(property_value))
+                    heartbeat_at = loop.time() + heartbeat
+                    continue
+
+                # 通知が途絶えている場合にはPresent valueを読み取り、通知を取りこぼしていれば登録を更新する
+                if heartbeat_at <= loop.time():
+                    if not await self.__check_value(subscription):
+                        renew_at = loop.time()
+                    heartbeat_at = loop.time() + heartbeat
+
+                # 期限の前に登録を更新する（エミュレータが再起動していても登録し直される）
+                if renew_at <= loop.time():
+                    await self.pv_rw._request(SubscribeCOVRequest(
+                        subscriberProcessIdentifier=subscription.process_identifier,
+                        monitoredObjectIdentifier=subscription.objid,
+                        issueConfirmedNotifications=subscription.confirmed,
+                        lifetime=self.lifetime,
+                        destination=subscription.address
+                    ))
+                    renew_at = loop.time() + self.lifetime / 2
+        finally:
+            if get_task is not None:
+                get_task.cancel()
+
+    async def __check_value(self, subscription):
+        # Present valueを読み取ってミラーと比べ、一致しなければミラーを更新してFalseを返す（読み取りに失敗した場合には例外を送出する）
+        success, value = (await self.pv_rw.read_present_values(subscription.address, [subscription.objid], use_cache=False))[0]
+        if not success:
+            raise value if isinstance(value, BaseException) else TimeoutError('heartbeat to ' + str(subscription.address) + ' failed')
+        key = (subscription.address, subscription.objid)
+        if key in self.__mirror:
+            if self.__mirror[key] == value:
+                return True
+            self.missed_notification_count += 1
+        self.__update(subscription, value)
+        return False
+
+    def __set_health(self, subscription, health:SubscriptionHealth, error:BaseException):
+        subscription.last_error = error
+        if subscription.health == health:
+            return
+        subscription.health = health
+        for callback in list(self.__health_callbacks):
+            self.__start_callback(callback(subscription.addr, subscription.obj_id, health))
+
+    def __update(self, subscription, value):
+        self.__mirror[(subscription.address, subscription.objid)] = value
+
+        # 同じHubを使う全ての通信ユーティリティの読み取りのキャッシュを破棄
+        self.pv_rw.hub.invalidate_caches(subscription.address, subscription.objid)
+
+        # コールバックに通知（遅いコールバックが他の通知を妨げないように個別のタスクで実行する）
+        # 実行中のコールバックには、終わった後に最新の値だけを渡す
+        for callback in list(subscription.callbacks):
+            if callback.task is None:
+                self.__start_dispatch(subscription, callback, value)
+            else:
+                if callback.has_pending:
+                    self.coalesced_notification_count += 1
+                callback.pending = value
+                callback.has_pending = True
+
+    def __start_dispatch(self, subscription, callback, value):
+        callback.task = asyncio.create_task(callback.function(subscription.addr, subscription.obj_id, value))
+        callback.task.add_done_callback(lambda task: self.__on_dispatched(subscription, callback, task))
+
+    def __on_dispatched(self, subscription, callback, task):
+        callback.task = None
+        self.__check_callback_error(task)
+        if callback.has_pending:
+            callback.has_pending = False
+            value, callback.pending = callback.pending, None
+            # 登録の解除やコールバックの削除の後に届いていた値は渡さない
+            if callback in subscription.callbacks and self.__subscriptions.get((subscription.address, subscription.objid)) is subscription:
+                self.__start_dispatch(subscription, callback, value)
+
+    def __start_callback(self, coroutine):
+        task = asyncio.create_task(coroutine)
+        self.__callback_tasks.add(task)
+        task.add_done_callback(self.__on_callback_done)
+
+    def __on_callback_done(self, task):
+        self.__callback_tasks.discard(task)
+        self.__check_callback_error(task)
+
+    def __check_callback_error(self, task):
+        # 例外を取り出して記録する（取り出さないとタスクの破棄時に警告される）
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None:
+            self.callback_error_count += 1
+            self.last_callback_error = error
+
+    # endregion
+
+class _Subscription():
+    """COV登録1件分の情報
+    """
+
+    def __init__(self, addr:Union[str,Address], obj_id:Union[str,ObjectIdentifier], address:Address, objid:ObjectIdentifier, process_identifier:int, confirmed:bool):
+        self.addr = addr
+        self.obj_id = obj_id
+        self.address = address
+        self.objid = objid
+        self.process_identifier = process_identifier
+        self.confirmed = confirmed
+        self.callbacks = []
+        self.task = None
+        self.health = SubscriptionHealth.SUBSCRIBING
+        self.last_error = None
+
+class _Callback():
+    """COV通知のコールバック1件分の実行状況
+    """
+
+    def __init__(self, function):
+        self.function = function
+        # 実行中のタスクと、実行中に届いた最新の値
+        self.task = None
+        self.pending = None
+        self.has_pending = False
@@ -0,0 +1,187 @@
+import asyncio
+
+if __package__:
+    from .DateTimeCommunicator import DateTimeCommunicator
+    from .COVSubscriptionManager import SubscriptionHealth
+else:
+    # スクリプトとして直接読み込まれた場合
+    from DateTimeCommunicator import DateTimeCommunicator
+    from COVSubscriptionManager import SubscriptionHealth
+
+class ControllerSupervisor():
+    """エミュレータの一時停止・計算遅延・計算終了に合わせて制御用のコルーチンを動かすクラス
+
+    IsPaused・IsDelayed・IsFinishedをCOVで監視し（COVが使えない間は一定間隔で読み取る）、
+    一時停止中は登録したコルーチンのsleepを止め、計算遅延中はsleepを延ばし、計算が終了したらコルーチンを取り消して終える。
+    コルーチンは周期的な待機にasyncio.sleepではなくsleepを使う（シミュレーション日時によるevery・cronは一時停止中には進まない）。
+    """
+
+    def __init__(self, dt_comm:DateTimeCommunicator, poll_interval_sec:float = 5.0, delayed_slowdown:float = 1.0):
+        """インスタンスを初期化する
+
+        Args:
+            dt_comm (DateTimeCommunicator): 監視に使う通信ユーティリティ
+            poll_interval_sec (float): COVが使えない間に状態を読み取る間隔[sec]
+            delayed_slowdown (float): 計算遅延中にsleepの待機時間に掛ける倍率[-]（1の場合には減速しない）
+        """
+        self.dt_comm = dt_comm
+        self.poll_interval = poll_interval_sec
+        self.delayed_slowdown = delayed_slowdown
+
+        # 監視する点（一時停止中か否か・計算遅延中か否か・計算終了済か否か）
+        self.__points = [dt_comm._date_time_point(member) for member in (
+            DateTimeCommunicator._member.IsPaused,
+            DateTimeCommunicator._member.IsDelayed,
+            DateTimeCommunicator._member.IsFinished,
+        )]
+
+        # 状態（一時停止が解除されるまでsleepを止めるためにEventで保持する）
+        self.__resumed = asyncio.Event()
+        self.__resumed.set()
+        self.__finished = asyncio.Event()
+        self.is_delayed = False
+
+        # 登録したコルーチンのタスクと、状態の監視（COVは同じHubの他の利用者と共有するため、自身のコールバックだけを取り除く）
+        self.__tasks = set()
+        self.__monitor_task = None
+        self.__subscribed = [False] * len(self.__points)
+        self.__callbacks = [self.__make_callback(index) for index in range(len(self.__points))]
+
+    # region 状態
+
+    @property
+    def is_paused(self):
+        """一時停止中か否か
+
+        Returns:
+            bool: 一時停止中か否か
+        """
+        return not self.__resumed.is_set()
+
+    @property
+    def is_finished(self):
+        """計算が終了済か否か
+
+        Returns:
+            bool: 計算が終了済か否か
+        """
+        return self.__finished.is_set()
+
+    def __apply(self, index:int, value:bool):
+        if index == 0:
+            if value:
+                self.__resumed.clear()
+            else:
+                self.__resumed.set()
+        elif index == 1:
+            self.is_delayed = value
+        elif value:
+            self.__finished.set()
+
+    # endregion
+
+    # region コルーチンの登録と実行
+
+    def add(self, controller, *args):
+        """制御用のコルーチン関数を登録する（runの実行中に登録した場合にはすぐに動かし始める）
+
+        Args:
+            controller (function): 制御用のコルーチン関数
+            *args: コルーチン関数に渡す引数
+
+        Returns:
+            asyncio.Task: コルーチンを実行するタスク
+        """
+        task = asyncio.create_task(controller(*args))
+        self.__tasks.add(task)
+        task.add_done_callback(self.__tasks.discard)
+        return task
+
+    async def run(self):
+        """状態の監視を始め、計算が終了するか登録したコルーチンが全て終わるまで待機する
+
+        計算が終了した場合には、登録したコルーチンを取り消して終わるのを待つ。
+
+        Returns:
+            bool: 計算が終了したか否か
+        """
+        await self.__start_monitor()
+        finished = asyncio.create_task(self.__finished.wait())
+        try:
+            while 0 < len(self.__tasks) and not finished.done():
+                await asyncio.wait([finished, *self.__tasks], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            finished.cancel()
+            tasks = list(self.__tasks)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await self.__stop_monitor()
+        return self.is_finished
+
+    def stop(self):
+        """計算の終了を待たずに、登録したコルーチンを取り消してrunを終える
+        """
+        for task in list(self.__tasks):
+            task.cancel()
+
+    async def sleep(self, delay_sec:float):
+        """待機する（一時停止中は解除されるまで待ち、計算遅延中は待機時間を延ばす）
+
+        Args:
+            delay_sec (float): 待機時間[sec]
+        """
+        await asyncio.sleep(delay_sec * (self.delayed_slowdown if self.is_delayed else 1.0))
+        await self.wait_resumed()
+
+    async def wait_resumed(self):
+        """一時停止が解除されるまで待機する（一時停止中でなければすぐに戻る）
+        """
+        await self.__resumed.wait()
+
+    # endregion
+
+    # region 状態の監視
+
+    async def __start_monitor(self):
+        if self.__monitor_task is not None:
+            return
+        # COVの登録直後の通知を待たずに始められるように、最初に1回読み取る
+        await self.__poll()
+        for index, (address, objid) in enumerate(self.__points):
+            val = await self.dt_comm.cov_manager.subscribe(address, objid, self.__callbacks[index])
+            self.__subscribed[index] = val[0]
+        self.__monitor_task = asyncio.create_task(self.__monitor())
+
+    async def __stop_monitor(self):
+        if self.__monitor_task is None:
+            return
+        self.__monitor_task.cancel()
+        self.__monitor_task = None
+        for index, (address, objid) in enumerate(self.__points):
+            if self.__subscribed[index]:
+                await self.dt_comm.cov_manager.unsubscribe(address, objid, self.__callbacks[index])
+                self.__subscribed[index] = False
+
+    def __make_callback(self, index:int):
+        async def on_changed(addr, obj_id, value):
+            self.__apply(index, value == 1)
+        return on_changed
+
+    async def __monitor(self):
+        # COVが使えない（登録できなかった・再登録中の）間は一定間隔で読み取る
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            if not all(self.__subscribed[index] and self.dt_comm.cov_manager.get_health(address, objid)[0] == SubscriptionHealth.HEALTHY
+                       for index, (address, objid) in enumerate(self.__points)):
+                await self.__poll()
+
+    async def __poll(self):
+        # 3点を1回のReadPropertyMultipleで読み取る（COVの代わりに使うため、キャッシュを通さない）
+        address = self.__points[0][0]
+        vals = await self.dt_comm.read_present_values(address, [objid for _, objid in self.__points], use_cache=False)
+        for index, val in enumerate(vals):
+            if val[0]:
+                self.__apply(index, val[1] == 1)
+
+    # endregion
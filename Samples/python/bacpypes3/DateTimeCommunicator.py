@@ -1,15 +1,23 @@
 import datetime
 import asyncio
 from enum import Enum
+from types import MappingProxyType
+from typing import Union, Iterable
 
 from bacpypes3.pdu import Address
 from bacpypes3.primitivedata import ObjectIdentifier, Real
 
-import sys,os
-sys.path.append(os.path.dirname(__file__))
-import PresentValueReadWriter
-
-class DateTimeCommunicator(PresentValueReadWriter.PresentValueReadWriter):
+if __package__:
+    from .PresentValueReadWriter import PresentValueReadWriter
+    from .COVSubscriptionManager import COVSubscriptionManager
+    from .SimulationClock import SimulationClock, ClockSnapshot
+else:
+    # スクリプトとして直接読み込まれた場合
+    from PresentValueReadWriter import PresentValueReadWriter
+    from COVSubscriptionManager import COVSubscriptionManager
+    from SimulationClock import SimulationClock, ClockSnapshot
+
+class DateTimeCommunicator(PresentValueReadWriter):
     """Shizuku2のDateTimeControllerとの通信ユーティリティクラス
     """  
 
@@ -43,11 +51,27 @@ class DateTimeCommunicator(PresentValueReadWriter.PresentValueReadWriter):
         # 一時停止中か否か
         IsPaused = 9
 
+    # オブジェクトの種別
+    _MEMBER_OBJECT_TYPES = {
+        _member.CurrentDateTimeInSimulation: 'datetimeValue',
+        _member.AccelerationRate: 'analogOutput',
+        _member.BaseRealDateTime: 'datetimeValue',
+        _member.BaseAcceleratedDateTime: 'datetimeValue',
+        _member.EndDateTime: 'datetimeValue',
+        _member.IsDelayed: 'binaryInput',
+        _member.IsFinished: 'binaryInput',
+        _member.PauseTimer: 'analogOutput',
+        _member.IsPaused: 'binaryInput',
+    }
+
+    # 事前に解析したオブジェクトID（全インスタンスで共有し、最初のインスタンスの作成時に用意する）
+    __points = None
+
     # endregion
 
     # region 初期化処理
 
-    def __init__(self, id, name='dtComm', device_ip='127.0.0.1', emulator_ip='127.0.0.1', time_out_sec = 1.0):
+    def __init__(self, id, name='dtComm', device_ip='127.0.0.1', emulator_ip='127.0.0.1', time_out_sec = 1.0, hub = None):
         """インスタンスを初期化する
 
         Args:
@@ -56,105 +80,168 @@ class DateTimeCommunicator(PresentValueReadWriter.PresentValueReadWriter):
             device_ip (str): 通信に使うDeviceのIP Address（xxx.xxx.xxx.xxx）
             emulator_ip (str): エミュレータのIP Address（xxx.xxx.xxx.xxx）
             time_out_sec (float): タイムアウトまでの時間[sec]
+            hub (BACnetHub): 共有するBACnet通信の窓口。Noneの場合には専用のものを用意する
         """
-        super().__init__(id, name, device_ip, emulator_ip, time_out_sec)
+        super().__init__(id, name, device_ip, emulator_ip, time_out_sec, hub)
         self.__target_ip = emulator_ip + ':' + str(self.DATETIMECONTROLLER_EXCLUSIVE_PORT)
 
-        # DateTimeのCOV登録状況
-        self.__acccov_task = None
-        self.__ispcov_task = None
+        # 通信先のアドレスとオブジェクトIDは事前に解析しておく
+        self.__target_address = Address(self.__target_ip)
+        # オブジェクトIDは全インスタンスで共有する（最初のインスタンスの作成時に解析しておく）
+        if DateTimeCommunicator.__points is None:
+            DateTimeCommunicator.__points = MappingProxyType({
+                mem: ObjectIdentifier((obj_type, mem.value)) for mem, obj_type in DateTimeCommunicator._MEMBER_OBJECT_TYPES.items()
+            })
+
+        # シミュレーション日時の時計は最初に使う際にDateTimeControllerごとに共有のものをHubから取得する
+        self.__emulator_ip = emulator_ip
+
+    def _date_time_point(self, member:'DateTimeCommunicator._member'):
+        """DateTimeControllerの点のアドレスとオブジェクトIDを取得する
+
+        Args:
+            member (DateTimeCommunicator._member): 点の種類
+
+        Returns:
+            list: アドレス, オブジェクトID
+        """
+        return self.__target_address, self.__points[member]
 
-        # 日時を計算するための加速度・基準日時
-        self.__acc_rate = 0
-        self.__base_real_datetime = datetime.datetime.today()
-        self.__base_sim_datetime = datetime.datetime.today()
+    @property
+    def cov_manager(self):
+        """COVの登録と最新値の保持（Hubを共有する全ての通信ユーティリティで共有する）
 
-        # 一時停止状況
-        self.is_paused = False
+        Returns:
+            COVSubscriptionManager: COVの登録と最新値の保持
+        """
+        # Hubを閉じると作り直されるため、毎回Hubから取得する
+        return COVSubscriptionManager.shared(self.hub, self.time_out)
 
     # endregion
 
     # region 現在日時取得関連
 
+    @property
+    def clock(self):
+        """シミュレーション日時の時計（同じDateTimeControllerを使う全ての通信ユーティリティで共有する）
+
+        Returns:
+            SimulationClock: シミュレーション日時の時計
+        """
+        # Hubを閉じると時計は作り直されるため、毎回Hubから取得する
+        return SimulationClock.shared(self.hub, self.__emulator_ip, self.time_out)
+
     def unsubscribe_date_time_cov(self):
-        """シミュレーション日時に関する情報のCOVイベントを解除する
+        """シミュレーション日時に関する情報のCOVイベントを解除する（共有する時計の利用者が全員解除した時点で解除される）
+
+        解除は通信を伴うため、aunsubscribe_date_time_covをタスクとして予約して戻る。解除の完了を待つ場合には戻り値をawaitする。
         Args:None
-        Returns:None
+        Returns:
+            asyncio.Task: 解除のタスク（イベントループの外で呼ばれた場合にはNone）
         """ 
-        self.__acccov_task.cancel()
-        self.__ispcov_task.cancel()
-        self.__acccov_task = None
-        self.__ispcov_task = None
-
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return None
+        return asyncio.create_task(self.aunsubscribe_date_time_cov())
 
-    async def subscribe_date_time_cov(self):
-        """シミュレーション日時に関する情報のCOVイベントを登録する
+    async def aunsubscribe_date_time_cov(self):
+        """シミュレーション日時に関する情報のCOVイベントを解除し、完了を待つ（共有する時計の利用者が全員解除した時点で解除される）
         Args:None
         Returns:None
         """
-        self.__acccov_task = asyncio.create_task(self.acccov_loop())
-        self.__ispcov_task = asyncio.create_task(self.ispcov_loop())
+        await self.clock.unsubscribe(self)
 
 
+    async def subscribe_date_time_cov(self, issue_confirmed_notifications:bool = True):
+        """シミュレーション日時に関する情報のCOVイベントを登録する（共有する時計で1回だけ登録される）
+        Args:
+            issue_confirmed_notifications (bool): 確認付きのCOV通知を要求するか否か（Falseの場合には取りこぼしを検知して同期し直す。SimulationClock.subscribeを参照）
+        Returns:
+            bool: 成功したか否か
+        """
+        return await self.clock.subscribe(self, issue_confirmed_notifications)
+
     async def acccov_loop(self):
-        # 既に登録されている場合には日時だけ更新して二重登録を回避
-        if self.__acccov_task == None:
-            return await self.sync_date_time()
-        try:
-            async with self.bacdevice.change_of_value(
-                address=Address(self.__target_ip),
-                subscriber_process_identifier=self.id,
-                monitored_object_identifier=ObjectIdentifier('analogOutput:' + str(DateTimeCommunicator._member.AccelerationRate.value)), # 加速度
-                lifetime=60*60*24*365, #1年間
-                issue_confirmed_notifications=True
-            ) as scm: #SubscriptionContextManager
-                self.__acccov_scribed = True
-                while True:
-                    property_identifier, property_value = await scm.get_value()
-                    if(f"{property_identifier}"=='present-value'):
-                        await self.sync_date_time()
-        except Exception as err:
-            return False
-        
+        """加速度のCOVを登録し、タスクがキャンセルされるまで通知のたびに日時を同期する
+
+        以前のバージョンとの互換のために残している。COVの登録は共有のCOVSubscriptionManagerで行われるため、
+        通常はsubscribe_date_time_covを使う。
+        Args:None
+        Returns:
+            bool: 登録に失敗した場合にFalse
+        """
+        return await self.__cov_loop(DateTimeCommunicator._member.AccelerationRate)
 
     async def ispcov_loop(self):
-        # 既に登録されている場合には日時だけ更新して二重登録を回避
-        if self.__ispcov_task == None:
-            return await self.sync_date_time()
-        try:
-            async with self.bacdevice.change_of_value(
-                address=Address(self.__target_ip),
-                subscriber_process_identifier=self.id + 1,
-                monitored_object_identifier=ObjectIdentifier('binaryInput:' + str(DateTimeCommunicator._member.IsPaused.value)), # 一時停止
-                lifetime=60*60*24*365, #1年間
-                issue_confirmed_notifications=True
-            ) as scm: #SubscriptionContextManager
-                self.__ispcov_scribed = True
-                while True:
-                    property_identifier, property_value = await scm.get_value()
-                    if(f"{property_identifier}"=='present-value'):
-                        self.is_paused = (property_value._value == 1)
-                        await self.sync_date_time()
-        except Exception as err:
+        """一時停止のCOVを登録し、タスクがキャンセルされるまで通知のたびに日時を同期する
+
+        以前のバージョンとの互換のために残している。COVの登録は共有のCOVSubscriptionManagerで行われるため、
+        通常はsubscribe_date_time_covを使う。
+        Args:None
+        Returns:
+            bool: 登録に失敗した場合にFalse
+        """
+        return await self.__cov_loop(DateTimeCommunicator._member.IsPaused)
+
+    async def __cov_loop(self, member:'DateTimeCommunicator._member'):
+        # 呼び出しごとのコールバックを登録し、キャンセルされた際にはそれだけを取り除く（他の利用者の登録は残す）
+        address, objid = self._date_time_point(member)
+        cov_manager = self.cov_manager
+
+        async def on_changed(addr, obj_id, value):
+            await self.sync_date_time()
+
+        if not (await cov_manager.subscribe(address, objid, on_changed))[0]:
             return False
-        
+        try:
+            await asyncio.get_running_loop().create_future()
+        finally:
+            await cov_manager.unsubscribe(address, objid, on_changed)
+
+    @property
+    def date_time_cov_health(self):
+        """シミュレーション日時に関する情報のCOV登録の状態（SimulationClock.subscription_healthを参照）
+
+        Returns:
+            SubscriptionHealth: COV登録の状態（未登録の場合にはNone）
+        """
+        return self.clock.subscription_health
+
+    @property
+    def is_paused(self):
+        """一時停止中か否か（最後に同期した値）
+
+        Returns:
+            bool: 一時停止中か否か
+        """
+        return self.clock.is_paused
+
+    @property
+    def clock_snapshot(self):
+        """日時の計算に使う加速度・基準日時・一時停止状況の組
+
+        Returns:
+            ClockSnapshot: 最後に同期した値の組
+        """
+        return self.clock.snapshot
+
+    @property
+    def last_sync_error_sec(self):
+        """直近の同期で観測した、手元の時計とエミュレータとのずれ[sec]
+
+        Returns:
+            float: ずれ[sec]（観測していない場合にはNone）
+        """
+        return self.clock.last_sync_error_sec
 
     async def sync_date_time(self):
-        """日時をエミュレータに同期させる
-        Args:
+        """日時をエミュレータに同期させる（SimulationClock.syncを参照）
+
         Returns:
             bool: 成功したか否か
-        """ 
-        val = await self.get_acceleration_rate()
-        if val[0]: self.__acc_rate = val[1]
-        else: return False 
-        val = await self.read_present_value(self.__target_ip, 'datetimeValue:' + str(DateTimeCommunicator._member.BaseRealDateTime.value))
-        if val[0]: self.__base_real_datetime = val[1]
-        else: return False
-        val = await self.read_present_value(self.__target_ip, 'datetimeValue:' + str(DateTimeCommunicator._member.BaseAcceleratedDateTime.value))
-        if val[0]: self.__base_sim_datetime = val[1]
-        else: return False
-        return True
+        """
+        return await self.clock.sync()
 
     def current_date_time(self):
         """現在の日時を取得する
@@ -162,10 +249,107 @@ class DateTimeCommunicator(PresentValueReadWriter.PresentValueReadWriter):
         Returns:
             datetime: 現在の日時
         """
-        if self.is_paused:
-            return self.__base_sim_datetime
-        else: 
-            return (datetime.datetime.today() - self.__base_real_datetime) * self.__acc_rate + self.__base_sim_datetime
+        return self.clock.current_date_time()
+
+    def current_date_time_ns(self):
+        """現在の日時を整数で取得する（datetimeを作らないため高速）
+
+        Returns:
+            int: 現在の日時（1970/1/1 0:00からのナノ秒）
+        """
+        return self.clock.current_date_time_ns()
+
+    def current_date_time_sec(self):
+        """現在の日時を実数で取得する（datetimeを作らないため高速）
+
+        Returns:
+            float: 現在の日時（1970/1/1 0:00からの秒数）
+        """
+        return self.clock.current_date_time_sec()
+
+    def drift_bound_sec(self):
+        """current_date_timeとエミュレータのシミュレーション日時とのずれの推定上限[sec]を取得する（SimulationClock.drift_bound_secを参照）
+
+        Returns:
+            float: ずれの推定上限[sec]（推定できない場合にはNone）
+        """
+        return self.clock.drift_bound_sec()
+
+    def enable_periodic_sync(self, interval_sec:float = 60.0):
+        """日時を定期的にエミュレータに同期させる（共有する時計に設定される。イベントループの中で呼ぶ）
+
+        Args:
+            interval_sec (float): 同期の間隔[sec]
+        """
+        self.clock.enable_periodic_sync(interval_sec)
+
+    def disable_periodic_sync(self):
+        """日時の定期的な同期を止める
+        """
+        self.clock.disable_periodic_sync()
+
+    def _real_cache_ttl(self, ttl:float):
+        """シミュレーション上の有効期間[sec]を、保存する時点の加速度で現実の有効期間[sec]に換算する
+
+        時計を使っていない場合や日時を同期する前（加速度が不明な場合）は換算しない。
+
+        Args:
+            ttl (float): シミュレーション上の有効期間[sec]
+
+        Returns:
+            float: 現実の有効期間[sec]
+        """
+        # 時計はHubを閉じると作り直されるため、毎回Hubから取得する（キャッシュのためだけに時計を作ることはしない）
+        clock = self.hub.clocks.get(self.__target_ip)
+        if clock is None or clock.snapshot.acc_rate <= 0:
+            return ttl
+        return ttl / clock.snapshot.acc_rate
+
+    # endregion
+
+    # region シミュレーション日時による待機
+
+    async def sleep_until(self, sim_datetime:datetime.datetime):
+        """シミュレーション日時が指定の日時になるまで待機する（SimulationClock.sleep_untilを参照）
+
+        Args:
+            sim_datetime (datetime.datetime): 待機を終えるシミュレーション日時
+        """
+        await self.clock.sleep_until(sim_datetime)
+
+    async def sleep(self, sim_timedelta:datetime.timedelta):
+        """シミュレーション上の時間だけ待機する
+
+        Args:
+            sim_timedelta (datetime.timedelta): シミュレーション上の待ち時間
+        """
+        await self.clock.sleep(sim_timedelta)
+
+    def every(self, period:datetime.timedelta, start:datetime.datetime = None):
+        """シミュレーション上の一定の間隔で日時を返す（async forで使う。SimulationClock.everyを参照）
+
+        Args:
+            period (datetime.timedelta): シミュレーション上の間隔
+            start (datetime.datetime): 最初の日時。Noneの場合には現在から1間隔後
+
+        Returns:
+            AsyncGenerator: 予定したシミュレーション日時を返す非同期ジェネレータ
+        """
+        return self.clock.every(period, start)
+
+    def cron(self, hour:Union[int,Iterable,None] = None, minute:Union[int,Iterable] = 0, second:int = 0, weekdays:Iterable = None):
+        """指定の時刻になるたびにシミュレーション日時を返す（async forで使う。SimulationClock.cronを参照）
+
+        Args:
+            hour (Union[int,Iterable,None]): 時（複数指定可）。Noneの場合には毎時
+            minute (Union[int,Iterable]): 分（複数指定可）
+            second (int): 秒
+            weekdays (Iterable): 曜日（月曜日が0）。Noneの場合には毎日
+
+        Returns:
+            AsyncGenerator: 予定したシミュレーション日時を返す非同期ジェネレータ
+        """
+        return self.clock.cron(hour, minute, second, weekdays)
 
     # endregion
 
@@ -177,7 +361,7 @@ class DateTimeCommunicator(PresentValueReadWriter.PresentValueReadWriter):
         Returns:
             list: 読み取り成功の真偽,加速度[-]
         """
-        return await self.read_present_value(self.__target_ip,'analogOutput:' + str(DateTimeCommunicator._member.AccelerationRate.value))
+        return await self.read_present_value(self.__target_address,self.__points[DateTimeCommunicator._member.AccelerationRate])
 
     async def change_acceleration_rate(self, acceleration_rate):
         """加速度[-]を変える
@@ -186,7 +370,7 @@ class DateTimeCommunicator(PresentValueReadWriter.PresentValueReadWriter):
         Returns:
             bool:命令が成功したか否か
             """
-        return await self.write_present_value(self.__target_ip,'analogOutput:' + str(DateTimeCommunicator._member.AccelerationRate.value),Real(acceleration_rate))
+        return await self.write_present_value(self.__target_address,self.__points[DateTimeCommunicator._member.AccelerationRate],Real(acceleration_rate))
 
     # endregion
 
@@ -198,7 +382,7 @@ class DateTimeCommunicator(PresentValueReadWriter.PresentValueReadWriter):
         Returns:
             list: 読み取り成功の真偽,一時停止までの時間[sec]
         """
-        return await self.read_present_value(self.__target_ip,'analogOutput:' + str(DateTimeCommunicator._member.PauseTimer.value))
+        return await self.read_present_value(self.__target_address,self.__points[DateTimeCommunicator._member.PauseTimer])
 
     async def change_pause_timer(self, pause_timer):
         """一時停止までの時間[sec]を変える
@@ -207,7 +391,7 @@ class DateTimeCommunicator(PresentValueReadWriter.PresentValueReadWriter):
         Returns:
             bool:命令が成功したか否か
             """
-        return await self.write_present_value(self.__target_ip,'analogOutput:' + str(DateTimeCommunicator._member.PauseTimer.value),Real(pause_timer))
+        return await self.write_present_value(self.__target_address,self.__points[DateTimeCommunicator._member.PauseTimer],Real(pause_timer))
 
     async def get_is_paused(self):
         """計算が一時停止中か否かを取得する
@@ -215,7 +399,7 @@ class DateTimeCommunicator(PresentValueReadWriter.PresentValueReadWriter):
         Returns:
             list: 読み取り成功の真偽,計算が一時停止中か否か
         """
-        val = await self.read_present_value(self.__target_ip,'binary-input:' + str(DateTimeCommunicator._member.IsPaused.value))
+        val = await self.read_present_value(self.__target_address,self.__points[DateTimeCommunicator._member.IsPaused])
         return val[0], (val[1] == 1)
 
     # endregion
@@ -228,7 +412,7 @@ class DateTimeCommunicator(PresentValueReadWriter.PresentValueReadWriter):
         Returns:
             list: 読み取り成功の真偽,計算を終えるシミュレーション上の日時
         """
-        return await self.read_present_value(self.__target_ip,'datetime-value:' + str(DateTimeCommunicator._member.EndDateTime.value))
+        return await self.read_present_value(self.__target_address,self.__points[DateTimeCommunicator._member.EndDateTime])
 
 
     async def get_is_delayed(self):
@@ -237,7 +421,7 @@ class DateTimeCommunicator(PresentValueReadWriter.PresentValueReadWriter):
         Returns:
             list: 読み取り成功の真偽,計算遅延の有無を取得する
         """
-        val = await self.read_present_value(self.__target_ip,'binary-input:' + str(DateTimeCommunicator._member.IsDelayed.value))
+        val = await self.read_present_value(self.__target_address,self.__points[DateTimeCommunicator._member.IsDelayed])
         return val[0], (val[1] == 1)
     
 
@@ -247,7 +431,7 @@ class DateTimeCommunicator(PresentValueReadWriter.PresentValueReadWriter):
         Returns:
             list: 読み取り成功の真偽,計算が終了済か否か
         """
-        val = await self.read_present_value(self.__target_ip,'binary-input:' + str(DateTimeCommunicator._member.IsFinished.value))
+        val = await self.read_present_value(self.__target_address,self.__points[DateTimeCommunicator._member.IsFinished])
         return val[0], (val[1] == 1)
 
     # endregion
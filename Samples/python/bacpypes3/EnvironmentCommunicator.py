@@ -2,12 +2,17 @@ import time
 import asyncio
 
 from enum import Enum
+from types import MappingProxyType
+from bacpypes3.pdu import Address
+from bacpypes3.primitivedata import ObjectIdentifier
 
-import sys,os
-sys.path.append(os.path.dirname(__file__))
-import DateTimeCommunicator
+if __package__:
+    from .DateTimeCommunicator import DateTimeCommunicator
+else:
+    # スクリプトとして直接読み込まれた場合
+    from DateTimeCommunicator import DateTimeCommunicator
 
-class EnvironmentCommunicator(DateTimeCommunicator.DateTimeCommunicator):
+class EnvironmentCommunicator(DateTimeCommunicator):
 
 # region 定数宣言
 
@@ -39,7 +44,22 @@ class EnvironmentCommunicator(DateTimeCommunicator.DateTimeCommunicator):
 
 # endregion
 
-    def __init__(self, id, name='envComm', device_ip='127.0.0.1', emulator_ip='127.0.0.1', time_out_sec=1.0):
+# region オブジェクトの種別
+
+    # ゾーン単位のオブジェクト
+    _ZONE_MEMBERS = (_member.DrybulbTemperature, _member.RelativeHumdity)
+
+    # 事前にオブジェクトIDを用意する室外機・室内機の台数
+    MAX_OUTDOOR_UNIT_NUMBER = 4
+    MAX_INDOOR_UNIT_NUMBER = 5
+
+    # 事前に解析したオブジェクトID（全インスタンスで共有し、最初のインスタンスの作成時に用意する）
+    _points = None
+    _zone_points = None
+
+# endregion
+
+    def __init__(self, id, name='envComm', device_ip='127.0.0.1', emulator_ip='127.0.0.1', time_out_sec=1.0, hub=None):
         """インスタンスを初期化する
 
         Args:
@@ -48,17 +68,31 @@ class EnvironmentCommunicator(DateTimeCommunicator.DateTimeCommunicator):
             device_ip (str): 通信に使うDeviceのIP Address（xxx.xxx.xxx.xxx）
             emulator_ip (str): エミュレータのIP Address（xxx.xxx.xxx.xxx）
             time_out_sec (float): タイムアウトまでの時間[sec]
+            hub (BACnetHub): 共有するBACnet通信の窓口。Noneの場合には専用のものを用意する
         """
-        super().__init__(id, name, device_ip, emulator_ip, time_out_sec)
+        super().__init__(id, name, device_ip, emulator_ip, time_out_sec, hub)
         self.target_ip = emulator_ip + ':' + str(self.ENVIRONMENTMONITOR_EXCLUSIVE_PORT)
 
+        # 通信先のアドレスとオブジェクトIDは事前に解析しておく（全て'analogInput'。オブジェクトIDは全インスタンスで共有する）
+        self.target_address = Address(self.target_ip)
+        if EnvironmentCommunicator._points is None:
+            EnvironmentCommunicator._points = MappingProxyType({
+                mem: ObjectIdentifier(('analogInput', mem.value)) for mem in self._member
+            })
+            EnvironmentCommunicator._zone_points = MappingProxyType({
+                (o, i, mem): self._make_zone_point(o, i, mem)
+                for o in range(1, self.MAX_OUTDOOR_UNIT_NUMBER + 1)
+                for i in range(1, self.MAX_INDOOR_UNIT_NUMBER + 1)
+                for mem in self._ZONE_MEMBERS
+            })
+
     async def get_drybulb_temperature(self):
         """外気乾球温度[C]を取得する
 
         Returns:
             list: 読み取り成功の真偽,外気乾球温度[C]
         """
-        return await self.read_present_value(self.target_ip,'analogInput:' + str(self._member.DrybulbTemperature.value))
+        return await self.read_present_value(self.target_address,self._points[self._member.DrybulbTemperature])
     
     async def get_relative_humidity(self):
         """外気相対湿度[%]を取得する
@@ -66,7 +100,7 @@ class EnvironmentCommunicator(DateTimeCommunicator.DateTimeCommunicator):
         Returns:
             list: 読み取り成功の真偽,外気相対湿度[%]
         """
-        return await self.read_present_value(self.target_ip,'analogInput:' + str(self._member.RelativeHumdity.value))
+        return await self.read_present_value(self.target_address,self._points[self._member.RelativeHumdity])
     
     async def get_global_horizontal_radiation(self):
         """水平面全天日射[W/m2]を取得する
@@ -74,7 +108,7 @@ class EnvironmentCommunicator(DateTimeCommunicator.DateTimeCommunicator):
         Returns:
             list: 読み取り成功の真偽,水平面全天日射[W/m2]
         """
-        return await self.read_present_value(self.target_ip,'analogInput:' + str(self._member.GlobalHorizontalRadiation.value))
+        return await self.read_present_value(self.target_address,self._points[self._member.GlobalHorizontalRadiation])
     
     async def get_nocturnal_radiation(self):
         """夜間放射[W/m2]を取得する
@@ -82,7 +116,7 @@ class EnvironmentCommunicator(DateTimeCommunicator.DateTimeCommunicator):
         Returns:
             list: 読み取り成功の真偽,夜間放射[W/m2]
         """
-        return await self.read_present_value(self.target_ip,'analogInput:' + str(self._member.NocturnalRadiation.value))
+        return await self.read_present_value(self.target_address,self._points[self._member.NocturnalRadiation])
     
     async def get_total_energy_consumption(self):
         """合計エネルギー消費量[MJ]を取得する
@@ -90,7 +124,7 @@ class EnvironmentCommunicator(DateTimeCommunicator.DateTimeCommunicator):
         Returns:
             list: 読み取り成功の真偽,エネルギー消費量[MJ]
         """
-        return await self.read_present_value(self.target_ip,'analogInput:' + str(self._member.TotalEnergyConsumption.value))
+        return await self.read_present_value(self.target_address,self._points[self._member.TotalEnergyConsumption])
 
     async def get_averaged_dissatisfaction_rate(self):
         """平均不満足者率[-]を取得する
@@ -98,7 +132,7 @@ class EnvironmentCommunicator(DateTimeCommunicator.DateTimeCommunicator):
         Returns:
             list: 読み取り成功の真偽,平均不満足者率[-]
         """
-        return await self.read_present_value(self.target_ip,'analogInput:' + str(self._member.AveragedDissatisfactionRate.value))
+        return await self.read_present_value(self.target_address,self._points[self._member.AveragedDissatisfactionRate])
 
     async def get_instantaneous_energy_consumption(self):
         """瞬時エネルギー消費量[kW]を取得する
@@ -106,7 +140,7 @@ class EnvironmentCommunicator(DateTimeCommunicator.DateTimeCommunicator):
         Returns:
             list: 読み取り成功の真偽,瞬時エネルギー消費量[kW]
         """
-        return await self.read_present_value(self.target_ip,'analogInput:' + str(self._member.InstantaneousEnergyConsumption.value))
+        return await self.read_present_value(self.target_address,self._points[self._member.InstantaneousEnergyConsumption])
 
     async def get_instantaneous_dissatisfaction_rate(self):
         """瞬時不満足者率[-]を取得する
@@ -114,7 +148,7 @@ class EnvironmentCommunicator(DateTimeCommunicator.DateTimeCommunicator):
         Returns:
             list: 読み取り成功の真偽,瞬時不満足者率[-]
         """
-        return await self.read_present_value(self.target_ip,'analogInput:' + str(self._member.InstantaneousDissatisfactionRate.value))
+        return await self.read_present_value(self.target_address,self._points[self._member.InstantaneousDissatisfactionRate])
 
     async def get_zone_drybulb_temperature(self,oUnitIndex,iUnitIndex):
         """ゾーン（下部空間）の乾球温度[C]を取得する
@@ -125,8 +159,8 @@ class EnvironmentCommunicator(DateTimeCommunicator.DateTimeCommunicator):
         Returns:
             list: 読み取り成功の真偽,ゾーン（下部空間）の乾球温度[C]
         """        
-        objNum = 1000 * oUnitIndex + 100 * iUnitIndex + self._member.DrybulbTemperature.value
-        return await self.read_present_value(self.target_ip,'analogInput:' + str(objNum))
+        inst = self._get_zone_point(oUnitIndex,iUnitIndex,self._member.DrybulbTemperature)
+        return await self.read_present_value(self.target_address,inst)
 
     async def get_zone_relative_humidity(self,oUnitIndex,iUnitIndex):
         """ゾーン（下部空間）の相対湿度[%]を取得する
@@ -137,8 +171,15 @@ class EnvironmentCommunicator(DateTimeCommunicator.DateTimeCommunicator):
         Returns:
             list: 読み取り成功の真偽,ゾーン（下部空間）の相対湿度[%]
         """
-        objNum = 1000 * oUnitIndex + 100 * iUnitIndex + self._member.RelativeHumdity.value
-        return await self.read_present_value(self.target_ip,'analogInput:' + str(objNum))
+        inst = self._get_zone_point(oUnitIndex,iUnitIndex,self._member.RelativeHumdity)
+        return await self.read_present_value(self.target_address,inst)
+
+    def _get_zone_point(self,oUnitIndex,iUnitIndex,member):
+        point = self._zone_points.get((oUnitIndex,iUnitIndex,member))
+        return point if point is not None else self._make_zone_point(oUnitIndex,iUnitIndex,member)
+
+    def _make_zone_point(self,oUnitIndex,iUnitIndex,member):
+        return ObjectIdentifier(('analogInput', 1000 * oUnitIndex + 100 * iUnitIndex + member.value))
 
 async def main():
     wCom = EnvironmentCommunicator(14)
@@ -2,12 +2,17 @@ import time
 import asyncio
 
 from enum import Enum
+from types import MappingProxyType
+from bacpypes3.pdu import Address
+from bacpypes3.primitivedata import ObjectIdentifier
 
-import sys,os
-sys.path.append(os.path.dirname(__file__))
-import DateTimeCommunicator
+if __package__:
+    from .DateTimeCommunicator import DateTimeCommunicator
+else:
+    # スクリプトとして直接読み込まれた場合
+    from DateTimeCommunicator import DateTimeCommunicator
 
-class OccupantCommunicator(DateTimeCommunicator.DateTimeCommunicator):
+class OccupantCommunicator(DateTimeCommunicator):
 
 # region 定数宣言
 
@@ -59,9 +64,38 @@ class OccupantCommunicator(DateTimeCommunicator.DateTimeCommunicator):
 
 # endregion
 
+# region オブジェクトの種別
+
+    _MEMBER_OBJECT_TYPES = {
+        _member.OccupantNumber: 'analogInput',
+        _member.Availability: 'binaryInput',
+        _member.ThermalSensation: 'analogInput',
+        _member.ClothingIndex: 'analogInput',
+        _member.Dissatisfied_Thermal: 'analogInput',
+        _member.Dissatisfied_Draft: 'analogInput',
+        _member.Dissatisfied_VerticalTemp: 'analogInput',
+    }
+
+    # ゾーン単位のオブジェクト
+    _ZONE_MEMBERS = (_member.OccupantNumber, _member.ThermalSensation, _member.ClothingIndex, _member.Dissatisfied_Thermal, _member.Dissatisfied_Draft, _member.Dissatisfied_VerticalTemp)
+
+    # 執務者単位のオブジェクト
+    _OCCUPANT_MEMBERS = (_member.Availability, _member.ThermalSensation, _member.ClothingIndex)
+
+    # 事前にオブジェクトIDを用意するゾーン数・執務者数（執務者番号は100以上になるとゾーンの番号と重なる）
+    MAX_ZONE_NUMBER = 9
+    MAX_OCCUPANT_NUMBER = 99
+
+    # 事前に解析したオブジェクトID（全インスタンスで共有し、最初のインスタンスの作成時に用意する）
+    _tenant_points = None
+    _zone_points = None
+    _occupant_points = None
+
+# endregion
+
 # region コンストラクタ
 
-    def __init__(self, id, name='occComm', device_ip='127.0.0.1', emulator_ip='127.0.0.1', time_out_sec=1.0):
+    def __init__(self, id, name='occComm', device_ip='127.0.0.1', emulator_ip='127.0.0.1', time_out_sec=1.0, hub=None):
         """インスタンスを初期化する
 
         Args:
@@ -69,10 +103,27 @@ class OccupantCommunicator(DateTimeCommunicator.DateTimeCommunicator):
             name (str): 通信用のDeviceの名前
             device_ip (str): 通信に使うDeviceのIP Address（xxx.xxx.xxx.xxx）
             emulator_ip (str): エミュレータのIP Address（xxx.xxx.xxx.xxx）
+            hub (BACnetHub): 共有するBACnet通信の窓口。Noneの場合には専用のものを用意する
         """
-        super().__init__(id, name, device_ip, emulator_ip, time_out_sec)
+        super().__init__(id, name, device_ip, emulator_ip, time_out_sec, hub)
         self.target_ip = emulator_ip + ':' + str(self.OCCUPANTMONITOR_EXCLUSIVE_PORT)
 
+        # 通信先のアドレスとオブジェクトIDは事前に解析しておく（オブジェクトIDは全インスタンスで共有する）
+        self.target_address = Address(self.target_ip)
+        if OccupantCommunicator._tenant_points is None:
+            tenants = [int(t.value) for t in self.Tenant]
+            OccupantCommunicator._tenant_points = MappingProxyType({
+                (t, self._member.OccupantNumber): self._make_point(10000 * t, self._member.OccupantNumber) for t in tenants
+            })
+            OccupantCommunicator._zone_points = MappingProxyType({
+                (t, z, mem): self._make_point(10000 * t + 1000 * z, mem)
+                for t in tenants for z in range(1, self.MAX_ZONE_NUMBER + 1) for mem in self._ZONE_MEMBERS
+            })
+            OccupantCommunicator._occupant_points = MappingProxyType({
+                (t, oc, mem): self._make_point(10000 * t + 10 * oc, mem)
+                for t in tenants for oc in range(1, self.MAX_OCCUPANT_NUMBER + 1) for mem in self._OCCUPANT_MEMBERS
+            })
+
 # endregion
 
 # region テナント・ゾーン別
@@ -84,8 +135,8 @@ class OccupantCommunicator(DateTimeCommunicator.DateTimeCommunicator):
         Returns:
             list: 読み取り成功の真偽,在室している執務者数
         """
-        inst = 'analogInput:' + str(10000 * int(tenant.value) + self._member.OccupantNumber.value)       
-        return await self.read_present_value(self.target_ip,inst)
+        inst = self._get_tenant_point(tenant,self._member.OccupantNumber)       
+        return await self.read_present_value(self.target_address,inst)
 
 
     async def get_zone_occupant_number(self, tenant, zone_number):
@@ -96,8 +147,8 @@ class OccupantCommunicator(DateTimeCommunicator.DateTimeCommunicator):
         Returns:
             list: 読み取り成功の真偽,ゾーンに在室している執務者数
         """
-        inst = 'analogInput:' + str(10000 * int(tenant.value) + 1000 * zone_number + self._member.OccupantNumber.value)       
-        return await self.read_present_value(self.target_ip,inst)
+        inst = self._get_zone_point(tenant,zone_number,self._member.OccupantNumber)       
+        return await self.read_present_value(self.target_address,inst)
 
 
     async def get_averaged_thermal_sensation(self, tenant, zone_number):
@@ -108,8 +159,8 @@ class OccupantCommunicator(DateTimeCommunicator.DateTimeCommunicator):
         Returns:
             list: 読み取り成功の真偽,平均温冷感
         """        
-        inst = 'analogInput:' + str(10000 * int(tenant.value) + 1000 * zone_number + self._member.ThermalSensation.value)
-        return await self.read_present_value(self.target_ip,inst)
+        inst = self._get_zone_point(tenant,zone_number,self._member.ThermalSensation)
+        return await self.read_present_value(self.target_address,inst)
     
 
     async def get_averaged_clothing_index(self, tenant, zone_number):
@@ -120,8 +171,8 @@ class OccupantCommunicator(DateTimeCommunicator.DateTimeCommunicator):
         Returns:
             list: 読み取り成功の真偽,平均着衣量
         """        
-        inst = 'analogInput:' + str(10000 * int(tenant.value) + 1000 * zone_number + self._member.ClothingIndex.value)
-        return await self.read_present_value(self.target_ip,inst)
+        inst = self._get_zone_point(tenant,zone_number,self._member.ClothingIndex)
+        return await self.read_present_value(self.target_address,inst)
     
     async def get_thermally_dissatisfied_rate(self, tenant, zone_number):
         """ゾーンに在室している執務者の温熱環境に対する不満足者率を取得する
@@ -131,8 +182,8 @@ class OccupantCommunicator(DateTimeCommunicator.DateTimeCommunicator):
         Returns:
             list: 読み取り成功の真偽,ゾーンに在室している執務者の温熱環境に対する不満足者率
         """        
-        inst = 'analogInput:' + str(10000 * int(tenant.value) + 1000 * zone_number + self._member.Dissatisfied_Thermal.value)
-        return await self.read_present_value(self.target_ip,inst)
+        inst = self._get_zone_point(tenant,zone_number,self._member.Dissatisfied_Thermal)
+        return await self.read_present_value(self.target_address,inst)
     
     async def get_dissatisfied_rate_caused_by_draft(self, tenant, zone_number):
         """ゾーンに在室している執務者のドラフトに対する不満足者率を取得する
@@ -142,8 +193,8 @@ class OccupantCommunicator(DateTimeCommunicator.DateTimeCommunicator):
         Returns:
             list: 読み取り成功の真偽,ゾーンに在室している執務者のドラフトに対する不満足者率
         """        
-        inst = 'analogInput:' + str(10000 * int(tenant.value) + 1000 * zone_number + self._member.Dissatisfied_Draft.value)
-        return await self.read_present_value(self.target_ip,inst)
+        inst = self._get_zone_point(tenant,zone_number,self._member.Dissatisfied_Draft)
+        return await self.read_present_value(self.target_address,inst)
     
     async def get_dissatisfied_rate_caused_by_vertical_temperature_distribution(self, tenant, zone_number):
         """ゾーンに在室している執務者の上下温度分布に対する不満足者率を取得する
@@ -153,8 +204,8 @@ class OccupantCommunicator(DateTimeCommunicator.DateTimeCommunicator):
         Returns:
             list: 読み取り成功の真偽,ゾーンに在室している執務者の上下温度分布に対する不満足者率
         """        
-        inst = 'analogInput:' + str(10000 * int(tenant.value) + 1000 * zone_number + self._member.Dissatisfied_VerticalTemp.value)
-        return await self.read_present_value(self.target_ip,inst)
+        inst = self._get_zone_point(tenant,zone_number,self._member.Dissatisfied_VerticalTemp)
+        return await self.read_present_value(self.target_address,inst)
 
 # endregion
 
@@ -168,8 +219,8 @@ class OccupantCommunicator(DateTimeCommunicator.DateTimeCommunicator):
         Returns:
             list(bool,bool): 読み取り成功の真偽,在室しているか否か
         """
-        inst = 'binary-input,' + str(10000 * int(tenant.value) + 10 * occupant_index + self._member.Availability.value)
-        val = await self.read_present_value(self.target_ip,inst)
+        inst = self._get_occupant_point(tenant,occupant_index,self._member.Availability)
+        val = await self.read_present_value(self.target_address,inst)
         return val[0], (val[1] == 1)
 
 
@@ -181,8 +232,8 @@ class OccupantCommunicator(DateTimeCommunicator.DateTimeCommunicator):
         Returns:
             list: 読み取り成功の真偽,温冷感
         """        
-        inst = 'analogInput:' + str(10000 * int(tenant.value) + 10 * occupant_index + self._member.ThermalSensation.value)
-        return await self.read_present_value(self.target_ip,inst)
+        inst = self._get_occupant_point(tenant,occupant_index,self._member.ThermalSensation)
+        return await self.read_present_value(self.target_address,inst)
 
 
     async def get_clothing_index(self, tenant, occupant_index):
@@ -193,8 +244,27 @@ class OccupantCommunicator(DateTimeCommunicator.DateTimeCommunicator):
         Returns:
             list: 読み取り成功の真偽,着衣量
         """        
-        inst = 'analogInput:' + str(10000 * int(tenant.value) + 10 * occupant_index + self._member.ClothingIndex.value)
-        return await self.read_present_value(self.target_ip,inst)
+        inst = self._get_occupant_point(tenant,occupant_index,self._member.ClothingIndex)
+        return await self.read_present_value(self.target_address,inst)
+
+# endregion
+
+# region 補助メソッド
+
+    def _get_tenant_point(self,tenant,member):
+        point = self._tenant_points.get((int(tenant.value),member))
+        return point if point is not None else self._make_point(10000 * int(tenant.value),member)
+
+    def _get_zone_point(self,tenant,zone_number,member):
+        point = self._zone_points.get((int(tenant.value),zone_number,member))
+        return point if point is not None else self._make_point(10000 * int(tenant.value) + 1000 * zone_number,member)
+
+    def _get_occupant_point(self,tenant,occupant_index,member):
+        point = self._occupant_points.get((int(tenant.value),occupant_index,member))
+        return point if point is not None else self._make_point(10000 * int(tenant.value) + 10 * occupant_index,member)
+
+    def _make_point(self,base_number,member):
+        return ObjectIdentifier((self._MEMBER_OBJECT_TYPES[member], base_number + member.value))
 
 # endregion
 
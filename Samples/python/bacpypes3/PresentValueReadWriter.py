@@ -1,19 +1,88 @@
 import datetime
 import asyncio
+import random
+import time
+from collections import OrderedDict
 from typing import Union
 
-from bacpypes3.pdu import Address, IPv4Address
-from bacpypes3.ipv4.app import NormalApplication
-from bacpypes3.primitivedata import ObjectIdentifier, Enumerated, Real, Integer, Unsigned
-from bacpypes3.basetypes import DateTime
-from bacpypes3.local.device import DeviceObject
-from bacpypes3.apdu import ErrorRejectAbortNack
+from bacpypes3.pdu import Address
+from bacpypes3.primitivedata import Atomic, ObjectIdentifier, Enumerated, Real, Integer, Unsigned
+from bacpypes3.basetypes import DateTime, ObjectType, Segmentation, PropertyIdentifier, PropertyReference, PropertyValue, ReadAccessSpecification, WriteAccessSpecification
+from bacpypes3.constructeddata import Any
+from bacpypes3.apdu import ConfirmedServiceChoice, error_types, ErrorRejectAbortNack, RejectPDU, AbortPDU, ReadPropertyRequest, WritePropertyRequest, ReadPropertyMultipleRequest, WritePropertyMultipleRequest, WritePropertyMultipleError
+from bacpypes3.appservice import COMPLETED, ABORTED
+
+if __package__:
+    from .BACnetHub import BACnetHub
+    from .RequestStatistics import RequestStatistics
+else:
+    # スクリプトとして直接読み込まれた場合
+    from BACnetHub import BACnetHub
+    from RequestStatistics import RequestStatistics
+
+class RetryPolicy():
+    """通信失敗時の再試行の方針
+
+    タイムアウトまたはAbortで失敗した要求を、ジッタ付きの指数バックオフを挟んで再送する。
+    ErrorとRejectは再送しても結果が変わらないため再試行しない。
+    """
+
+    def __init__(self, max_retries:int = 2, base_delay_sec:float = 0.05, max_delay_sec:float = 1.0, jitter:float = 0.5):
+        """インスタンスを初期化する
+
+        Args:
+            max_retries (int): 最大の再試行回数
+            base_delay_sec (float): 1回目の再試行までの待機時間[sec]
+            max_delay_sec (float): 再試行までの待機時間の上限[sec]
+            jitter (float): 待機時間をランダムに短縮する割合[-]（0～1）
+        """
+        self.max_retries = max_retries
+        self.base_delay_sec = base_delay_sec
+        self.max_delay_sec = max_delay_sec
+        self.jitter = jitter
+
+    def should_retry(self, attempt:int, error:BaseException):
+        """再試行するか否か
+
+        Args:
+            attempt (int): 失敗した試行の番号（0～）
+            error (BaseException): 失敗の原因
+
+        Returns:
+            bool: 再試行するか否か
+        """
+        return attempt < self.max_retries and isinstance(error, (TimeoutError, AbortPDU))
+
+    def get_delay(self, attempt:int):
+        """再試行までの待機時間[sec]を取得する
+
+        Args:
+            attempt (int): 失敗した試行の番号（0～）
+
+        Returns:
+            float: 再試行までの待機時間[sec]
+        """
+        delay = min(self.max_delay_sec, self.base_delay_sec * (2 ** attempt))
+        return delay * (1.0 - self.jitter * random.random())
 
 class PresentValueReadWriter():
     """BACnet通信でPresent valueを読み書きするクラス
     """  
 
-    def __init__(self, id:int, name:str='anonymous device', device_ip:str='127.0.0.1', emulator_ip:str='127.0.0.1', time_out_sec:float = 1.0):
+    # region 定数宣言
+
+    # ReadPropertyMultiple応答の1点あたりのバイト数の見積もり（DateTime型の場合を上限とする）
+    RPM_BYTES_PER_POINT = 24
+
+    # WritePropertyMultiple要求の1点あたりのバイト数の見積もり（DateTime型の場合を上限とする）
+    WPM_BYTES_PER_POINT = 24
+
+    # ReadPropertyMultiple/WritePropertyMultipleのヘッダのバイト数の見積もり
+    MULTIPLE_HEADER_BYTES = 8
+
+    # endregion
+
+    def __init__(self, id:int, name:str='anonymous device', device_ip:str='127.0.0.1', emulator_ip:str='127.0.0.1', time_out_sec:float = 1.0, hub:BACnetHub = None, retry_policy:RetryPolicy = None):
         """インスタンスを初期化する
 
         Args:
@@ -22,86 +91,761 @@ class PresentValueReadWriter():
             device_ip (str): 通信に使うDeviceのIP Address（xxx.xxx.xxx.xxx）
             emulator_ip (str): エミュレータのIP Address（xxx.xxx.xxx.xxx）
             time_out_sec (float): タイムアウトまでの時間[sec]
+            hub (BACnetHub): 共有するBACnet通信の窓口。Noneの場合には専用のものを用意する
+            retry_policy (RetryPolicy): 通信失敗時の再試行の方針。Noneの場合には既定の方針
         """
 
         # タイムアウトまでの時間
         self.time_out = time_out_sec
 
+        # 再試行の方針
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+
         # idを保存
         self.id = id
 
-        this_device = DeviceObject(
-            objectName=name,
-            objectIdentifier=id,
-            maxApduLengthAccepted=1024,
-            segmentationSupported='segmentedBoth',
-            vendorIdentifier=15,
-        )
+        # BACnetコントローラを用意（Hubが指定された場合にはそのソケットとDeviceObjectを共有する）
+        # ソケットは最初の要求の際に開かれる
+        self.hub = hub if hub is not None else BACnetHub(id, name, device_ip)
+
+        # オブジェクトの種別ごとのPresent valueのデータ型
+        self._present_value_types = {}
+
+        # 応答待ちの同一要求に相乗りした読み取りの回数
+        self.coalesced_read_count = 0
+
+        # 送信を待っている1点ずつの読み取り（(アドレス, タイムアウト)をキーとし、オブジェクトIDごとの結果のFutureを持つ）
+        # タイムアウト・再試行の方針・統計が混ざらないように、通信ユーティリティごとにまとめる
+        self._read_batches = {}
+
+        # 要求の応答時間と結果の集計
+        self.statistics = RequestStatistics()
+
+        # 最後に書き込んだ値（enable_write_suppressionで有効化する）
+        self._write_shadow = None
+        self._write_refresh_interval = 0
+
+        # 抑制した書き込みと送信した書き込みの回数
+        self.suppressed_write_count = 0
+        self.sent_write_count = 0
+
+        # Present valueのキャッシュ（enable_cacheで有効化する）
+        self._cache = None
+        self._cache_ttl = {}
+        self._cache_default_ttl = 0
+        self._cache_max_entries = 0
+        self._cache_epoch = 0
+
+    @property
+    def bacdevice(self):
+        """BACnetコントローラ（最初の要求の際にHubが用意する）
+
+        Returns:
+            NormalApplication: BACnetコントローラ
+        """
+        return self.hub.bacdevice
+
+    @property
+    def this_device(self):
+        """通信に使うDeviceObject
+
+        Returns:
+            DeviceObject: 通信に使うDeviceObject
+        """
+        return self.hub.this_device
+
+# region キャッシュ関連
+
+    def enable_cache(self, ttl_sec:dict, default_ttl_sec:float = 0, max_entries:int = 1024):
+        """Present valueのキャッシュを有効にする
+
+        有効期間はシミュレーション上の秒数で指定する（DateTimeCommunicatorでは加速度に応じて現実の有効期間が短くなる）。
+        自身が書き込んだオブジェクトと、同じHubのCOVSubscriptionManagerがCOV通知を受けたオブジェクトのキャッシュは直ちに破棄する。
+
+        Args:
+            ttl_sec (dict): オブジェクトの種別（'analogValue'など）またはオブジェクトID（'analogInput:1106'など）ごとの有効期間[sec]
+            default_ttl_sec (float): ttl_secに無いオブジェクトの有効期間[sec]（0以下の場合にはキャッシュしない）
+            max_entries (int): キャッシュする最大の点数（超えた場合には最も長く使われていないものから破棄する）
+        """
+        self._cache_ttl = {}
+        for key, ttl in ttl_sec.items():
+            if ':' in key or ',' in key:
+                self._cache_ttl[ObjectIdentifier(key)] = ttl
+            else:
+                self._cache_ttl[ObjectType(key)] = ttl
+        self._cache_default_ttl = default_ttl_sec
+        self._cache_max_entries = max_entries
+        self._cache = OrderedDict()
+        self.hub.caching_readers.add(self)
+
+    def disable_cache(self):
+        """Present valueのキャッシュを無効にする
+        """
+        self._cache = None
+        self.hub.caching_readers.discard(self)
+
+    def invalidate_cache(self, addr:Union[str,Address], obj_id:Union[str,ObjectIdentifier]):
+        """オブジェクトのPresent valueのキャッシュを破棄する
+
+        Args:
+            addr (Union[str,Address]): 通信先のBACnet Deviceのアドレス（xxx.xxx.xxx.xxx:port）
+            obj_id (Union[str,ObjectIdentifier]): 通信先のBACnet DeviceのオブジェクトID
+        """
+        self._invalidate(self._to_address(addr), self._to_object_identifier(obj_id))
+
+    def _invalidate(self, address:Address, objid:ObjectIdentifier):
+        # 破棄前に送信した読み取りの結果を保存しないように世代を進める
+        self._cache_epoch += 1
+        for affected in self._get_affected_objects(objid):
+            # 応答待ちの読み取りには以後相乗りさせない
+            self.hub.in_flight_reads.pop((address, affected, 'present-value'), None)
+            if self._cache is not None:
+                self._cache.pop((address, affected), None)
+
+    def _get_affected_objects(self, objid:ObjectIdentifier):
+        """書き込みによってPresent valueが変わるオブジェクトのリストを取得する
+
+        Args:
+            objid (ObjectIdentifier): 書き込むオブジェクトID
+
+        Returns:
+            list: Present valueが変わるオブジェクトIDのリスト
+        """
+        return [objid]
+
+    def _cache_clock(self):
+        """キャッシュの有効期間の判定に使う現実の時刻[sec]を取得する
+
+        Returns:
+            float: 時刻[sec]
+        """
+        return time.monotonic()
+
+    def _real_cache_ttl(self, ttl:float):
+        """シミュレーション上の有効期間[sec]を現実の有効期間[sec]に換算する
+
+        Args:
+            ttl (float): シミュレーション上の有効期間[sec]
+
+        Returns:
+            float: 現実の有効期間[sec]
+        """
+        return ttl
+
+    def _get_cached_value(self, address:Address, objid:ObjectIdentifier):
+        if self._cache is None:
+            return False, None
+        key = (address, objid)
+        entry = self._cache.get(key)
+        if entry is None:
+            return False, None
+        expiry, value = entry
+        if self._cache_clock() >= expiry:
+            del self._cache[key]
+            return False, None
+        self._cache.move_to_end(key)
+        return True, value
+
+    def _set_cached_value(self, address:Address, objid:ObjectIdentifier, value, epoch:int):
+        if self._cache is None or epoch != self._cache_epoch:
+            return
+        ttl = self._cache_ttl.get(objid, self._cache_ttl.get(objid[0], self._cache_default_ttl))
+        if ttl <= 0:
+            return
+        key = (address, objid)
+        self._cache[key] = (self._cache_clock() + self._real_cache_ttl(ttl), value)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self._cache_max_entries:
+            self._cache.popitem(last=False)
+
+# endregion
+
+# region 統計関連
+
+    def stats(self):
+        """通信の統計を取得する
+
+        Returns:
+            dict: 要求の結果別の回数（counters）、応答待ちの要求数（in_flight）、
+                通信先のDeviceごと（by_device）・オブジェクトの種別ごと（by_object_type）の応答時間[sec]の分布、
+                相乗りした読み取り・送信した書き込み・抑制した書き込みの回数
+        """
+        snapshot = self.statistics.snapshot()
+        snapshot['coalesced_reads'] = self.coalesced_read_count
+        snapshot['sent_writes'] = self.sent_write_count
+        snapshot['suppressed_writes'] = self.suppressed_write_count
+        return snapshot
 
-        # BACnetコントローラを用意
-        ipv4_address = IPv4Address(device_ip, int(0xBAC0 + id))
-        self.bacdevice = NormalApplication(this_device, ipv4_address)
+# endregion
+
+# region 書き込み抑制関連
+
+    def enable_write_suppression(self, refresh_interval_sec:float = 60.0):
+        """最後に書き込んだ値と同じ値の書き込みを抑制する
+
+        Args:
+            refresh_interval_sec (float): 同じ値であっても再度書き込むまでの時間[sec]（0以下の場合には再度書き込まない）
+        """
+        self._write_refresh_interval = refresh_interval_sec
+        self._write_shadow = {}
+
+    def disable_write_suppression(self):
+        """書き込みの抑制を無効にする
+        """
+        self._write_shadow = None
+
+    def clear_write_shadow(self, addr:Union[str,Address] = None, obj_id:Union[str,ObjectIdentifier] = None):
+        """最後に書き込んだ値の記録を消去し、次回の書き込みを必ず送信させる
+
+        Args:
+            addr (Union[str,Address]): 通信先のBACnet Deviceのアドレス（Noneの場合には全て消去する）
+            obj_id (Union[str,ObjectIdentifier]): 通信先のBACnet DeviceのオブジェクトID（Noneの場合には全て消去する）
+        """
+        if self._write_shadow is None:
+            return
+        if addr is None or obj_id is None:
+            self._write_shadow.clear()
+        else:
+            self._write_shadow.pop((self._to_address(addr), self._to_object_identifier(obj_id)), None)
+
+    def _is_redundant_write(self, address:Address, objid:ObjectIdentifier, value):
+        if self._write_shadow is None:
+            return False
+        entry = self._write_shadow.get((address, objid))
+        if entry is None:
+            return False
+        last_value, written_time = entry
+        if 0 < self._write_refresh_interval <= time.monotonic() - written_time:
+            return False
+        return last_value == value
+
+    def _update_write_shadow(self, address:Address, objid:ObjectIdentifier, value, success:bool):
+        if self._write_shadow is None:
+            return
+        # 失敗した場合には機器の状態が不明であるため次回は必ず送信する
+        if success:
+            self._write_shadow[(address, objid)] = (value, time.monotonic())
+        else:
+            self._write_shadow.pop((address, objid), None)
+
+# endregion
 
 # region readproperty関連
 
-    async def read_present_value(self, addr:str, obj_id:str):
+    async def read_present_value(self, addr:Union[str,Address], obj_id:Union[str,ObjectIdentifier], time_out_sec:float = None):
         """Read property requestでPresent valueを読み取る（同期処理）
 
+        キャッシュが有効な場合には有効期間内の値を返す。
+        同じHubで同一のオブジェクトに対する読み取りが応答待ちの場合には、新たに要求を送らずにその結果を共有する。
+
         Args:
-            addr (string): 通信先のBACnet Deviceのアドレス（xxx.xxx.xxx.xxx:port）
-            obj_id (string): 通信先のBACnet DeviceのオブジェクトID
+            addr (Union[str,Address]): 通信先のBACnet Deviceのアドレス（xxx.xxx.xxx.xxx:port）
+            obj_id (Union[str,ObjectIdentifier]): 通信先のBACnet DeviceのオブジェクトID
+            time_out_sec (float): この要求のタイムアウトまでの時間[sec]。Noneの場合にはインスタンスの設定値
 
         Returns:
-            list: 読み取り成功の真偽, Present value
+            list: 読み取り成功の真偽, Present value（失敗時はErrorRejectAbortNackまたはTimeoutError）
         """
 
-        try:
-            response = await self.bacdevice.read_property(
-                address=Address(addr),
-                objid=ObjectIdentifier(obj_id),
-                prop='present-value'
-            )
+        address = self._to_address(addr)
+        objid = self._to_object_identifier(obj_id)
+
+        # キャッシュが有効期間内であれば通信しない
+        hit, value = self._get_cached_value(address, objid)
+        if hit:
+            return True, value
+
+        # 応答待ちの同一要求があれば相乗りする（呼び出し元のキャンセルが共有の要求に波及しないようにshieldする）
+        key = (address, objid, 'present-value')
+        future = self.hub.in_flight_reads.get(key)
+        if future is not None:
+            self.coalesced_read_count += 1
+            return await asyncio.shield(future)
 
-            if isinstance(response, DateTime):
-                return True, datetime.datetime(
-                    year=1900 + response.date[0],
-                    month=response.date[1],
-                    day=response.date[2],
-                    hour=response.time[0],
-                    minute=response.time[1],
-                    second=response.time[2],
-                    microsecond=10000 * response.time[3]) # Hundredths (BACnet標準) -> microsecond
+        epoch = self._cache_epoch
+        future = asyncio.ensure_future(self._read_present_value(address, objid, time_out_sec))
+        self.hub.in_flight_reads[key] = future
+        future.add_done_callback(lambda f: self.hub.in_flight_reads.pop(key) if self.hub.in_flight_reads.get(key) is f else None)
+        result = await asyncio.shield(future)
+        if result[0]:
+            self._set_cached_value(address, objid, result[1], epoch)
+        return result
+
+    async def _read_present_value(self, address:Address, objid:ObjectIdentifier, time_out_sec:float = None):
+        """Present valueを読み取る
+
+        同じイベントループの周回でこのインスタンスから同じ通信先に同じタイムアウトで要求された読み取りは、まとめてReadPropertyMultipleで読み取る。
+        1点だけの場合と、通信先がReadPropertyMultipleを受け付けない場合にはRead property requestで読み取る。
+
+        Args:
+            address (Address): 通信先のBACnet Deviceのアドレス
+            objid (ObjectIdentifier): 通信先のBACnet DeviceのオブジェクトID
+            time_out_sec (float): この要求のタイムアウトまでの時間[sec]
+
+        Returns:
+            list: 読み取り成功の真偽, Present value（失敗時はErrorRejectAbortNackまたはTimeoutError）
+        """
+        if address in self.hub.rpm_unsupported:
+            return await self._read_present_value_single(address, objid, time_out_sec)
+
+        key = (address, self.time_out if time_out_sec is None else time_out_sec)
+        batch = self._read_batches.get(key)
+        if batch is None:
+            # 同じ周回で届く他の読み取りを待ってから送る
+            batch = self._read_batches[key] = {}
+            asyncio.get_running_loop().call_soon(asyncio.ensure_future, self._flush_read_batch(key))
+        future = batch.get(objid)
+        if future is None:
+            future = batch[objid] = asyncio.get_running_loop().create_future()
+        return await future
+
+    async def _flush_read_batch(self, key):
+        batch = self._read_batches.pop(key)
+        address, time_out_sec = key
+        objids = list(batch)
+        try:
+            if len(objids) == 1:
+                results = {objids[0]: await self._read_present_value_single(address, objids[0], time_out_sec)}
             else:
-                return True, response
-        except ErrorRejectAbortNack as err:
+                results = {}
+                chunk_size = await self._get_chunk_size(address, self.RPM_BYTES_PER_POINT, False)
+                for chunk_result in await asyncio.gather(*[
+                    self._read_present_value_chunk(address, objids[i:i + chunk_size], time_out_sec)
+                    for i in range(0, len(objids), chunk_size)
+                ]):
+                    results.update(chunk_result)
+            for objid, future in batch.items():
+                if not future.done():
+                    future.set_result(results[objid])
+        except BaseException as err:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(err)
+            raise
+
+    async def _read_present_value_single(self, address:Address, objid:ObjectIdentifier, time_out_sec:float = None):
+        """Read property requestを送信してPresent valueを読み取る
+
+        Args:
+            address (Address): 通信先のBACnet Deviceのアドレス
+            objid (ObjectIdentifier): 通信先のBACnet DeviceのオブジェクトID
+            time_out_sec (float): この要求のタイムアウトまでの時間[sec]
+
+        Returns:
+            list: 読み取り成功の真偽, Present value（失敗時はErrorRejectAbortNackまたはTimeoutError）
+        """
+
+        request = ReadPropertyRequest(
+            objectIdentifier=objid,
+            propertyIdentifier='present-value',
+            destination=address
+        )
+
+        try:
+            response = await self._request(request, time_out_sec)
+            property_type = await self._get_present_value_type(address, objid)
+            value = response.propertyValue.cast_out(property_type, null=issubclass(property_type, Atomic))
+            return True, self._convert_value(value)
+        except (ErrorRejectAbortNack, TimeoutError) as err:
             return False, err
 
+    async def read_present_values(self, addr:Union[str,Address], obj_ids:list, time_out_sec:float = None, use_cache:bool = True):
+        """Read property multiple requestで複数のPresent valueを一括で読み取る
+
+        1回の要求に収まる点数は自身と通信先のDeviceのAPDU長・セグメント化の設定から決める。
+        通信先がReadPropertyMultipleを受け付けなかった場合には1点ずつ読み取る。
+        他の読み取りとまとめずに、この呼び出しのための要求を送る。
+
+        Args:
+            addr (Union[str,Address]): 通信先のBACnet Deviceのアドレス（xxx.xxx.xxx.xxx:port）
+            obj_ids (list): 通信先のBACnet DeviceのオブジェクトID（strまたはObjectIdentifier）のリスト
+            time_out_sec (float): 1要求あたりのタイムアウトまでの時間[sec]。Noneの場合にはインスタンスの設定値
+            use_cache (bool): キャッシュの値を使うか否か（Falseの場合には必ず通信先から読み取る。読み取った値はキャッシュに反映する）
+
+        Returns:
+            list: obj_idsと同じ順序の[読み取り成功の真偽, Present value]のリスト
+        """
+
+        address = self._to_address(addr)
+        objids = [self._to_object_identifier(obj_id) for obj_id in obj_ids]
+
+        # 重複とキャッシュが有効なものを除いて要求を分割
+        results = {}
+        for objid in dict.fromkeys(objids):
+            hit, value = self._get_cached_value(address, objid) if use_cache else (False, None)
+            if hit:
+                results[objid] = (True, value)
+        unique_objids = [objid for objid in dict.fromkeys(objids) if objid not in results]
+        if len(unique_objids) == 0:
+            return [results[objid] for objid in objids]
+
+        epoch = self._cache_epoch
+        chunk_size = await self._get_chunk_size(address, self.RPM_BYTES_PER_POINT, False)
+        chunk_results = await asyncio.gather(*[
+            self._read_present_value_chunk(address, unique_objids[i:i + chunk_size], time_out_sec)
+            for i in range(0, len(unique_objids), chunk_size)
+        ])
+        for chunk_result in chunk_results:
+            results.update(chunk_result)
+            for objid, result in chunk_result.items():
+                if result[0]:
+                    self._set_cached_value(address, objid, result[1], epoch)
+
+        return [results[objid] for objid in objids]
+
+    async def _read_present_value_chunk(self, address:Address, objids:list, time_out_sec:float):
+        request = ReadPropertyMultipleRequest(
+            listOfReadAccessSpecs=[
+                ReadAccessSpecification(
+                    objectIdentifier=objid,
+                    listOfPropertyReferences=[PropertyReference(propertyIdentifier='present-value')]
+                )
+                for objid in objids
+            ],
+            destination=address
+        )
+
+        try:
+            response = await self._request(request, time_out_sec)
+        except TimeoutError as err:
+            return {objid: (False, err) for objid in objids}
+        # 要求全体が失敗した場合には1点ずつ読み取る（受け付けられなかった場合には以降も1点ずつ読み取る）
+        except ErrorRejectAbortNack as err:
+            if isinstance(err, RejectPDU):
+                self.hub.rpm_unsupported.add(address)
+            values = await asyncio.gather(*[self._read_present_value_single(address, objid, time_out_sec) for objid in objids])
+            return dict(zip(objids, values))
+
+        results = {}
+        for read_access_result in response.listOfReadAccessResults:
+            objid = read_access_result.objectIdentifier
+            for element in read_access_result.listOfResults:
+                read_result = element.readResult
+                if read_result.propertyAccessError:
+                    # 1点ずつ読み取った場合と同じ型（Read property requestのError）にそろえる
+                    error = read_result.propertyAccessError
+                    results[objid] = (False, error_types[ConfirmedServiceChoice.readProperty](errorClass=error.errorClass, errorCode=error.errorCode, source=address))
+                else:
+                    property_type = await self._get_present_value_type(address, objid)
+                    value = read_result.propertyValue.cast_out(property_type, null=issubclass(property_type, Atomic))
+                    results[objid] = (True, self._convert_value(value))
+
+        # 応答に含まれなかった点は失敗扱い
+        for objid in objids:
+            if objid not in results:
+                results[objid] = (False, None)
+        return results
+
+    async def _get_chunk_size(self, address:Address, bytes_per_point:int, is_request:bool):
+        """一括要求（ReadPropertyMultiple/WritePropertyMultiple）の1要求あたりの点数を決める
+
+        Args:
+            address (Address): 通信先のBACnet Deviceのアドレス
+            bytes_per_point (int): 1点あたりのバイト数の見積もり
+            is_request (bool): 要求側のAPDU長で決まるか否か（WritePropertyMultiple）。偽の場合は応答側（ReadPropertyMultiple）
+        """
+
+        # 自身が送受信できるAPDU長・セグメント数
+        local_segmentations = (Segmentation.segmentedBoth, Segmentation.segmentedTransmit if is_request else Segmentation.segmentedReceive)
+        max_apdu = self.this_device.maxApduLengthAccepted
+        max_segments = 1
+        if self.this_device.segmentationSupported in local_segmentations:
+            max_segments = self.this_device.maxSegmentsAccepted or 1
+
+        # 通信先の情報が既知であれば小さい方に合わせる
+        remote_segmentations = (Segmentation.segmentedBoth, Segmentation.segmentedReceive if is_request else Segmentation.segmentedTransmit)
+        device_info = await self.bacdevice.device_info_cache.get_device_info(address)
+        if device_info is None:
+            max_segments = 1
+        else:
+            max_apdu = min(max_apdu, device_info.max_apdu_length_accepted)
+            if device_info.segmentation_supported not in remote_segmentations:
+                max_segments = 1
+            elif device_info.max_segments_accepted:
+                max_segments = min(max_segments, device_info.max_segments_accepted)
+
+        size = (max_apdu * max_segments - self.MULTIPLE_HEADER_BYTES) // bytes_per_point
+        return max(1, size)
+
+    def _convert_value(self, value):
+        """BACnetの値をPythonの値に変換する"""
+
+        if isinstance(value, DateTime):
+            return datetime.datetime(
+                year=1900 + value.date[0],
+                month=value.date[1],
+                day=value.date[2],
+                hour=value.time[0],
+                minute=value.time[1],
+                second=value.time[2],
+                microsecond=10000 * value.time[3]) # Hundredths (BACnet標準) -> microsecond
+        else:
+            return value
+
 # endregion
 
 # region writeproperty関連
 
-    async def write_present_value(self, addr:str, obj_id:str, value:Union[Real,Integer,DateTime]):
+    async def write_present_value(self, addr:Union[str,Address], obj_id:Union[str,ObjectIdentifier], value:Union[Real,Integer,DateTime], time_out_sec:float = None):
         """Write property requestでPresent valueを書き込む（同期処理）
 
         Args:
-            addr (string): 通信先のBACnet Deviceのアドレス（xxx.xxx.xxx.xxx:port）
-            obj_id (string): 通信先のBACnet DeviceのオブジェクトID
+            addr (Union[str,Address]): 通信先のBACnet Deviceのアドレス（xxx.xxx.xxx.xxx:port）
+            obj_id (Union[str,ObjectIdentifier]): 通信先のBACnet DeviceのオブジェクトID
             value (Union[Real,Boolean,Integer,DateTime]): Present value
+            time_out_sec (float): この要求のタイムアウトまでの時間[sec]。Noneの場合にはインスタンスの設定値
 
         Returns:
-            bool: 書き込み成功の真偽
+            bool: 書き込み成功の真偽, 失敗時のエラー（ErrorRejectAbortNackまたはTimeoutError）
         """        
 
+        address = self._to_address(addr)
+        objid = self._to_object_identifier(obj_id)
+
+        # 書き込み抑制が有効で、最後に書き込んだ値と同じであれば送信しない
+        if self._is_redundant_write(address, objid, value):
+            self.suppressed_write_count += 1
+            return True, None
+
+        self.sent_write_count += 1
+        result = await self._write_present_value(address, objid, value, time_out_sec)
+        self._update_write_shadow(address, objid, value, result[0])
+        return result
+
+    async def _write_present_value(self, address:Address, objid:ObjectIdentifier, value, time_out_sec:float = None):
+        """Write property requestを送信してPresent valueを書き込む
+
+        Args:
+            address (Address): 通信先のBACnet Deviceのアドレス
+            objid (ObjectIdentifier): 通信先のBACnet DeviceのオブジェクトID
+            value (Union[Real,Boolean,Integer,DateTime]): Present value
+            time_out_sec (float): この要求のタイムアウトまでの時間[sec]
+
+        Returns:
+            bool: 書き込み成功の真偽, 失敗時のエラー（ErrorRejectAbortNackまたはTimeoutError）
+        """
+
         try:
-            await self.bacdevice.write_property(
-                address=Address(addr),
-                objid=ObjectIdentifier(obj_id),
-                prop='present-value',
-                value=value
+            request = WritePropertyRequest(
+                objectIdentifier=objid,
+                propertyIdentifier='present-value',
+                propertyValue=await self._to_any(address, objid, value),
+                destination=address
             )
+            await self._request(request, time_out_sec)
             return True, None
-        except ErrorRejectAbortNack as err:
+        except (ErrorRejectAbortNack, TimeoutError) as err:
             return False, err
+        finally:
+            # 書き込みの成否によらず値が変わった可能性があるためキャッシュを破棄する
+            self._invalidate(address, objid)
+
+    async def write_present_values(self, addr:Union[str,Address], values:list, time_out_sec:float = None):
+        """Write property multiple requestで複数のPresent valueを一括で書き込む
+
+        1回の要求に収まる点数は自身と通信先のDeviceのAPDU長・セグメント化の設定から決める。
+        通信先がWritePropertyMultipleを受け付けなかった場合には1点ずつ並行して書き込む。
+
+        Args:
+            addr (Union[str,Address]): 通信先のBACnet Deviceのアドレス（xxx.xxx.xxx.xxx:port）
+            values (list): (オブジェクトID, Present value)のリスト
+            time_out_sec (float): 1要求あたりのタイムアウトまでの時間[sec]。Noneの場合にはインスタンスの設定値
+
+        Returns:
+            list: valuesと同じ順序の[書き込み成功の真偽, 失敗時のエラー]のリスト
+        """
+
+        address = self._to_address(addr)
+        items = [(self._to_object_identifier(obj_id), value) for obj_id, value in values]
+
+        # 書き込み抑制が有効で、最後に書き込んだ値と同じものは送信しない
+        results = [(True, None)] * len(items)
+        indices = [i for i, (objid, value) in enumerate(items) if not self._is_redundant_write(address, objid, value)]
+        self.suppressed_write_count += len(items) - len(indices)
+        self.sent_write_count += len(indices)
+        if len(indices) == 0:
+            return results
+        pending = [items[i] for i in indices]
+
+        if address in self.hub.wpm_unsupported:
+            pending_results = await self._write_present_values_individually(address, pending, time_out_sec)
+        else:
+            chunk_size = await self._get_chunk_size(address, self.WPM_BYTES_PER_POINT, True)
+            try:
+                chunk_results = await asyncio.gather(*[
+                    self._write_present_value_chunk(address, pending[i:i + chunk_size], time_out_sec)
+                    for i in range(0, len(pending), chunk_size)
+                ])
+                pending_results = [result for chunk_result in chunk_results for result in chunk_result]
+            finally:
+                for objid, value in pending:
+                    self._invalidate(address, objid)
+
+        for i, (objid, value), result in zip(indices, pending, pending_results):
+            self._update_write_shadow(address, objid, value, result[0])
+            results[i] = result
+        return results
+
+    async def _write_present_value_chunk(self, address:Address, items:list, time_out_sec:float):
+        request = WritePropertyMultipleRequest(
+            listOfWriteAccessSpecs=[
+                WriteAccessSpecification(
+                    objectIdentifier=objid,
+                    listOfProperties=[PropertyValue(propertyIdentifier='present-value', value=await self._to_any(address, objid, value))]
+                )
+                for objid, value in items
+            ],
+            destination=address
+        )
+
+        try:
+            await self._request(request, time_out_sec)
+            return [(True, None)] * len(items)
+
+        except TimeoutError as err:
+            return [(False, err)] * len(items)
+
+        # 途中で失敗した場合には、失敗した点より前は書き込み済、後は1点ずつ書き込む
+        except WritePropertyMultipleError as err:
+            failed_objid = err.firstFailedWriteAttempt.objectIdentifier
+            for i, (objid, value) in enumerate(items):
+                if objid == failed_objid:
+                    rest = await self._write_present_values_individually(address, items[i + 1:], time_out_sec)
+                    return [(True, None)] * i + [(False, err)] + rest
+            return await self._write_present_values_individually(address, items, time_out_sec)
+
+        # WritePropertyMultipleが受け付けられなかった場合には1点ずつ書き込む
+        except RejectPDU:
+            self.hub.wpm_unsupported.add(address)
+            return await self._write_present_values_individually(address, items, time_out_sec)
+        except ErrorRejectAbortNack:
+            return await self._write_present_values_individually(address, items, time_out_sec)
+
+    async def _write_present_values_individually(self, address:Address, items:list, time_out_sec:float):
+        return list(await asyncio.gather(*[self._write_present_value(address, objid, value, time_out_sec) for objid, value in items]))
+
+    async def _to_any(self, address:Address, objid:ObjectIdentifier, value):
+        """書き込む値をPresent valueの型に合わせてAnyに格納する"""
+
+        property_type = await self._get_present_value_type(address, objid)
+        if not isinstance(value, property_type):
+            value = property_type(value)
+        return Any(value)
+
+# endregion
+
+# region 通信処理
+
+    async def _request(self, request, time_out_sec:float = None):
+        """確認型サービスの要求を送り、応答を待つ
+
+        通信先ごとの同時要求数はHubの上限（max_in_flight）までに制限され、超えた要求は空きを待つ。
+        応答がタイムアウトした場合やAbortされた場合には再試行の方針に従って再送する。
+        タイムアウトした要求は処理を中止し、Invoke IDを解放する。
+        再試行を含めた応答時間（送信枠の空きを待った時間を除く）と結果はstatisticsに記録する。
+
+        Args:
+            request (ConfirmedRequestSequence): 要求
+            time_out_sec (float): 1回の試行あたりのタイムアウトまでの時間[sec]。Noneの場合にはインスタンスの設定値
+
+        Returns:
+            APDU: 応答
+
+        Raises:
+            ErrorRejectAbortNack: 通信先からError/Reject/Abortが返された場合
+            TimeoutError: 再試行を含めて応答が得られなかった場合
+        """
+
+        time_out = self.time_out if time_out_sec is None else time_out_sec
+        window = self.hub.get_window(request.pduDestination)
+        attempt = 0
+        # 統計には最初に送信してからの時間を記録し、送信枠の空きを待った時間は含めない
+        start = None
+        queued = 0.0
+        error = None
+        try:
+            while True:
+                # 通信先ごとの同時要求数の上限に達している場合には空きを待つ
+                waited = time.perf_counter()
+                async with window:
+                    if start is None:
+                        self.statistics.begin()
+                        start = time.perf_counter()
+                    else:
+                        queued += time.perf_counter() - waited
+                    # 再試行時には新しいInvoke IDを使う
+                    request.apduInvokeID = None
+                    try:
+                        return await asyncio.wait_for(self.bacdevice.request(request), time_out)
+                    except asyncio.TimeoutError:
+                        self._abort_transaction(request)
+                        error = TimeoutError('no response from ' + str(request.pduDestination) + ' within ' + str(time_out) + ' sec')
+                    except AbortPDU as err:
+                        error = err
+
+                if not self.retry_policy.should_retry(attempt, error):
+                    raise error
+                error = None
+                await asyncio.sleep(self.retry_policy.get_delay(attempt))
+                attempt += 1
+        except BaseException as err:
+            error = err
+            raise
+        finally:
+            # 送信前に取り消された要求は記録しない
+            if start is not None:
+                objid = getattr(request, 'objectIdentifier', None) or getattr(request, 'monitoredObjectIdentifier', None)
+                self.statistics.end(
+                    type(request).__name__,
+                    str(request.pduDestination),
+                    str(objid[0]) if objid is not None else 'multiple',
+                    time.perf_counter() - start - queued,
+                    error
+                )
+
+    def _abort_transaction(self, request):
+        """タイムアウトした要求のトランザクションを中止する"""
+
+        for tr in list(self.bacdevice.asap.clientTransactions):
+            if tr.invokeID == request.apduInvokeID and tr.pdu_address == request.pduDestination:
+                if tr.state not in (COMPLETED, ABORTED):
+                    tr.set_state(ABORTED)
+
+    @staticmethod
+    def _to_address(addr:Union[str,Address]):
+        """通信先のアドレスをAddressに変換する（事前に解析済みの場合にはそのまま返す）
+
+        Args:
+            addr (Union[str,Address]): 通信先のBACnet Deviceのアドレス
+
+        Returns:
+            Address: 通信先のBACnet Deviceのアドレス
+        """
+        return addr if isinstance(addr, Address) else Address(addr)
+
+    @staticmethod
+    def _to_object_identifier(obj_id:Union[str,ObjectIdentifier]):
+        """オブジェクトIDをObjectIdentifierに変換する（事前に解析済みの場合にはそのまま返す）
+
+        Args:
+            obj_id (Union[str,ObjectIdentifier]): 通信先のBACnet DeviceのオブジェクトID
+
+        Returns:
+            ObjectIdentifier: 通信先のBACnet DeviceのオブジェクトID
+        """
+        return obj_id if isinstance(obj_id, ObjectIdentifier) else ObjectIdentifier(obj_id)
+
+    async def _get_present_value_type(self, address:Address, objid:ObjectIdentifier):
+        """Present valueのデータ型を取得する"""
+
+        vendor_info = await self.bacdevice.get_vendor_info(device_address=address)
+        key = (vendor_info.vendor_identifier, objid[0])
+        property_type = self._present_value_types.get(key)
+        if property_type is None:
+            object_class = vendor_info.get_object_class(objid[0])
+            property_type = object_class.get_property_type(PropertyIdentifier.presentValue)
+            self._present_value_types[key] = property_type
+        return property_type
 
 # endregion
 
@@ -118,25 +862,30 @@ async def main():
 
     # read property
     pValue = await pv_rw.read_present_value(addr='127.0.0.1:47817', obj_id='analog-value,4')
-    print('Read property ' + ('success, value=' + str(pValue[1]) if pValue[0] else ('failed because of ' + str(pValue[1].reason))))
+    print('Read property ' + ('success, value=' + str(pValue[1]) if pValue[0] else ('failed because of ' + str(pValue[1]))))
     pValue = await pv_rw.read_present_value(addr='127.0.0.1:47817', obj_id='analog-output,5')
-    print('Read property ' + ('success, value=' + str(pValue[1]) if pValue[0] else ('failed because of ' + str(pValue[1].reason))))
+    print('Read property ' + ('success, value=' + str(pValue[1]) if pValue[0] else ('failed because of ' + str(pValue[1]))))
     pValue = await pv_rw.read_present_value(addr='127.0.0.1:47817', obj_id='analog-input,6')
-    print('Read property ' + ('success, value=' + str(pValue[1]) if pValue[0] else ('failed because of ' + str(pValue[1].reason))))
+    print('Read property ' + ('success, value=' + str(pValue[1]) if pValue[0] else ('failed because of ' + str(pValue[1]))))
     pValue = await pv_rw.read_present_value(addr='127.0.0.1:47817', obj_id='binary-value,7')
-    print('Read property ' + ('success, value=' + str(pValue[1]) if pValue[0] else ('failed because of ' + str(pValue[1].reason))))
+    print('Read property ' + ('success, value=' + str(pValue[1]) if pValue[0] else ('failed because of ' + str(pValue[1]))))
     pValue = await pv_rw.read_present_value(addr='127.0.0.1:47817', obj_id='binary-output,8')
-    print('Read property ' + ('success, value=' + str(pValue[1]) if pValue[0] else ('failed because of ' + str(pValue[1].reason))))
+    print('Read property ' + ('success, value=' + str(pValue[1]) if pValue[0] else ('failed because of ' + str(pValue[1]))))
     pValue = await pv_rw.read_present_value(addr='127.0.0.1:47817', obj_id='binary-input,9')
-    print('Read property ' + ('success, value=' + str(pValue[1]) if pValue[0] else ('failed because of ' + str(pValue[1].reason))))
+    print('Read property ' + ('success, value=' + str(pValue[1]) if pValue[0] else ('failed because of ' + str(pValue[1]))))
     pValue = await pv_rw.read_present_value(addr='127.0.0.1:47817', obj_id='multi-state-value,10')
-    print('Read property ' + ('success, value=' + str(pValue[1]) if pValue[0] else ('failed because of ' + str(pValue[1].reason))))
+    print('Read property ' + ('success, value=' + str(pValue[1]) if pValue[0] else ('failed because of ' + str(pValue[1]))))
     pValue = await pv_rw.read_present_value(addr='127.0.0.1:47817', obj_id='multi-state-output,11')
-    print('Read property ' + ('success, value=' + str(pValue[1]) if pValue[0] else ('failed because of ' + str(pValue[1].reason))))
+    print('Read property ' + ('success, value=' + str(pValue[1]) if pValue[0] else ('failed because of ' + str(pValue[1]))))
     pValue = await pv_rw.read_present_value(addr='127.0.0.1:47817', obj_id='multi-state-input,12')
-    print('Read property ' + ('success, value=' + str(pValue[1]) if pValue[0] else ('failed because of ' + str(pValue[1].reason))))
+    print('Read property ' + ('success, value=' + str(pValue[1]) if pValue[0] else ('failed because of ' + str(pValue[1]))))
     pValue = await pv_rw.read_present_value(addr='127.0.0.1:47817', obj_id='datetime-value,13')
-    print('Read property ' + ('success, value=' + str(pValue[1]) if pValue[0] else ('failed because of ' + str(pValue[1].reason))))
+    print('Read property ' + ('success, value=' + str(pValue[1]) if pValue[0] else ('failed because of ' + str(pValue[1]))))
+
+    # read property multiple
+    pValues = await pv_rw.read_present_values(addr='127.0.0.1:47817', obj_ids=['analog-value,4', 'analog-output,5', 'analog-input,6'])
+    for pValue in pValues:
+        print('Read property multiple ' + ('success, value=' + str(pValue[1]) if pValue[0] else ('failed because of ' + str(pValue[1]))))
 
     #write property
     success = await pv_rw.write_present_value('127.0.0.1:47817', 'analogValue:1', Integer(3))
@@ -164,6 +913,11 @@ async def main():
     success = await pv_rw.write_present_value('127.0.0.1:47817', 'multiStateInput:12', Unsigned(1))
     print('Writing multiStateInput ' + ('success' if success[0] else ('failed because of ' + str(success[1]))))
 
+    # write property multiple
+    successes = await pv_rw.write_present_values('127.0.0.1:47817', [('analogValue:4', Real(3)), ('binaryValue:7', Enumerated(1)), ('multiStateValue:10', Unsigned(3))])
+    for success in successes:
+        print('Writing property multiple ' + ('success' if success[0] else ('failed because of ' + str(success[1]))))
+
 
 if __name__ == "__main__":
     asyncio.run(main())
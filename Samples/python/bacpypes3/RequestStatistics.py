@@ -0,0 +1,191 @@
+import asyncio
+import bisect
+
+from bacpypes3.apdu import RejectPDU, AbortPDU
+
+class LatencyHistogram():
+    """応答時間の分布を対数間隔の区間で集計するヒストグラム
+
+    区間の度数だけを保持するため、記録の回数によらず使用するメモリは一定である。
+    """
+
+    # 区間の境界[sec]（0.1 msから約30 secまで、1区間ごとに約1.25倍）
+    BOUNDS = [0.0001 * (1.25 ** i) for i in range(57)]
+
+    def __init__(self):
+        """インスタンスを初期化する
+        """
+        self.counts = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, latency:float):
+        """応答時間を記録する
+
+        Args:
+            latency (float): 応答時間[sec]
+        """
+        self.counts[bisect.bisect_left(self.BOUNDS, latency)] += 1
+        self.count += 1
+        self.total += latency
+        if self.max < latency:
+            self.max = latency
+
+    def percentile(self, p:float):
+        """応答時間のパーセンタイル値を取得する（区間の上端で近似する）
+
+        Args:
+            p (float): パーセンタイル（0～100）
+
+        Returns:
+            float: 応答時間[sec]（記録が無い場合にはNone）
+        """
+        if self.count == 0:
+            return None
+        rank = p / 100.0 * self.count
+        cumulative = 0
+        for i, n in enumerate(self.counts):
+            cumulative += n
+            if rank <= cumulative and 0 < n:
+                return min(self.BOUNDS[i], self.max) if i < len(self.BOUNDS) else self.max
+        return self.max
+
+    def snapshot(self):
+        """集計結果を取得する
+
+        Returns:
+            dict: 回数, 平均, 最大, p50, p95, p99[sec]
+        """
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if 0 < self.count else None,
+            'max': self.max if 0 < self.count else None,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+        }
+
+class RequestStatistics():
+    """BACnet要求の応答時間と結果を集計するクラス
+
+    通信先のDeviceごと・オブジェクトの種別ごとの応答時間のヒストグラム、結果別の回数、応答待ちの要求数を保持する。
+    要求が完了するたびに登録されたシンクに記録を渡す。
+    """
+
+    # 結果の種別
+    SUCCESS = 'success'
+    ERROR = 'error'
+    REJECT = 'reject'
+    ABORT = 'abort'
+    TIMEOUT = 'timeout'
+    CANCELLED = 'cancelled'
+
+    def __init__(self):
+        """インスタンスを初期化する
+        """
+        self.in_flight = 0
+        self.reset()
+        self.__sinks = []
+
+    def reset(self):
+        """集計結果を消去する（応答待ちの要求数は消去しない）
+        """
+        self.counters = {self.SUCCESS: 0, self.ERROR: 0, self.REJECT: 0, self.ABORT: 0, self.TIMEOUT: 0, self.CANCELLED: 0}
+        self.max_in_flight = self.in_flight
+        self.sink_errors = 0
+        self.__by_device = {}
+        self.__by_object_type = {}
+
+    def add_sink(self, sink):
+        """要求が完了するたびに呼ばれる関数を登録する
+
+        Args:
+            sink (function): 記録を受け取る関数。引数は以下の通り。
+                dict: service, device, object_type, latency[sec], outcome
+        """
+        self.__sinks.append(sink)
+
+    def remove_sink(self, sink):
+        """登録した関数を取り除く
+
+        Args:
+            sink (function): 取り除く関数
+        """
+        if sink in self.__sinks:
+            self.__sinks.remove(sink)
+
+    def begin(self):
+        """要求の送信を記録する
+        """
+        self.in_flight += 1
+        if self.max_in_flight < self.in_flight:
+            self.max_in_flight = self.in_flight
+
+    def end(self, service:str, device:str, object_type:str, latency:float, error:BaseException = None):
+        """要求の完了を記録する
+
+        Args:
+            service (str): サービスの種類（ReadPropertyRequestなど）
+            device (str): 通信先のBACnet Deviceのアドレス
+            object_type (str): オブジェクトの種別（複数のオブジェクトを対象とする場合には'multiple'）
+            latency (float): 応答時間[sec]
+            error (BaseException): 失敗の原因（成功時はNone）
+        """
+        self.in_flight -= 1
+        outcome = self.classify(error)
+        self.counters[outcome] += 1
+
+        histogram = self.__by_device.get(device)
+        if histogram is None:
+            histogram = self.__by_device[device] = LatencyHistogram()
+        histogram.add(latency)
+        histogram = self.__by_object_type.get(object_type)
+        if histogram is None:
+            histogram = self.__by_object_type[object_type] = LatencyHistogram()
+        histogram.add(latency)
+
+        if 0 < len(self.__sinks):
+            record = {'service': service, 'device': device, 'object_type': object_type, 'latency': latency, 'outcome': outcome}
+            for sink in self.__sinks:
+                # 記録先の例外で要求自体を失敗させない
+                try:
+                    sink(record)
+                except Exception:
+                    self.sink_errors += 1
+
+    def classify(self, error:BaseException):
+        """失敗の原因を結果の種別に分類する
+
+        Args:
+            error (BaseException): 失敗の原因（成功時はNone）
+
+        Returns:
+            str: 結果の種別
+        """
+        if error is None:
+            return self.SUCCESS
+        if isinstance(error, TimeoutError):
+            return self.TIMEOUT
+        if isinstance(error, asyncio.CancelledError):
+            return self.CANCELLED
+        if isinstance(error, RejectPDU):
+            return self.REJECT
+        if isinstance(error, AbortPDU):
+            return self.ABORT
+        return self.ERROR
+
+    def snapshot(self):
+        """集計結果を取得する
+
+        Returns:
+            dict: counters, in_flight, max_in_flight, by_device, by_object_type, sink_errors（記録先で発生した例外の数）
+        """
+        return {
+            'counters': dict(self.counters),
+            'in_flight': self.in_flight,
+            'max_in_flight': self.max_in_flight,
+            'by_device': {k: v.snapshot() for k, v in self.__by_device.items()},
+            'by_object_type': {k: v.snapshot() for k, v in self.__by_object_type.items()},
+            'sink_errors': self.sink_errors,
+        }
@@ -1,9 +1,16 @@
 import asyncio
 from VRFSystemCommunicator import VRFSystemCommunicator as vrc
+from ControllerSupervisor import ControllerSupervisor
 
 async def main():
     vCom = vrc(12)
 
+    # Suspend polling while the emulator is paused, poll at half rate while it is delayed, and stop when it has finished
+    supervisor = ControllerSupervisor(vCom, delayed_slowdown=2.0)
+    supervisor.add(control, vCom, supervisor)
+    await supervisor.run()
+
+async def control(vCom, supervisor):
     while True:
         print('Reading return air temperature of VRF1-2...',end='')
         rslt = await vCom.get_return_air_temperature(1,2)
@@ -46,6 +53,6 @@ async def main():
         print('success' if rslt[0] else 'failed')
 
         print('')
-        await asyncio.sleep(1)
+        await supervisor.sleep(1)
 
 asyncio.run(main())
\ No newline at end of file
@@ -1,10 +1,13 @@
-import datetime, asyncio
+import asyncio
 from VRFSystemCommunicator import VRFSystemCommunicator as vrc
 from VentilationSystemCommunicator import VentilationSystemCommunicator as vsc
+from BACnetHub import BACnetHub
 
 async def main():
-    vrCom = vrc(12)
-    vsCom = vsc(16)
+    # Share one BACnet socket between the communicators
+    hub = BACnetHub(12)
+    vrCom = vrc(12, hub=hub)
+    vsCom = vsc(16, hub=hub)
 
     # Enable current_date_time method
     print('Subscribe COV...')
@@ -13,10 +16,9 @@ async def main():
     # Number of indoor units in each VRF system
     i_unit_num = [5,4,5,4]
 
-    last_dt = vrCom.current_date_time()
-    while True:
+    # Wake up at 7:00 and 19:00 on weekdays (simulation time, paused while the emulator is paused)
+    async for dt in vrCom.cron(hour=(7, 19), minute=0, weekdays=range(5)):
         # Output current date and time
-        dt = vrCom.current_date_time()
         print(dt.strftime('%Y/%m/%d %H:%M:%S'))
 
         # Change mode, air flow direction, and set point temperature depends on season
@@ -26,7 +28,7 @@ async def main():
         sp = 26 if is_s else 22
 
         # When the HVAC changed to operating hours
-        if(not(is_hvac_time(last_dt)) and is_hvac_time(dt)):
+        if(dt.hour == 7):
             for i in range(len(i_unit_num)):
                 for j in range(i_unit_num[i]):
                     v_name = 'VRF' + str(i + 1) + '-' + str(j+1)
@@ -56,7 +58,7 @@ async def main():
                     print('success' if rslt[0] else 'failed: ' + rslt[1])
 
         # When the HVAC changed to stop hours
-        if(is_hvac_time(last_dt) and not(is_hvac_time(dt))):
+        if(dt.hour == 19):
             for i in range(len(i_unit_num)):
                 for j in range(i_unit_num[i]):
                     v_name = 'VRF' + str(i + 1) + '-' + str(j+1)
@@ -69,16 +71,5 @@ async def main():
                     rslt = await vsCom.stop_ventilation(i+1,j+1)
                     print('success' if rslt else 'failed')
 
-        last_dt = dt # Save last date and time
-        await asyncio.sleep(0.5)
-
-def is_hvac_time(dtime):
-    start_time = datetime.time(7, 0)
-    end_time = datetime.time(19, 0)   
-    now = dtime.time()
-    is_business_hour = start_time <= now <= end_time
-    is_weekday = (dtime.weekday() != 5 and dtime.weekday() != 6)
-    return is_weekday and is_business_hour
-
 if __name__ == "__main__":
     asyncio.run(main())
@@ -4,6 +4,9 @@ from VentilationSystemCommunicator import VentilationSystemCommunicator as vsc
 async def main():
     vsCom = vsc(26)
 
+    # Skip fan speed commands that have not changed (re-sent every 60 seconds)
+    vsCom.enable_write_suppression(refresh_interval_sec=60.0)
+
     # Enable current_date_time method
     print('Subscribe COV...')
     await vsCom.subscribe_date_time_cov()
@@ -11,9 +14,9 @@ async def main():
     # Number of indoor units in each VRF system
     i_unit_num = [5,4,5,4]
 
-    while True:
+    # Every 10 minutes in simulation time (paused while the emulator is paused)
+    async for dt in vsCom.every(datetime.timedelta(minutes=10)):
         # Output current date and time
-        dt = vsCom.current_date_time()
         print(dt.strftime('%Y/%m/%d %H:%M:%S'))
 
         if(is_hvac_time(dt)):
@@ -36,7 +39,7 @@ async def main():
                 fs = south_fs if i == 0 or i==1 else north_fs
                 for j in range(i_unit_num[i]):
                     val = await vsCom.change_fan_speed(i+1,j+1,fs)
-        await asyncio.sleep(1.0)
+            print('Writes sent: ' + str(vsCom.sent_write_count) + ', suppressed: ' + str(vsCom.suppressed_write_count))
 
 def get_fan_speed(co2_level):
     if co2_level < 600:
@@ -0,0 +1,566 @@
+import datetime
+import asyncio
+import argparse
+import math
+import time
+
+from bacpypes3.pdu import IPv4Address
+from bacpypes3.ipv4.app import NormalApplication
+from bacpypes3.basetypes import DateTime
+from bacpypes3.primitivedata import Date, Time
+from bacpypes3.object import DateTimeValueObject as _DateTimeValueObject
+from bacpypes3.local.object import Object as _Object
+from bacpypes3.local.cov import GenericCriteria
+from bacpypes3.local.device import DeviceObject
+from bacpypes3.local.analog import AnalogInputObject, AnalogOutputObject, AnalogValueObject as _AnalogValueObject
+from bacpypes3.local.binary import BinaryInputObject, BinaryOutputObject, BinaryValueObject as _BinaryValueObject
+from bacpypes3.local.multistate import MultiStateInputObject, MultiStateOutputObject, MultiStateValueObject as _MultiStateValueObject
+
+if __package__:
+    from .DateTimeCommunicator import DateTimeCommunicator
+    from .VRFSystemCommunicator import VRFSystemCommunicator
+    from .VentilationSystemCommunicator import VentilationSystemCommunicator
+    from .EnvironmentCommunicator import EnvironmentCommunicator
+    from .OccupantCommunicator import OccupantCommunicator
+else:
+    # スクリプトとして直接読み込まれた場合
+    from DateTimeCommunicator import DateTimeCommunicator
+    from VRFSystemCommunicator import VRFSystemCommunicator
+    from VentilationSystemCommunicator import VentilationSystemCommunicator
+    from EnvironmentCommunicator import EnvironmentCommunicator
+    from OccupantCommunicator import OccupantCommunicator
+
+class DateTimeValueObject(_Object, _DateTimeValueObject):
+    """COVに対応したDateTime Valueオブジェクト（bacpypes3.localに無いため用意する）
+    """
+    _cov_criteria = GenericCriteria
+
+class _WriteMonitor():
+    """WriteProperty要求による書き込みでもPresent valueの監視関数を呼ぶ
+
+    bacpypes3ではCommandableでないオブジェクト（Value系）への書き込みで監視関数が呼ばれないため用意する。
+    """
+
+    async def write_property(self, attr, value, index=None, priority=None):
+        old_value = self.presentValue
+        await super().write_property(attr, value, index, priority)
+        new_value = self.presentValue
+        if old_value != new_value:
+            for fn in self._property_monitors['presentValue']:
+                fn(old_value, new_value)
+
+class AnalogValueObject(_WriteMonitor, _AnalogValueObject):
+    pass
+
+class BinaryValueObject(_WriteMonitor, _BinaryValueObject):
+    pass
+
+class MultiStateValueObject(_WriteMonitor, _MultiStateValueObject):
+    pass
+
+class _StandInApplication(NormalApplication):
+    """Shizuku2と同様にWritePropertyMultipleをRejectするApplication
+    """
+    do_WritePropertyMultipleRequest = None
+
+class Shizuku2StandIn():
+    """Shizuku2の代わりにBACnet Deviceを提供する試験用のエミュレータクラス
+
+    DateTimeController, VRFController, WeatherMonitor, OccupantMonitor, VentilationController, Dummyを
+    Shizuku2と同じDevice ID・ポート・オブジェクト番号で提供し、簡易なモデルで値を変化させる。
+    熱・湿気・CO2の計算は一次遅れで近似した簡易なものであり、Shizuku2の計算結果とは一致しない。
+    """
+
+    # region 定数宣言
+
+    DUMMY_DEVICE_ID = 9
+
+    # 室外機ごとの室内機の台数
+    INDOOR_UNIT_NUMBERS = (5, 4, 5, 4)
+
+    # 各テナントが使う室外機の番号（南：1, 2、北：3, 4）
+    TENANT_OUTDOOR_UNITS = {1: (1, 2), 2: (3, 4)}
+
+    # 値を更新する現実の時間間隔[sec]
+    TICK_SEC = 0.5
+
+    # endregion
+
+    def __init__(self, emulator_ip:str = '127.0.0.1', acceleration_rate:int = 60, start_date_time:datetime.datetime = None, end_date_time:datetime.datetime = None):
+        """インスタンスを初期化する
+
+        Args:
+            emulator_ip (str): エミュレータのIP Address（xxx.xxx.xxx.xxx）
+            acceleration_rate (int): 加速度[-]
+            start_date_time (datetime): シミュレーション上の開始日時。Noneの場合には今年の8月1日0時
+            end_date_time (datetime): シミュレーション上の終了日時。Noneの場合には開始日時の1年後
+        """
+        self.emulator_ip = emulator_ip
+        if start_date_time is None:
+            start_date_time = datetime.datetime(datetime.datetime.today().year, 8, 1)
+        if end_date_time is None:
+            end_date_time = start_date_time + datetime.timedelta(days=365)
+
+        # 加速日時の状態
+        self.__acc_rate = acceleration_rate
+        self.__base_real_datetime = datetime.datetime.today()
+        self.__base_sim_datetime = start_date_time
+        self.__end_datetime = end_date_time
+        self.__pause_timer = 864000.0
+        self.__is_paused = False
+        self.__is_finished = False
+
+        # Device IDごとのApplicationとオブジェクト（(種別, 番号)をキーとする）
+        self.applications = {}
+        self.__objects = {}
+
+        # 更新処理で最後に書き込んだ値（bacpypes3のPresent valueの読み取りは遅いため、変化の判定は手元で行う）
+        self.__last_values = {}
+
+        # 簡易モデルの状態
+        self.__room_temperatures = {}
+        self.__room_humidities = {}
+        self.__co2_levels = {}
+        self.__total_energy = 0.0
+        self.__dissatisfaction_sum = 0.0
+        self.__elapsed_sec = 0.0
+
+        self.__task = None
+
+    # region 起動・停止
+
+    async def start(self):
+        """全てのDeviceを起動し、値の更新を始める
+        """
+        self.__build_date_time_controller()
+        self.__build_vrf_controller()
+        self.__build_environment_monitor()
+        self.__build_occupant_monitor()
+        self.__build_ventilation_controller()
+        self.__build_dummy_device()
+
+        # 初期値を揃える
+        self.__step(0.0)
+        self.__task = asyncio.create_task(self.__run())
+
+    def close(self):
+        """値の更新を止め、全てのUDPソケットを閉じる
+        """
+        if self.__task is not None:
+            self.__task.cancel()
+            self.__task = None
+        for app in self.applications.values():
+            app.close()
+        self.applications.clear()
+
+    # endregion
+
+    # region 日時の計算
+
+    def current_date_time(self):
+        """シミュレーション上の現在日時を取得する
+
+        Returns:
+            datetime: シミュレーション上の現在日時
+        """
+        if self.__is_paused or self.__is_finished:
+            return self.__base_sim_datetime
+        return (datetime.datetime.today() - self.__base_real_datetime) * self.__acc_rate + self.__base_sim_datetime
+
+    def __rebase(self, acc_rate):
+        """基準日時を現在日時に置き換えて加速度を変える"""
+        self.__base_sim_datetime = self.current_date_time()
+        self.__base_real_datetime = datetime.datetime.today()
+        self.__acc_rate = acc_rate
+        self.__get(DateTimeCommunicator.DATETIMECONTROLLER_DEVICE_ID, 'datetimeValue', DateTimeCommunicator._member.BaseRealDateTime.value).presentValue = self.__to_bacnet_date_time(self.__base_real_datetime)
+        self.__get(DateTimeCommunicator.DATETIMECONTROLLER_DEVICE_ID, 'datetimeValue', DateTimeCommunicator._member.BaseAcceleratedDateTime.value).presentValue = self.__to_bacnet_date_time(self.__base_sim_datetime)
+
+    def __set_paused(self, is_paused):
+        """一時停止の状態を変える（基準日時を更新してからIsPausedを変え、COV通知を受けた側が新しい基準日時を読めるようにする）"""
+        if self.__is_paused == is_paused:
+            return
+        self.__rebase(self.__acc_rate)
+        self.__is_paused = is_paused
+        self.__get(DateTimeCommunicator.DATETIMECONTROLLER_DEVICE_ID, 'binaryInput', DateTimeCommunicator._member.IsPaused.value).presentValue = 'active' if (is_paused or self.__is_finished) else 'inactive'
+
+    def __on_acceleration_rate_written(self, old_value, new_value):
+        # 変更前の加速度で現在日時を確定させてから基準日時を置き換える
+        if old_value != new_value:
+            self.__rebase(int(new_value))
+
+    def __on_pause_timer_written(self, old_value, new_value):
+        self.__pause_timer = float(new_value)
+        if self.__pause_timer <= 0 and not self.__is_paused:
+            self.__set_paused(True)
+        elif 0 < self.__pause_timer and self.__is_paused:
+            self.__set_paused(False)
+
+    @staticmethod
+    def __to_bacnet_date_time(dt:datetime.datetime):
+        return DateTime(
+            date=Date((dt.year - 1900, dt.month, dt.day, dt.isoweekday())),
+            time=Time((dt.hour, dt.minute, dt.second, dt.microsecond // 10000)))
+
+    # endregion
+
+    # region Deviceの構築
+
+    def __build_date_time_controller(self):
+        dev_id = DateTimeCommunicator.DATETIMECONTROLLER_DEVICE_ID
+        mem = DateTimeCommunicator._member
+        self.__add_device(dev_id, 'DateTimeController')
+        now = self.__to_bacnet_date_time(self.current_date_time())
+        self.__add(dev_id, DateTimeValueObject, mem.CurrentDateTimeInSimulation.value, now)
+        self.__add(dev_id, AnalogOutputObject, mem.AccelerationRate.value, float(self.__acc_rate), covIncrement=1.0)
+        self.__add(dev_id, DateTimeValueObject, mem.BaseRealDateTime.value, self.__to_bacnet_date_time(self.__base_real_datetime))
+        self.__add(dev_id, DateTimeValueObject, mem.BaseAcceleratedDateTime.value, now)
+        self.__add(dev_id, DateTimeValueObject, mem.EndDateTime.value, self.__to_bacnet_date_time(self.__end_datetime))
+        self.__add(dev_id, BinaryInputObject, mem.IsDelayed.value, 'inactive')
+        self.__add(dev_id, BinaryInputObject, mem.IsFinished.value, 'inactive')
+        self.__add(dev_id, AnalogOutputObject, mem.PauseTimer.value, self.__pause_timer, covIncrement=1.0)
+        self.__add(dev_id, BinaryInputObject, mem.IsPaused.value, 'inactive')
+
+        self.__get(dev_id, 'analogOutput', mem.AccelerationRate.value)._property_monitors['presentValue'].append(self.__on_acceleration_rate_written)
+        self.__get(dev_id, 'analogOutput', mem.PauseTimer.value)._property_monitors['presentValue'].append(self.__on_pause_timer_written)
+
+    def __build_vrf_controller(self):
+        dev_id = VRFSystemCommunicator.VRFCTRL_DEVICE_ID
+        mem = VRFSystemCommunicator._member
+        self.__add_device(dev_id, 'VRFController')
+        for o, iu_num in enumerate(self.INDOOR_UNIT_NUMBERS, start=1):
+            # 室外機
+            base = 1000 * o
+            self.__add_pair(dev_id, base, mem.ForcedRefrigerantTemperature_Setting, 'inactive')
+            self.__add_pair(dev_id, base, mem.EvaporatingTemperatureSetpoint_Setting, 10.0)
+            self.__add_pair(dev_id, base, mem.CondensingTemperatureSetpoint_Setting, 45.0)
+            self.__add(dev_id, AnalogInputObject, base + mem.Electricity.value, 0.0)
+            self.__add(dev_id, AnalogInputObject, base + mem.HeatLoad.value, 0.0)
+
+            # 室内機
+            for i in range(1, iu_num + 1):
+                base = 1000 * o + 100 * i
+                self.__add_pair(dev_id, base, mem.OnOff_Setting, 'inactive')
+                self.__add_pair(dev_id, base, mem.OperationMode_Setting, VRFSystemCommunicator.Mode.Cooling.value, numberOfStates=3)
+                self.__add_pair(dev_id, base, mem.Setpoint_Setting, 26.0)
+                self.__add(dev_id, AnalogInputObject, base + mem.MeasuredRoomTemperature.value, 28.0)
+                self.__add(dev_id, AnalogInputObject, base + mem.MeasuredRelativeHumidity.value, 60.0)
+                self.__add_pair(dev_id, base, mem.FanSpeed_Setting, VRFSystemCommunicator.FanSpeed.Middle.value, numberOfStates=3)
+                self.__add_pair(dev_id, base, mem.AirflowDirection_Setting, VRFSystemCommunicator.Direction.Horizontal.value, numberOfStates=5)
+                self.__add_pair(dev_id, base, mem.RemoteControllerPermittion_Setpoint_Setting, 'active')
+                self.__add(dev_id, AnalogInputObject, base + mem.Electricity.value, 0.0)
+                self.__add(dev_id, AnalogInputObject, base + mem.HeatLoad.value, 0.0)
+                self.__room_temperatures[(o, i)] = 28.0
+                self.__room_humidities[(o, i)] = 60.0
+
+    def __build_environment_monitor(self):
+        dev_id = EnvironmentCommunicator.ENVIRONMENTMONITOR_DEVICE_ID
+        self.__add_device(dev_id, 'WeatherMonitor')
+        for mem in EnvironmentCommunicator._member:
+            self.__add(dev_id, AnalogInputObject, mem.value, 0.0)
+        for o, iu_num in enumerate(self.INDOOR_UNIT_NUMBERS, start=1):
+            for i in range(1, iu_num + 1):
+                for mem in EnvironmentCommunicator._ZONE_MEMBERS:
+                    self.__add(dev_id, AnalogInputObject, 1000 * o + 100 * i + mem.value, 0.0)
+
+    def __build_occupant_monitor(self):
+        dev_id = OccupantCommunicator.OCCUPANTMONITOR_DEVICE_ID
+        mem = OccupantCommunicator._member
+        self.__add_device(dev_id, 'OccupantMonitor')
+        for tenant in OccupantCommunicator.Tenant:
+            t = tenant.value
+            self.__add(dev_id, AnalogInputObject, 10000 * t + mem.OccupantNumber.value, 0.0)
+            for z in range(1, OccupantCommunicator.MAX_ZONE_NUMBER + 1):
+                for zm in OccupantCommunicator._ZONE_MEMBERS:
+                    self.__add(dev_id, AnalogInputObject, 10000 * t + 1000 * z + zm.value, 0.0)
+            for oc in range(1, OccupantCommunicator.MAX_OCCUPANT_NUMBER + 1):
+                for om in OccupantCommunicator._OCCUPANT_MEMBERS:
+                    cls = BinaryInputObject if OccupantCommunicator._MEMBER_OBJECT_TYPES[om] == 'binaryInput' else AnalogInputObject
+                    self.__add(dev_id, cls, 10000 * t + 10 * oc + om.value, 'inactive' if cls is BinaryInputObject else 0.0)
+
+    def __build_ventilation_controller(self):
+        dev_id = VentilationSystemCommunicator.VENTCTRL_DEVICE_ID
+        mem = VentilationSystemCommunicator._member
+        self.__add_device(dev_id, 'VentilationController')
+        for m in VentilationSystemCommunicator._TENANT_MEMBERS:
+            self.__add(dev_id, AnalogInputObject, m.value, 420.0)
+            self.__co2_levels[m.value] = 420.0
+        for o, iu_num in enumerate(self.INDOOR_UNIT_NUMBERS, start=1):
+            for i in range(1, iu_num + 1):
+                base = 1000 * o + 100 * i
+                self.__add(dev_id, BinaryOutputObject, base + mem.HexOnOff.value, 'inactive')
+                self.__add(dev_id, BinaryOutputObject, base + mem.HexBypassEnabled.value, 'inactive')
+                self.__add(dev_id, MultiStateOutputObject, base + mem.HexFanSpeed.value, VentilationSystemCommunicator.FanSpeed.Low.value, numberOfStates=3)
+
+    def __build_dummy_device(self):
+        dev_id = self.DUMMY_DEVICE_ID
+        self.__add_device(dev_id, 'Dummy')
+        self.__add(dev_id, AnalogValueObject, 1, 1.0)
+        self.__add(dev_id, AnalogOutputObject, 2, 2.0)
+        self.__add(dev_id, AnalogInputObject, 3, 3.0)
+        self.__add(dev_id, AnalogValueObject, 4, 4.4)
+        self.__add(dev_id, AnalogOutputObject, 5, 5.5)
+        self.__add(dev_id, AnalogInputObject, 6, 6.6)
+        self.__add(dev_id, BinaryValueObject, 7, 'active')
+        self.__add(dev_id, BinaryOutputObject, 8, 'active')
+        self.__add(dev_id, BinaryInputObject, 9, 'active')
+        self.__add(dev_id, MultiStateValueObject, 10, 1, numberOfStates=3)
+        self.__add(dev_id, MultiStateOutputObject, 11, 2, numberOfStates=3)
+        self.__add(dev_id, MultiStateInputObject, 12, 3, numberOfStates=3)
+        self.__add(dev_id, DateTimeValueObject, 13, self.__to_bacnet_date_time(datetime.datetime.today()))
+
+    def __add_device(self, dev_id, name):
+        device = DeviceObject(
+            objectName=name,
+            objectIdentifier=('device', dev_id),
+            maxApduLengthAccepted=1476,
+            segmentationSupported='segmentedBoth',
+            maxSegmentsAccepted=16,
+            vendorIdentifier=15,
+        )
+        self.applications[dev_id] = _StandInApplication(device, IPv4Address(self.emulator_ip, int(0xBAC0 + dev_id)))
+        self.__objects[dev_id] = {}
+
+    def __add(self, dev_id, cls, instance, value, **kwargs):
+        obj = cls(
+            objectIdentifier=(cls.objectType, instance),
+            objectName=str(cls.objectType) + '-' + str(instance),
+            presentValue=value,
+            statusFlags=[0, 0, 0, 0],
+            **kwargs)
+        if cls in (AnalogInputObject, AnalogValueObject) and 'covIncrement' not in kwargs:
+            obj.covIncrement = 0.1
+        self.applications[dev_id].add_object(obj)
+        self.__objects[dev_id][(obj.objectIdentifier[0].attr, instance)] = obj
+        return obj
+
+    def __add_pair(self, dev_id, base, setting, value, **kwargs):
+        """設定オブジェクトと状態オブジェクト（番号+1）を追加し、設定の書き込みを状態に反映させる"""
+        classes = {
+            'binaryOutput': (BinaryOutputObject, BinaryInputObject),
+            'binaryValue': (BinaryValueObject, BinaryInputObject),
+            'multiStateOutput': (MultiStateOutputObject, MultiStateInputObject),
+            'analogValue': (AnalogValueObject, AnalogInputObject),
+        }
+        setting_cls, status_cls = classes[VRFSystemCommunicator._MEMBER_OBJECT_TYPES[setting]]
+        setting_obj = self.__add(dev_id, setting_cls, base + setting.value, value, **kwargs)
+        status_obj = self.__add(dev_id, status_cls, base + setting.value + 1, value, **kwargs)
+
+        def reflect(old_value, new_value):
+            status_obj.presentValue = new_value
+        setting_obj._property_monitors['presentValue'].append(reflect)
+
+    def __get(self, dev_id, obj_type, instance):
+        return self.__objects[dev_id][(obj_type, instance)]
+
+    # endregion
+
+    # region 値の更新
+
+    async def __run(self):
+        last = time.monotonic()
+        while True:
+            await asyncio.sleep(self.TICK_SEC)
+            now = time.monotonic()
+            real_dt = now - last
+            last = now
+            started = time.monotonic()
+            self.__step(0.0 if (self.__is_paused or self.__is_finished) else real_dt * self.__acc_rate)
+
+            # 計算が更新間隔に間に合わなければ遅延とする
+            is_delayed = self.TICK_SEC < time.monotonic() - started
+            self.__set_binary(DateTimeCommunicator.DATETIMECONTROLLER_DEVICE_ID, DateTimeCommunicator._member.IsDelayed.value, is_delayed)
+
+    def __step(self, dt):
+        """シミュレーション上の時間をdt[sec]進める"""
+        dt_id = DateTimeCommunicator.DATETIMECONTROLLER_DEVICE_ID
+        dt_mem = DateTimeCommunicator._member
+        now = self.current_date_time()
+
+        # 日時・一時停止・終了
+        self.__get(dt_id, 'datetimeValue', dt_mem.CurrentDateTimeInSimulation.value).presentValue = self.__to_bacnet_date_time(now)
+        if not self.__is_finished and self.__end_datetime <= now:
+            self.__base_sim_datetime = self.__end_datetime
+            self.__is_finished = True
+            self.__set_binary(dt_id, dt_mem.IsFinished.value, True)
+            self.__set_binary(dt_id, dt_mem.IsPaused.value, True)
+        if 0 < dt and 0 < self.__pause_timer:
+            # 一時停止はPauseTimerの書き込み監視（__on_pause_timer_written）で処理される
+            self.__get(dt_id, 'analogOutput', dt_mem.PauseTimer.value).presentValue = max(0.0, self.__pause_timer - dt)
+
+        # 外気
+        hour = now.hour + now.minute / 60.0
+        oa_temp = 27.0 + 4.0 * math.sin(2 * math.pi * (hour - 9.0) / 24.0)
+        oa_hmd = 65.0 - 15.0 * math.sin(2 * math.pi * (hour - 9.0) / 24.0)
+        radiation = max(0.0, 800.0 * math.sin(math.pi * (hour - 6.0) / 12.0))
+        occupied = now.weekday() < 5 and 8.0 <= hour < 19.0
+
+        self.__step_vrf(dt, oa_temp, oa_hmd)
+        dissatisfaction = self.__step_occupants(now, hour, occupied)
+        self.__step_ventilation(dt, occupied)
+        self.__step_environment(dt, oa_temp, oa_hmd, radiation, dissatisfaction)
+
+    def __step_vrf(self, dt, oa_temp, oa_hmd):
+        dev_id = VRFSystemCommunicator.VRFCTRL_DEVICE_ID
+        mem = VRFSystemCommunicator._member
+        for o, iu_num in enumerate(self.INDOOR_UNIT_NUMBERS, start=1):
+            ou_electricity = 0.0
+            ou_heat_load = 0.0
+            for i in range(1, iu_num + 1):
+                base = 1000 * o + 100 * i
+                is_on = self.__get_value(dev_id, 'binaryInput', base + mem.OnOff_Status.value) == 1
+                mode = int(self.__get_value(dev_id, 'multiStateInput', base + mem.OperationMode_Status.value))
+                fan = int(self.__get_value(dev_id, 'multiStateInput', base + mem.FanSpeed_Status.value))
+                setpoint = float(self.__get_value(dev_id, 'analogInput', base + mem.Setpoint_Status.value))
+                conditioning = is_on and mode != VRFSystemCommunicator.Mode.ThermoOff.value
+
+                # 室温・湿度は一次遅れで目標値に近づける（空調中30分、停止中2時間の時定数）
+                temp = self.__room_temperatures[(o, i)]
+                hmd = self.__room_humidities[(o, i)]
+                rate = 1.0 - math.exp(-dt / (1800.0 if conditioning else 7200.0))
+                temp += ((setpoint if conditioning else oa_temp) - temp) * rate
+                hmd += ((50.0 if conditioning else oa_hmd) - hmd) * rate
+                self.__room_temperatures[(o, i)] = temp
+                self.__room_humidities[(o, i)] = hmd
+
+                heat_load = (oa_temp - temp) * (0.4 + 0.1 * fan) if conditioning else 0.0
+                electricity = (0.05 * fan + abs(heat_load) / 4.0) if is_on else 0.0
+                self.__set_analog(dev_id, base + mem.MeasuredRoomTemperature.value, temp)
+                self.__set_analog(dev_id, base + mem.MeasuredRelativeHumidity.value, hmd)
+                self.__set_analog(dev_id, base + mem.HeatLoad.value, heat_load)
+                self.__set_analog(dev_id, base + mem.Electricity.value, electricity)
+                ou_electricity += electricity
+                ou_heat_load += heat_load
+
+            base = 1000 * o
+            self.__set_analog(dev_id, base + mem.HeatLoad.value, ou_heat_load)
+            self.__set_analog(dev_id, base + mem.Electricity.value, ou_electricity + (0.2 if 0 < ou_electricity else 0.0))
+
+    def __step_occupants(self, now, hour, occupied):
+        """執務者の在室状況と温冷感を更新し、不満足者率[-]を返す"""
+        dev_id = OccupantCommunicator.OCCUPANTMONITOR_DEVICE_ID
+        mem = OccupantCommunicator._member
+        clothing = 0.6 if 5 <= now.month <= 10 else 1.0
+        dissatisfied = []
+        for tenant in OccupantCommunicator.Tenant:
+            t = tenant.value
+            temps = [self.__room_temperatures[(o, i)] for o in self.TENANT_OUTDOOR_UNITS[t] for i in range(1, self.INDOOR_UNIT_NUMBERS[o - 1] + 1)]
+            temp = sum(temps) / len(temps)
+            sensation = max(-3.0, min(3.0, (temp - 25.5) / 1.5))
+            ppd = 1.0 - 0.95 * math.exp(-0.03353 * sensation ** 4 - 0.2179 * sensation ** 2)
+            dissatisfied.append(ppd)
+
+            zone_count = [0] * (OccupantCommunicator.MAX_ZONE_NUMBER + 1)
+            for oc in range(1, OccupantCommunicator.MAX_OCCUPANT_NUMBER + 1):
+                # 出社・退社時刻は執務者ごとに1時間・2時間の幅でばらつかせる
+                arrival = 8.0 + (oc * 37 % 60) / 60.0
+                leave = 18.0 + (oc * 53 % 120) / 60.0
+                available = occupied and arrival <= hour < leave
+                if available:
+                    zone_count[(oc - 1) % OccupantCommunicator.MAX_ZONE_NUMBER + 1] += 1
+                base = 10000 * t + 10 * oc
+                self.__set_binary(dev_id, base + mem.Availability.value, available)
+                self.__set_analog(dev_id, base + mem.ThermalSensation.value, round(sensation) if available else 0.0)
+                self.__set_analog(dev_id, base + mem.ClothingIndex.value, clothing)
+
+            for z in range(1, OccupantCommunicator.MAX_ZONE_NUMBER + 1):
+                base = 10000 * t + 1000 * z
+                self.__set_analog(dev_id, base + mem.OccupantNumber.value, zone_count[z])
+                self.__set_analog(dev_id, base + mem.ThermalSensation.value, sensation if 0 < zone_count[z] else 0.0)
+                self.__set_analog(dev_id, base + mem.ClothingIndex.value, clothing)
+                self.__set_analog(dev_id, base + mem.Dissatisfied_Thermal.value, ppd)
+                self.__set_analog(dev_id, base + mem.Dissatisfied_Draft.value, 0.05)
+                self.__set_analog(dev_id, base + mem.Dissatisfied_VerticalTemp.value, 0.03)
+            self.__set_analog(dev_id, 10000 * t + mem.OccupantNumber.value, sum(zone_count))
+        return sum(dissatisfied) / len(dissatisfied) if occupied else 0.0
+
+    def __step_ventilation(self, dt, occupied):
+        dev_id = VentilationSystemCommunicator.VENTCTRL_DEVICE_ID
+        mem = VentilationSystemCommunicator._member
+        occ_id = OccupantCommunicator.OCCUPANTMONITOR_DEVICE_ID
+        for tenant_member, tenant in zip(VentilationSystemCommunicator._TENANT_MEMBERS, OccupantCommunicator.Tenant):
+            # 換気の能力（運転中の全熱交換器の台数と風量の割合）
+            units = [(o, i) for o in self.TENANT_OUTDOOR_UNITS[tenant.value] for i in range(1, self.INDOOR_UNIT_NUMBERS[o - 1] + 1)]
+            capacity = 0.0
+            for o, i in units:
+                base = 1000 * o + 100 * i
+                if self.__get_value(dev_id, 'binaryOutput', base + mem.HexOnOff.value) == 1:
+                    capacity += int(self.__get_value(dev_id, 'multiStateOutput', base + mem.HexFanSpeed.value)) / 3.0
+            capacity /= len(units)
+
+            occupants = float(self.__get_value(occ_id, 'analogInput', 10000 * tenant.value + OccupantCommunicator._member.OccupantNumber.value))
+            target = 420.0 + 20.0 * occupants / (0.2 + capacity)
+            co2 = self.__co2_levels[tenant_member.value]
+            co2 += (target - co2) * (1.0 - math.exp(-dt / 1800.0))
+            self.__co2_levels[tenant_member.value] = co2
+            self.__set_analog(dev_id, tenant_member.value, co2)
+
+    def __step_environment(self, dt, oa_temp, oa_hmd, radiation, dissatisfaction):
+        dev_id = EnvironmentCommunicator.ENVIRONMENTMONITOR_DEVICE_ID
+        mem = EnvironmentCommunicator._member
+        vrf_id = VRFSystemCommunicator.VRFCTRL_DEVICE_ID
+
+        # 瞬時のエネルギー消費[kW]と積算値[GJ]
+        energy = sum(float(self.__get_value(vrf_id, 'analogInput', 1000 * o + VRFSystemCommunicator._member.Electricity.value)) for o in range(1, len(self.INDOOR_UNIT_NUMBERS) + 1))
+        self.__total_energy += energy * dt / 1.0e6
+        self.__dissatisfaction_sum += dissatisfaction * dt
+        self.__elapsed_sec += dt
+
+        self.__set_analog(dev_id, mem.DrybulbTemperature.value, oa_temp)
+        self.__set_analog(dev_id, mem.RelativeHumdity.value, oa_hmd)
+        self.__set_analog(dev_id, mem.GlobalHorizontalRadiation.value, radiation)
+        self.__set_analog(dev_id, mem.NocturnalRadiation.value, 90.0)
+        self.__set_analog(dev_id, mem.TotalEnergyConsumption.value, self.__total_energy)
+        self.__set_analog(dev_id, mem.AveragedDissatisfactionRate.value, self.__dissatisfaction_sum / self.__elapsed_sec if 0 < self.__elapsed_sec else 0.0)
+        self.__set_analog(dev_id, mem.InstantaneousEnergyConsumption.value, energy)
+        self.__set_analog(dev_id, mem.InstantaneousDissatisfactionRate.value, dissatisfaction)
+
+        for (o, i), temp in self.__room_temperatures.items():
+            self.__set_analog(dev_id, 1000 * o + 100 * i + mem.DrybulbTemperature.value, temp)
+            self.__set_analog(dev_id, 1000 * o + 100 * i + mem.RelativeHumdity.value, self.__room_humidities[(o, i)])
+
+    def __get_value(self, dev_id, obj_type, instance):
+        return self.__get(dev_id, obj_type, instance).presentValue
+
+    def __set_analog(self, dev_id, instance, value):
+        self.__set_value(dev_id, 'analogInput', instance, float(value))
+
+    def __set_binary(self, dev_id, instance, value):
+        self.__set_value(dev_id, 'binaryInput', instance, 'active' if value else 'inactive')
+
+    def __set_value(self, dev_id, obj_type, instance, value):
+        key = (dev_id, obj_type, instance)
+        if self.__last_values.get(key) != value:
+            self.__last_values[key] = value
+            self.__get(dev_id, obj_type, instance).presentValue = value
+
+    # endregion
+
+# region サンプル
+
+async def main():
+    parser = argparse.ArgumentParser(description='Shizuku2の代わりにBACnet Deviceを提供する試験用のエミュレータ')
+    parser.add_argument('--ip', default='127.0.0.1', help='エミュレータのIP Address')
+    parser.add_argument('--rate', type=int, default=60, help='加速度[-]')
+    parser.add_argument('--start', default=None, help='シミュレーション上の開始日時（YYYY-MM-DDThh:mm:ss）')
+    args = parser.parse_args()
+
+    stand_in = Shizuku2StandIn(
+        emulator_ip=args.ip,
+        acceleration_rate=args.rate,
+        start_date_time=None if args.start is None else datetime.datetime.fromisoformat(args.start)
+    )
+    await stand_in.start()
+    print('Shizuku2 stand-in is running on ' + args.ip + ' (Ctrl+C to stop)')
+
+    # 無限ループで日時を表示
+    try:
+        while True:
+            print(stand_in.current_date_time().strftime('%Y/%m/%d %H:%M:%S'))
+            await asyncio.sleep(10)
+    finally:
+        stand_in.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
+
+# endregion
@@ -0,0 +1,577 @@
+import datetime
+import asyncio
+import time
+import weakref
+from typing import NamedTuple, Union, Iterable
+
+from bacpypes3.pdu import Address
+from bacpypes3.primitivedata import ObjectIdentifier
+
+if __package__:
+    from .BACnetHub import BACnetHub
+    from .PresentValueReadWriter import PresentValueReadWriter
+    from .COVSubscriptionManager import COVSubscriptionManager, SubscriptionHealth
+else:
+    # スクリプトとして直接読み込まれた場合
+    from BACnetHub import BACnetHub
+    from PresentValueReadWriter import PresentValueReadWriter
+    from COVSubscriptionManager import COVSubscriptionManager, SubscriptionHealth
+
+# シミュレーション日時をナノ秒の整数で表す際の起点
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+def _to_ns(date_time:datetime.datetime):
+    """日時を起点からのナノ秒に変換する
+
+    Args:
+        date_time (datetime.datetime): 日時
+
+    Returns:
+        int: 起点からのナノ秒
+    """
+    delta = date_time - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000000000 + delta.microseconds * 1000
+
+class ClockSnapshot(NamedTuple):
+    """シミュレーション日時を計算するための値の組（同時に読み取った値を不変の組として差し替える）
+
+    同期した時点のシミュレーション日時を単調増加する時計（time.monotonic_ns）に結び付けて保持し、
+    現在のシミュレーション日時は整数の演算で求める（現実の時計の補正や夏時間の切り替えの影響を受けない）。
+    """
+    # 加速度[-]
+    acc_rate: float
+    # 現実時間の基準日時
+    base_real_datetime: datetime.datetime
+    # シミュレーション上の基準日時
+    base_sim_datetime: datetime.datetime
+    # 一時停止中か否か
+    is_paused: bool
+    # 同期した時点の単調増加する時計の値[ns]
+    anchor_monotonic_ns: int
+    # 同期した時点のシミュレーション日時（_EPOCHからのナノ秒）
+    anchor_sim_ns: int
+
+    def sim_ns(self, monotonic_ns:int):
+        """シミュレーション日時を計算する
+
+        Args:
+            monotonic_ns (int): 単調増加する時計の値[ns]
+
+        Returns:
+            int: シミュレーション日時（_EPOCHからのナノ秒）
+        """
+        if self.is_paused:
+            return self.anchor_sim_ns
+        return self.anchor_sim_ns + int((monotonic_ns - self.anchor_monotonic_ns) * self.acc_rate)
+
+    @classmethod
+    def create(cls, acc_rate:float, base_real_datetime:datetime.datetime, base_sim_datetime:datetime.datetime, is_paused:bool):
+        """エミュレータから読み取った値から、現在の時計の値に結び付けた組を作る
+
+        Args:
+            acc_rate (float): 加速度[-]
+            base_real_datetime (datetime.datetime): 現実時間の基準日時
+            base_sim_datetime (datetime.datetime): シミュレーション上の基準日時
+            is_paused (bool): 一時停止中か否か
+
+        Returns:
+            ClockSnapshot: 値の組
+        """
+        monotonic_ns = time.monotonic_ns()
+        if is_paused:
+            sim = base_sim_datetime
+        else:
+            sim = (datetime.datetime.today() - base_real_datetime) * acc_rate + base_sim_datetime
+        return cls(acc_rate, base_real_datetime, base_sim_datetime, is_paused, monotonic_ns, _to_ns(sim))
+
+class SimulationClock():
+    """Shizuku2のシミュレーション日時を手元で計算する時計
+
+    BACnetHubとDateTimeControllerの組ごとに1つを共有し（sharedで取得する）、COVの登録・同期・日時の計算をまとめて行う。
+    """
+
+    # region 定数宣言
+
+    DATETIMECONTROLLER_DEVICE_ID = 1
+
+    DATETIMECONTROLLER_EXCLUSIVE_PORT = 0xBAC0 + DATETIMECONTROLLER_DEVICE_ID
+
+    # 同期に使うDateTimeControllerのオブジェクト（加速度・現実時間の基準日時・シミュレーション上の基準日時・一時停止中か否か）
+    ACCELERATION_RATE = ('analogOutput', 2)
+    BASE_REAL_DATETIME = ('datetimeValue', 3)
+    BASE_ACCELERATED_DATETIME = ('datetimeValue', 4)
+    IS_PAUSED = ('binaryInput', 9)
+
+    # ずれの速さを推定するのに必要な同期の間隔[ns]
+    DRIFT_MIN_INTERVAL_NS = 1000000000
+
+    # 確認なしのCOV通知で登録した場合に、通知の取りこぼしを確認する間隔[sec]
+    SEQUENCE_CHECK_SEC = 10.0
+
+    # endregion
+
+    @classmethod
+    def shared(cls, hub:BACnetHub, emulator_ip:str = '127.0.0.1', time_out_sec:float = 1.0):
+        """Hubを共有する通信ユーティリティの間で、DateTimeControllerごとに共有する時計を取得する
+
+        時計はHubに保持されるため、Hubを閉じると破棄され、次に取得した際に作り直される。
+
+        Args:
+            hub (BACnetHub): 通信に使うBACnet通信の窓口
+            emulator_ip (str): エミュレータのIP Address（xxx.xxx.xxx.xxx）
+            time_out_sec (float): タイムアウトまでの時間[sec]（そのHubで最初に取得した際のみ使う）
+
+        Returns:
+            SimulationClock: 共有する時計
+        """
+        target_ip = emulator_ip + ':' + str(cls.DATETIMECONTROLLER_EXCLUSIVE_PORT)
+        clock = hub.clocks.get(target_ip)
+        if clock is None:
+            clock = hub.clocks[target_ip] = cls(hub, emulator_ip, time_out_sec)
+        return clock
+
+    def __init__(self, hub:BACnetHub, emulator_ip:str = '127.0.0.1', time_out_sec:float = 1.0):
+        """インスタンスを初期化する（通常はsharedで共有のものを取得する）
+
+        Args:
+            hub (BACnetHub): 通信に使うBACnet通信の窓口
+            emulator_ip (str): エミュレータのIP Address（xxx.xxx.xxx.xxx）
+            time_out_sec (float): タイムアウトまでの時間[sec]
+        """
+        # 通信用のPresentValueReadWriter（通信元のキャッシュや書き込み抑制の設定の影響を受けないように専用のものを用意する）
+        self.pv_rw = PresentValueReadWriter(hub.id, emulator_ip=emulator_ip, time_out_sec=time_out_sec, hub=hub)
+
+        # COVはHubで共有するものを使う（同じ点を他の利用者が登録していても1回の登録で済む）
+        self.cov_manager = COVSubscriptionManager.shared(hub, time_out_sec)
+        self.cov_manager.add_health_callback(self.__on_health_changed)
+
+        # 通信先のアドレスとオブジェクトIDは事前に解析しておく
+        self.__target_address = Address(emulator_ip + ':' + str(self.DATETIMECONTROLLER_EXCLUSIVE_PORT))
+        self.__acceleration_rate = ObjectIdentifier(self.ACCELERATION_RATE)
+        self.__is_paused = ObjectIdentifier(self.IS_PAUSED)
+        self.__objids = [
+            self.__acceleration_rate,
+            ObjectIdentifier(self.BASE_REAL_DATETIME),
+            ObjectIdentifier(self.BASE_ACCELERATED_DATETIME),
+            self.__is_paused,
+        ]
+
+        # COVの登録を求めている利用者（全員が解除した時点で解除する。破棄された利用者は自動で取り除かれる）と、
+        # 共有のCOVSubscriptionManagerに自身のコールバックを登録済みか否か
+        self.__subscribers = weakref.WeakSet()
+        self.__subscribe_lock = asyncio.Lock()
+        self.__callbacks_registered = False
+
+        # 再登録を待っているCOV（再登録までの間に基準日時が変わっている可能性があるため、再登録後に同期する）
+        self.__stale_objids = set()
+
+        # 日時を計算するための加速度・基準日時・一時停止状況
+        now = datetime.datetime.today()
+        self.__clock = ClockSnapshot.create(0, now, now, False)
+
+        # 実行中の同期と、その完了後に実行する同期（同期中に届いた要求は1回の同期にまとめる）
+        self.__sync_task = None
+        self.__queued_sync_task = None
+
+        # シミュレーション日時で待機中のタイマー
+        self.__timers = set()
+
+        # 定期的な同期（enable_periodic_syncで有効化する）
+        self.__periodic_sync_task = None
+
+        # 同期のたびに観測した、手元の時計とエミュレータとのずれの速さ[-]と、直近のずれ[sec]
+        self.__drift_rate = None
+        self.__drift_reference = None
+        self.last_sync_error_sec = None
+
+        # 同期の要求回数と、実際に通信した回数
+        self.sync_request_count = 0
+        self.sync_count = 0
+
+        # 確認なしのCOV通知の取りこぼしの確認と、取りこぼしを見つけた回数
+        self.__sequence_check_task = None
+        self.missed_notification_count = 0
+
+    # region COV登録
+
+    async def subscribe(self, subscriber = None, issue_confirmed_notifications:bool = True):
+        """加速度と一時停止状況のCOVを登録する（登録済みの場合には利用者だけを追加する）
+
+        確認なしの通知では、エミュレータが利用者ごとの確認応答を待たずに済む代わりに通知が失われ得る。
+        そのため、加速度や一時停止状況が変わるたびに更新される現実時間の基準日時を一定間隔で読み取り、
+        同期した値と異なれば通知を取りこぼしたものとして同期し直す。
+
+        Args:
+            subscriber (object): 利用者（unsubscribeで同じものを渡す。弱参照できるもの。Noneの場合にはこの時計自身）
+            issue_confirmed_notifications (bool): 確認付きのCOV通知を要求するか否か（最初に登録した利用者のものを使う）
+
+        Returns:
+            bool: 成功したか否か
+        """
+        async with self.__subscribe_lock:
+            # COVとコールバックは最初の利用者が来た際（または前回の登録に失敗していたか、他の利用者に解除された場合）にだけ登録する
+            if not (self.__callbacks_registered
+                    and self.cov_manager.is_subscribed(self.__target_address, self.__acceleration_rate)
+                    and self.cov_manager.is_subscribed(self.__target_address, self.__is_paused)):
+                await self.__unsubscribe_cov()
+                val1 = await self.cov_manager.subscribe(self.__target_address, self.__acceleration_rate, self.__on_acceleration_rate_changed, issue_confirmed_notifications)
+                val2 = await self.cov_manager.subscribe(self.__target_address, self.__is_paused, self.__on_is_paused_changed, issue_confirmed_notifications)
+                self.__callbacks_registered = True
+                if not (val1[0] and val2[0]):
+                    await self.__unsubscribe_cov()
+                    return False
+                if not issue_confirmed_notifications:
+                    self.__sequence_check_task = asyncio.create_task(self.__run_sequence_check())
+            self.__subscribers.add(self if subscriber is None else subscriber)
+            return True
+
+    async def unsubscribe(self, subscriber = None):
+        """利用者を取り除き、利用者がいなくなればCOVを解除する
+
+        Args:
+            subscriber (object): subscribeで渡した利用者
+        """
+        async with self.__subscribe_lock:
+            self.__subscribers.discard(self if subscriber is None else subscriber)
+            if len(self.__subscribers) == 0:
+                await self.__unsubscribe_cov()
+
+    @property
+    def subscriber_count(self):
+        """COVの登録を求めている利用者の数
+
+        Returns:
+            int: 利用者の数
+        """
+        return len(self.__subscribers)
+
+    async def __unsubscribe_cov(self):
+        # 自身のコールバックだけを取り除く（他の利用者のコールバックが残っていればCOVは解除されない）
+        if self.__sequence_check_task is not None:
+            self.__sequence_check_task.cancel()
+            self.__sequence_check_task = None
+        if not self.__callbacks_registered:
+            return
+        self.__callbacks_registered = False
+        await self.cov_manager.unsubscribe(self.__target_address, self.__acceleration_rate, self.__on_acceleration_rate_changed)
+        await self.cov_manager.unsubscribe(self.__target_address, self.__is_paused, self.__on_is_paused_changed)
+
+    async def __on_acceleration_rate_changed(self, addr, obj_id, value):
+        await self.sync()
+
+    async def __on_is_paused_changed(self, addr, obj_id, value):
+        # 同期を待たずに、通知を受けた時点の日時で止める（または進め始める）
+        monotonic_ns = time.monotonic_ns()
+        clock = self.__clock
+        self.__set_clock(clock._replace(is_paused=(value == 1), anchor_monotonic_ns=monotonic_ns, anchor_sim_ns=clock.sim_ns(monotonic_ns)))
+        await self.sync()
+
+    async def __run_sequence_check(self):
+        objid = ObjectIdentifier(self.BASE_REAL_DATETIME)
+        while True:
+            await asyncio.sleep(self.SEQUENCE_CHECK_SEC)
+            # 同期中は新旧の基準日時が混在するため確認しない（読み取りに失敗した場合はCOVの死活確認に任せる）
+            if self.__sync_task is not None:
+                continue
+            success, value = (await self.pv_rw.read_present_values(self.__target_address, [objid], use_cache=False))[0]
+            if success and self.__sync_task is None and value != self.__clock.base_real_datetime:
+                self.missed_notification_count += 1
+                await self.sync()
+
+    async def __on_health_changed(self, addr, obj_id, health):
+        # 共有のCOVSubscriptionManagerには他の点も登録されているため、自身の点だけを扱う
+        obj_id = self.pv_rw._to_object_identifier(obj_id)
+        if self.pv_rw._to_address(addr) != self.__target_address or obj_id not in (self.__acceleration_rate, self.__is_paused):
+            return
+        if health == SubscriptionHealth.STALE:
+            self.__stale_objids.add(obj_id)
+        elif health == SubscriptionHealth.HEALTHY and obj_id in self.__stale_objids:
+            self.__stale_objids.discard(obj_id)
+            await self.sync()
+
+    @property
+    def subscription_health(self):
+        """加速度と一時停止状況のCOV登録の状態（2つのうち悪い方）
+
+        Returns:
+            SubscriptionHealth: COV登録の状態（未登録の場合にはNone）
+        """
+        healths = [self.cov_manager.get_health(self.__target_address, objid)[0] for objid in (self.__acceleration_rate, self.__is_paused)]
+        for health in (None, SubscriptionHealth.STALE, SubscriptionHealth.SUBSCRIBING):
+            if health in healths:
+                return health
+        return SubscriptionHealth.HEALTHY
+
+    # endregion
+
+    # region 同期
+
+    async def sync(self):
+        """日時をエミュレータに同期させる
+
+        加速度・基準日時・一時停止状況を1回のReadPropertyMultipleで読み取り、まとめて差し替える。
+        同期中に呼ばれた場合には、実行中の同期の完了後にもう1回だけ同期し、その間の呼び出しは全てその結果を待つ。
+
+        Returns:
+            bool: 成功したか否か
+        """
+        self.sync_request_count += 1
+        if self.__queued_sync_task is not None:
+            task = self.__queued_sync_task
+        elif self.__sync_task is None:
+            task = self.__sync_task = asyncio.create_task(self.__sync(None))
+        else:
+            task = self.__queued_sync_task = asyncio.create_task(self.__sync(self.__sync_task))
+        return await asyncio.shield(task)
+
+    async def __sync(self, previous):
+        if previous is not None:
+            await asyncio.wait([previous])
+            self.__queued_sync_task = None
+            self.__sync_task = asyncio.current_task()
+        try:
+            # キャッシュを通さずに読み取る
+            self.sync_count += 1
+            vals = await self.pv_rw.read_present_values(self.__target_address, self.__objids, use_cache=False)
+            if not all(val[0] for val in vals):
+                return False
+            clock = ClockSnapshot.create(vals[0][1], vals[1][1], vals[2][1], vals[3][1] == 1)
+            self.__update_drift(self.__clock, clock)
+            self.__set_clock(clock)
+            return True
+        finally:
+            if self.__sync_task is asyncio.current_task():
+                self.__sync_task = None
+
+    def __update_drift(self, old:ClockSnapshot, new:ClockSnapshot):
+        # 加速度または一時停止状況が変わった場合には、ずれを測る基準を取り直す
+        reference = self.__drift_reference
+        if new.acc_rate <= 0 or new.is_paused or reference is None or reference.acc_rate != new.acc_rate or reference.is_paused or old.is_paused:
+            self.__drift_reference = new
+            return
+
+        # 前回の同期から予測した日時と実際の日時との差
+        self.last_sync_error_sec = abs(new.anchor_sim_ns - old.sim_ns(new.anchor_monotonic_ns)) / 1e9
+
+        # ずれの速さは基準からの経過時間で平均する（短い間隔では時計を読むタイミングの揺らぎが支配的になるため）
+        elapsed_ns = new.anchor_monotonic_ns - reference.anchor_monotonic_ns
+        if self.DRIFT_MIN_INTERVAL_NS <= elapsed_ns:
+            self.__drift_rate = abs(new.anchor_sim_ns - reference.sim_ns(new.anchor_monotonic_ns)) / elapsed_ns
+
+    def enable_periodic_sync(self, interval_sec:float = 60.0):
+        """日時を定期的にエミュレータに同期させる（イベントループの中で呼ぶ）
+
+        Args:
+            interval_sec (float): 同期の間隔[sec]
+        """
+        self.disable_periodic_sync()
+        self.__periodic_sync_task = asyncio.create_task(self.__run_periodic_sync(interval_sec))
+
+    def disable_periodic_sync(self):
+        """日時の定期的な同期を止める
+        """
+        if self.__periodic_sync_task is not None:
+            self.__periodic_sync_task.cancel()
+            self.__periodic_sync_task = None
+
+    async def __run_periodic_sync(self, interval_sec:float):
+        while True:
+            await asyncio.sleep(interval_sec)
+            await self.sync()
+
+    # endregion
+
+    # region 現在日時取得
+
+    @property
+    def is_paused(self):
+        """一時停止中か否か（最後に同期した値）
+
+        Returns:
+            bool: 一時停止中か否か
+        """
+        return self.__clock.is_paused
+
+    @property
+    def snapshot(self):
+        """日時の計算に使う加速度・基準日時・一時停止状況の組
+
+        Returns:
+            ClockSnapshot: 最後に同期した値の組
+        """
+        return self.__clock
+
+    def current_date_time(self):
+        """現在の日時を取得する
+
+        Returns:
+            datetime: 現在の日時
+        """
+        return _EPOCH + datetime.timedelta(microseconds=self.__clock.sim_ns(time.monotonic_ns()) // 1000)
+
+    def current_date_time_ns(self):
+        """現在の日時を整数で取得する（datetimeを作らないため高速）
+
+        Returns:
+            int: 現在の日時（1970/1/1 0:00からのナノ秒）
+        """
+        return self.__clock.sim_ns(time.monotonic_ns())
+
+    def current_date_time_sec(self):
+        """現在の日時を実数で取得する（datetimeを作らないため高速）
+
+        Returns:
+            float: 現在の日時（1970/1/1 0:00からの秒数）
+        """
+        return self.__clock.sim_ns(time.monotonic_ns()) / 1e9
+
+    def drift_bound_sec(self):
+        """current_date_timeとエミュレータのシミュレーション日時とのずれの推定上限[sec]を取得する
+
+        同期のたびに観測したずれの速さに、最後の同期からの経過時間を掛けて求める。
+
+        Returns:
+            float: ずれの推定上限[sec]（加速度が同じまま1秒以上離れて2回同期するまでは推定できないためNone）
+        """
+        clock = self.__clock
+        if clock.is_paused:
+            return 0.0
+        if self.__drift_rate is None:
+            return None
+        return self.__drift_rate * (time.monotonic_ns() - clock.anchor_monotonic_ns) / 1e9
+
+    # endregion
+
+    # region シミュレーション日時による待機
+
+    def __set_clock(self, clock:ClockSnapshot):
+        # 加速度や一時停止状況が変わるため、待機中のタイマーを掛け直す
+        self.__clock = clock
+        for timer in list(self.__timers):
+            self.__arm(timer)
+
+    def __arm(self, timer):
+        if timer.handle is not None:
+            timer.handle.cancel()
+            timer.handle = None
+
+        # 一時停止中と加速度が不明な間はタイマーを止める
+        clock = self.__clock
+        if clock.is_paused or clock.acc_rate <= 0:
+            return
+
+        remaining_ns = timer.deadline_ns - clock.sim_ns(time.monotonic_ns())
+        if remaining_ns <= 0:
+            self.__fire(timer)
+        else:
+            timer.handle = asyncio.get_running_loop().call_later(remaining_ns / clock.acc_rate / 1e9, self.__arm, timer)
+
+    def __fire(self, timer):
+        self.__timers.discard(timer)
+        if not timer.future.done():
+            timer.future.set_result(None)
+
+    async def sleep_until(self, sim_datetime:datetime.datetime):
+        """シミュレーション日時が指定の日時になるまで待機する
+
+        現在の加速度から現実の待ち時間を計算し、加速度または一時停止状況が変わるたびに計算し直す。一時停止中は待ち時間が進まない。
+
+        Args:
+            sim_datetime (datetime.datetime): 待機を終えるシミュレーション日時
+        """
+        timer = _SimTimer(_to_ns(sim_datetime), asyncio.get_running_loop().create_future())
+        self.__timers.add(timer)
+        self.__arm(timer)
+        try:
+            await timer.future
+        finally:
+            self.__timers.discard(timer)
+            if timer.handle is not None:
+                timer.handle.cancel()
+
+    async def sleep(self, sim_timedelta:datetime.timedelta):
+        """シミュレーション上の時間だけ待機する
+
+        Args:
+            sim_timedelta (datetime.timedelta): シミュレーション上の待ち時間
+        """
+        await self.sleep_until(self.current_date_time() + sim_timedelta)
+
+    async def every(self, period:datetime.timedelta, start:datetime.datetime = None):
+        """シミュレーション上の一定の間隔で日時を返す（async forで使う）
+
+        処理が間に合わずに過ぎてしまった時刻は飛ばす。
+
+        Args:
+            period (datetime.timedelta): シミュレーション上の間隔
+            start (datetime.datetime): 最初の日時。Noneの場合には現在から1間隔後
+
+        Yields:
+            datetime.datetime: 予定したシミュレーション日時
+        """
+        next_time = self.current_date_time() + period if start is None else start
+        while True:
+            await self.sleep_until(next_time)
+            yield next_time
+            now = self.current_date_time()
+            next_time += period
+            while next_time <= now:
+                next_time += period
+
+    async def cron(self, hour:Union[int,Iterable,None] = None, minute:Union[int,Iterable] = 0, second:int = 0, weekdays:Iterable = None):
+        """指定の時刻になるたびにシミュレーション日時を返す（async forで使う）
+
+        Args:
+            hour (Union[int,Iterable,None]): 時（複数指定可）。Noneの場合には毎時
+            minute (Union[int,Iterable]): 分（複数指定可）
+            second (int): 秒
+            weekdays (Iterable): 曜日（月曜日が0）。Noneの場合には毎日
+
+        Yields:
+            datetime.datetime: 予定したシミュレーション日時
+        """
+        hours = sorted(range(24) if hour is None else ([hour] if isinstance(hour, int) else hour))
+        minutes = sorted([minute] if isinstance(minute, int) else minute)
+        days = None if weekdays is None else set(weekdays)
+
+        last = self.current_date_time()
+        while True:
+            next_time = _next_cron_time(last, hours, minutes, second, days)
+            await self.sleep_until(next_time)
+            yield next_time
+            last = max(next_time, self.current_date_time())
+
+    # endregion
+
+def _next_cron_time(after:datetime.datetime, hours:list, minutes:list, second:int, weekdays:set):
+    """指定の時刻に一致する、ある日時より後の最初の日時を求める
+
+    Args:
+        after (datetime.datetime): 基準の日時
+        hours (list): 時のリスト（昇順）
+        minutes (list): 分のリスト（昇順）
+        second (int): 秒
+        weekdays (set): 曜日（月曜日が0）。Noneの場合には毎日
+
+    Returns:
+        datetime.datetime: 最初の日時
+    """
+    day = datetime.datetime(after.year, after.month, after.day)
+    for _ in range(8):
+        if weekdays is None or day.weekday() in weekdays:
+            for h in hours:
+                for m in minutes:
+                    candidate = day.replace(hour=h, minute=m, second=second)
+                    if after < candidate:
+                        return candidate
+        day += datetime.timedelta(days=1)
+    raise ValueError('no matching time')
+
+class _SimTimer():
+    """シミュレーション日時で待機するタイマー1件分の情報
+    """
+
+    def __init__(self, deadline_ns:int, future:asyncio.Future):
+        self.deadline_ns = deadline_ns
+        self.future = future
+        self.handle = None
@@ -1,13 +1,17 @@
 import asyncio
 
 from enum import Enum
-from bacpypes3.primitivedata import Enumerated, Real, Unsigned
+from types import MappingProxyType
+from bacpypes3.pdu import Address
+from bacpypes3.primitivedata import Enumerated, Real, Unsigned, ObjectIdentifier
 
-import sys,os
-sys.path.append(os.path.dirname(__file__))
-import DateTimeCommunicator
+if __package__:
+    from .DateTimeCommunicator import DateTimeCommunicator
+else:
+    # スクリプトとして直接読み込まれた場合
+    from DateTimeCommunicator import DateTimeCommunicator
 
-class VRFSystemCommunicator(DateTimeCommunicator.DateTimeCommunicator):
+class VRFSystemCommunicator(DateTimeCommunicator):
 
 # region 定数宣言
 
@@ -95,7 +99,44 @@ class VRFSystemCommunicator(DateTimeCommunicator.DateTimeCommunicator):
 
 # endregion
 
-    def __init__(self, id, name='vrfComm', device_ip='127.0.0.1', emulator_ip='127.0.0.1', time_out_sec=1.0):
+# region オブジェクトの種別
+
+    _MEMBER_OBJECT_TYPES = {
+        _member.OnOff_Setting: 'binaryOutput',
+        _member.OnOff_Status: 'binaryInput',
+        _member.OperationMode_Setting: 'multiStateOutput',
+        _member.OperationMode_Status: 'multiStateInput',
+        _member.Setpoint_Setting: 'analogValue',
+        _member.Setpoint_Status: 'analogInput',
+        _member.MeasuredRoomTemperature: 'analogInput',
+        _member.MeasuredRelativeHumidity: 'analogInput',
+        _member.FanSpeed_Setting: 'multiStateOutput',
+        _member.FanSpeed_Status: 'multiStateInput',
+        _member.AirflowDirection_Setting: 'multiStateOutput',
+        _member.AirflowDirection_Status: 'multiStateInput',
+        _member.RemoteControllerPermittion_Setpoint_Setting: 'binaryValue',
+        _member.RemoteControllerPermittion_Setpoint_Status: 'binaryInput',
+        _member.ForcedRefrigerantTemperature_Setting: 'binaryValue',
+        _member.ForcedRefrigerantTemperature_Status: 'binaryInput',
+        _member.EvaporatingTemperatureSetpoint_Setting: 'analogValue',
+        _member.EvaporatingTemperatureSetpoint_Status: 'analogInput',
+        _member.CondensingTemperatureSetpoint_Setting: 'analogValue',
+        _member.CondensingTemperatureSetpoint_Status: 'analogInput',
+        _member.Electricity: 'analogInput',
+        _member.HeatLoad: 'analogInput',
+    }
+
+    # 事前にオブジェクトIDを用意する室外機・室内機の台数
+    MAX_OUTDOOR_UNIT_NUMBER = 4
+    MAX_INDOOR_UNIT_NUMBER = 5
+
+    # 事前に解析したオブジェクトID（全インスタンスで共有し、最初のインスタンスの作成時に用意する）
+    _iu_points = None
+    _ou_points = None
+
+# endregion
+
+    def __init__(self, id, name='vrfComm', device_ip='127.0.0.1', emulator_ip='127.0.0.1', time_out_sec=1.0, hub=None):
         """インスタンスを初期化する
 
         Args:
@@ -103,10 +144,23 @@ class VRFSystemCommunicator(DateTimeCommunicator.DateTimeCommunicator):
             name (str): 通信用のDeviceの名前
             device_ip (str): 通信に使うDeviceのIP Address（xxx.xxx.xxx.xxx）
             emulator_ip (str): エミュレータのIP Address（xxx.xxx.xxx.xxx）
+            hub (BACnetHub): 共有するBACnet通信の窓口。Noneの場合には専用のものを用意する
         """
-        super().__init__(id, name, device_ip, emulator_ip, time_out_sec)
+        super().__init__(id, name, device_ip, emulator_ip, time_out_sec, hub)
         self.target_ip = emulator_ip + ':' + str(self.VRFCTRL_EXCLUSIVE_PORT)
 
+        # 通信先のアドレスとオブジェクトIDは事前に解析しておく（オブジェクトIDは全インスタンスで共有する）
+        self.target_address = Address(self.target_ip)
+        if VRFSystemCommunicator._iu_points is None:
+            o_units = range(1, self.MAX_OUTDOOR_UNIT_NUMBER + 1)
+            i_units = range(1, self.MAX_INDOOR_UNIT_NUMBER + 1)
+            VRFSystemCommunicator._iu_points = MappingProxyType({
+                (o, i, mem): self._make_iu_point(o, i, mem) for o in o_units for i in i_units for mem in self._member
+            })
+            VRFSystemCommunicator._ou_points = MappingProxyType({
+                (o, mem): self._make_ou_point(o, mem) for o in o_units for mem in self._member
+            })
+
 # region 発停関連
 
     async def turn_on(self, oUnitIndex, iUnitIndex):
@@ -117,8 +171,8 @@ class VRFSystemCommunicator(DateTimeCommunicator.DateTimeCommunicator):
         Returns:
             bool:命令が成功したか否か
         """        
-        inst = 'binaryOutput:' + self._get_iu_objNum(oUnitIndex,iUnitIndex,self._member.OnOff_Setting.value)
-        return await self.write_present_value(self.target_ip,inst,Enumerated(1))
+        inst = self._get_iu_point(oUnitIndex,iUnitIndex,self._member.OnOff_Setting)
+        return await self.write_present_value(self.target_address,inst,Enumerated(1))
 
     async def turn_off(self, oUnitIndex, iUnitIndex):
         """室内機を停止する
@@ -128,8 +182,8 @@ class VRFSystemCommunicator(DateTimeCommunicator.DateTimeCommunicator):
         Returns:
             bool:命令が成功したか否か
         """        
-        inst = 'binaryOutput:' + self._get_iu_objNum(oUnitIndex,iUnitIndex,self._member.OnOff_Setting.value)
-        return await self.write_present_value(self.target_ip,inst,Enumerated(0))
+        inst = self._get_iu_point(oUnitIndex,iUnitIndex,self._member.OnOff_Setting)
+        return await self.write_present_value(self.target_address,inst,Enumerated(0))
 
     async def is_turned_on(self, oUnitIndex, iUnitIndex):
         """起動しているか否か
@@ -139,8 +193,8 @@ class VRFSystemCommunicator(DateTimeCommunicator.DateTimeCommunicator):
         Returns:
             list(bool,bool): 読み取り成功の真偽,起動しているか否か
         """
-        inst = 'binaryInput:' + self._get_iu_objNum(oUnitIndex,iUnitIndex,self._member.OnOff_Status.value)
-        val = await self.read_present_value(self.target_ip,inst)
+        inst = self._get_iu_point(oUnitIndex,iUnitIndex,self._member.OnOff_Status)
+        val = await self.read_present_value(self.target_address,inst)
         return val[0], (val[1] == 1)
 
 # endregion
@@ -156,8 +210,8 @@ class VRFSystemCommunicator(DateTimeCommunicator.DateTimeCommunicator):
         Returns:
             bool:命令が成功したか否か
         """        
-        inst = 'multiStateOutput:' + self._get_iu_objNum(oUnitIndex,iUnitIndex,self._member.OperationMode_Setting.value)
-        return await self.write_present_value(self.target_ip,inst,Unsigned(mode.value))
+        inst = self._get_iu_point(oUnitIndex,iUnitIndex,self._member.OperationMode_Setting)
+        return await self.write_present_value(self.target_address,inst,Unsigned(mode.value))
 
     async def get_mode(self, oUnitIndex, iUnitIndex):
         """運転モードを取得する
@@ -167,8 +221,8 @@ class VRFSystemCommunicator(DateTimeCommunicator.DateTimeCommunicator):
         Returns:
             list(bool,Mode): 読み取り成功の真偽,運転モード
         """        
-        inst = 'multiStateInput:' + self._get_iu_objNum(oUnitIndex,iUnitIndex,self._member.OperationMode_Status.value)
-        val = await self.read_present_value(self.target_ip,inst)
+        inst = self._get_iu_point(oUnitIndex,iUnitIndex,self._member.OperationMode_Status)
+        val = await self.read_present_value(self.target_address,inst)
         return val[0], self.Mode.Cooling if val[1] == 1 else (self.Mode.Heating if val[1] == 2 else self.Mode.ThermoOff)
 
 # endregion
@@ -184,8 +238,8 @@ class VRFSystemCommunicator(DateTimeCommunicator.DateTimeCommunicator):
         Returns:
             bool:命令が成功したか否か
             """
-        inst = 'analogValue:' + self._get_iu_objNum(oUnitIndex,iUnitIndex,self._member.Setpoint_Setting.value)
-        return await self.write_present_value(self.target_ip,inst,Real(sp))
+        inst = self._get_iu_point(oUnitIndex,iUnitIndex,self._member.Setpoint_Setting)
+        return await self.write_present_value(self.target_address,inst,Real(sp))
     
     async def get_setpoint_temperature(self, oUnitIndex, iUnitIndex):
         """室温設定値[C]を取得する
@@ -195,8 +249,8 @@ class VRFSystemCommunicator(DateTimeCommunicator.DateTimeCommunicator):
         Returns:
             list(bool,float): 読み取り成功の真偽,室温設定値[C]
         """
-        inst = 'analogInput:' + self._get_iu_objNum(oUnitIndex,iUnitIndex,self._member.Setpoint_Status.value)
-        return await self.read_present_value(self.target_ip,inst)
+        inst = self._get_iu_point(oUnitIndex,iUnitIndex,self._member.Setpoint_Status)
+        return await self.read_present_value(self.target_address,inst)
     
     async def get_return_air_temperature(self, oUnitIndex, iUnitIndex):
         """還空気の温度[C]を取得する
@@ -206,8 +260,8 @@ class VRFSystemCommunicator(DateTimeCommunicator.DateTimeCommunicator):
         Returns:
             list(bool,float): 読み取り成功の真偽,還空気の温度[C]
         """
-        inst = 'analogInput:' + self._get_iu_objNum(oUnitIndex,iUnitIndex,self._member.MeasuredRoomTemperature.value)
-        return await self.read_present_value(self.target_ip,inst)
+        inst = self._get_iu_point(oUnitIndex,iUnitIndex,self._member.MeasuredRoomTemperature)
+        return await self.read_present_value(self.target_address,inst)
     
     async def get_return_air_relative_humidity(self, oUnitIndex, iUnitIndex):
         """還空気の相対湿度[%]を取得する
@@ -217,8 +271,8 @@ class VRFSystemCommunicator(DateTimeCommunicator.DateTimeCommunicator):
         Returns:
             list(bool,float): 読み取り成功の真偽,相対湿度[%]
         """
-        inst = 'analogInput:' + self._get_iu_objNum(oUnitIndex,iUnitIndex,self._member.MeasuredRelativeHumidity.value)
-        return await self.read_present_value(self.target_ip,inst)
+        inst = self._get_iu_point(oUnitIndex,iUnitIndex,self._member.MeasuredRelativeHumidity)
+        return await self.read_present_value(self.target_address,inst)
 
 # endregion
 
@@ -233,8 +287,8 @@ class VRFSystemCommunicator(DateTimeCommunicator.DateTimeCommunicator):
         Returns:
             bool:命令が成功したか否か
         """        
-        inst = 'multiStateOutput:' + self._get_iu_objNum(oUnitIndex,iUnitIndex,self._member.FanSpeed_Setting.value)
-        return await self.write_present_value(self.target_ip,inst,Unsigned(speed.value))
+        inst = self._get_iu_point(oUnitIndex,iUnitIndex,self._member.FanSpeed_Setting)
+        return await self.write_present_value(self.target_address,inst,Unsigned(speed.value))
     
     async def get_fan_speed(self, oUnitIndex, iUnitIndex):
         """ファン風量を取得する
@@ -244,8 +298,8 @@ class VRFSystemCommunicator(DateTimeCommunicator.DateTimeCommunicator):
         Returns:
             list(bool,FanSpeed): 読み取り成功の真偽,ファン風量
         """        
-        inst = 'multiStateInput:' + self._get_iu_objNum(oUnitIndex,iUnitIndex,self._member.FanSpeed_Status.value)
-        val = await self.read_present_value(self.target_ip,inst)
+        inst = self._get_iu_point(oUnitIndex,iUnitIndex,self._member.FanSpeed_Status)
+        val = await self.read_present_value(self.target_address,inst)
 
         return val[0], self.FanSpeed.Low if val[1] == 1 else (self.FanSpeed.Middle if val[1] == 2 else self.FanSpeed.High)
 
@@ -262,8 +316,8 @@ class VRFSystemCommunicator(DateTimeCommunicator.DateTimeCommunicator):
         Returns:
             bool:命令が成功したか否か
         """        
-        inst = 'multiStateOutput:' + self._get_iu_objNum(oUnitIndex,iUnitIndex,self._member.AirflowDirection_Setting.value)
-        return await self.write_present_value(self.target_ip,inst,Unsigned(direction.value))
+        inst = self._get_iu_point(oUnitIndex,iUnitIndex,self._member.AirflowDirection_Setting)
+        return await self.write_present_value(self.target_address,inst,Unsigned(direction.value))
     
     async def get_direction(self, oUnitIndex, iUnitIndex):
         """風向を取得する
@@ -273,8 +327,8 @@ class VRFSystemCommunicator(DateTimeCommunicator.DateTimeCommunicator):
         Returns:
             list(bool,Direction): 読み取り成功の真偽,風向
         """        
-        inst = 'multiStateInput:' + self._get_iu_objNum(oUnitIndex,iUnitIndex,self._member.AirflowDirection_Status.value)
-        val = await self.read_present_value(self.target_ip,inst,Unsigned)
+        inst = self._get_iu_point(oUnitIndex,iUnitIndex,self._member.AirflowDirection_Status)
+        val = await self.read_present_value(self.target_address,inst)
 
         if(val[1] == 1):
             return val[0], self.Direction.Horizontal
@@ -299,8 +353,8 @@ class VRFSystemCommunicator(DateTimeCommunicator.DateTimeCommunicator):
         Returns:
             bool:命令が成功したか否か
         """        
-        inst = 'binaryValue:' + self._get_iu_objNum(oUnitIndex,iUnitIndex,self._member.RemoteControllerPermittion_Setpoint_Setting.value)
-        return await self.write_present_value(self.target_ip,inst,Enumerated(1))
+        inst = self._get_iu_point(oUnitIndex,iUnitIndex,self._member.RemoteControllerPermittion_Setpoint_Setting)
+        return await self.write_present_value(self.target_address,inst,Enumerated(1))
 
     async def prohibit_local_control(self, oUnitIndex, iUnitIndex):
         """手元リモコン操作を禁止する
@@ -310,8 +364,8 @@ class VRFSystemCommunicator(DateTimeCommunicator.DateTimeCommunicator):
         Returns:
             bool:命令が成功したか否か
         """        
-        inst = 'binaryValue:' + self._get_iu_objNum(oUnitIndex,iUnitIndex,self._member.RemoteControllerPermittion_Setpoint_Setting.value)
-        return await self.write_present_value(self.target_ip,inst,Enumerated(0))
+        inst = self._get_iu_point(oUnitIndex,iUnitIndex,self._member.RemoteControllerPermittion_Setpoint_Setting)
+        return await self.write_present_value(self.target_address,inst,Enumerated(0))
 
     async def is_local_control_permitted(self, oUnitIndex, iUnitIndex):
         """手元リモコン操作が許可されているか否か
@@ -321,8 +375,8 @@ class VRFSystemCommunicator(DateTimeCommunicator.DateTimeCommunicator):
         Returns:
             list(bool,bool): 読み取り成功の真偽,手元リモコン操作が許可されているか否か
         """
-        inst = 'binaryInput:' + self._get_iu_objNum(oUnitIndex,iUnitIndex,self._member.RemoteControllerPermittion_Setpoint_Status.value)
-        val = await self.read_present_value(self.target_ip,inst)
+        inst = self._get_iu_point(oUnitIndex,iUnitIndex,self._member.RemoteControllerPermittion_Setpoint_Status)
+        val = await self.read_present_value(self.target_address,inst)
         return val[0], (val[1] == 1)
 
 # endregion
@@ -336,8 +390,8 @@ class VRFSystemCommunicator(DateTimeCommunicator.DateTimeCommunicator):
         Returns:
             bool:命令が成功したか否か
         """        
-        inst = 'binaryValue:' + self._get_ou_objNum(oUnitIndex,self._member.ForcedRefrigerantTemperature_Setting.value)
-        return await self.write_present_value(self.target_ip,inst,Enumerated(1))
+        inst = self._get_ou_point(oUnitIndex,self._member.ForcedRefrigerantTemperature_Setting)
+        return await self.write_present_value(self.target_address,inst,Enumerated(1))
 
     async def disable_refrigerant_temperatureControl(self, oUnitIndex):
         """冷媒温度強制制御を無効にする
@@ -346,8 +400,8 @@ class VRFSystemCommunicator(DateTimeCommunicator.DateTimeCommunicator):
         Returns:
             bool:命令が成功したか否か
         """        
-        inst = 'binaryValue:' + self._get_ou_objNum(oUnitIndex,self._member.ForcedRefrigerantTemperature_Setting.value)
-        return await self.write_present_value(self.target_ip,inst,Enumerated(0))
+        inst = self._get_ou_point(oUnitIndex,self._member.ForcedRefrigerantTemperature_Setting)
+        return await self.write_present_value(self.target_address,inst,Enumerated(0))
 
     async def is_refrigerant_temperature_control_enabled(self, oUnitIndex):
         """冷媒温度強制制御が有効か否かを取得する
@@ -356,8 +410,8 @@ class VRFSystemCommunicator(DateTimeCommunicator.DateTimeCommunicator):
         Returns:
             list(bool,bool): 読み取り成功の真偽,冷媒温度強制制御が有効か否か
         """
-        inst = 'binaryInput:' + self._get_ou_objNum(oUnitIndex,self._member.ForcedRefrigerantTemperature_Status.value)
-        val = await self.read_present_value(self.target_ip,inst)
+        inst = self._get_ou_point(oUnitIndex,self._member.ForcedRefrigerantTemperature_Status)
+        val = await self.read_present_value(self.target_address,inst)
         return val[0], (val[1] == 1)
 
 # endregion
@@ -372,8 +426,8 @@ class VRFSystemCommunicator(DateTimeCommunicator.DateTimeCommunicator):
         Returns:
         bool:命令が成功したか否か
         """
-        inst = 'analogValue:' + self._get_ou_objNum(oUnitIndex,self._member.EvaporatingTemperatureSetpoint_Setting.value)
-        return await self.write_present_value(self.target_ip,inst,Real(evaporatingTemperature))
+        inst = self._get_ou_point(oUnitIndex,self._member.EvaporatingTemperatureSetpoint_Setting)
+        return await self.write_present_value(self.target_address,inst,Real(evaporatingTemperature))
     
     async def get_evaporating_temperature(self, oUnitIndex):
         """蒸発温度設定値[C]を取得する
@@ -382,8 +436,8 @@ class VRFSystemCommunicator(DateTimeCommunicator.DateTimeCommunicator):
         Returns:
             list(bool,float): 読み取り成功の真偽,蒸発温度設定値[C]
         """
-        inst = 'analogInput:' + self._get_ou_objNum(oUnitIndex,self._member.EvaporatingTemperatureSetpoint_Status.value)
-        return await self.read_present_value(self.target_ip,inst)
+        inst = self._get_ou_point(oUnitIndex,self._member.EvaporatingTemperatureSetpoint_Status)
+        return await self.read_present_value(self.target_address,inst)
     
     async def change_condensing_temperature(self, oUnitIndex, condensingTemperature):
         """凝縮温度設定値[C]を変える
@@ -393,8 +447,8 @@ class VRFSystemCommunicator(DateTimeCommunicator.DateTimeCommunicator):
         Returns:
             bool:命令が成功したか否か
             """
-        inst = 'analogValue:' + self._get_ou_objNum(oUnitIndex,self._member.CondensingTemperatureSetpoint_Setting.value)
-        return await self.write_present_value(self.target_ip,inst,Real(condensingTemperature))
+        inst = self._get_ou_point(oUnitIndex,self._member.CondensingTemperatureSetpoint_Setting)
+        return await self.write_present_value(self.target_address,inst,Real(condensingTemperature))
     
     async def get_condensing_temperature(self, oUnitIndex):
         """凝縮温度設定値[C]を取得する
@@ -403,8 +457,8 @@ class VRFSystemCommunicator(DateTimeCommunicator.DateTimeCommunicator):
         Returns:
             list(bool,float): 読み取り成功の真偽,凝縮温度設定値[C]
         """
-        inst = 'analogInput:' + self._get_ou_objNum(oUnitIndex,self._member.CondensingTemperatureSetpoint_Status.value)
-        return await self.read_present_value(self.target_ip,inst)
+        inst = self._get_ou_point(oUnitIndex,self._member.CondensingTemperatureSetpoint_Status)
+        return await self.read_present_value(self.target_address,inst)
 
 # endregion
 
@@ -418,8 +472,8 @@ class VRFSystemCommunicator(DateTimeCommunicator.DateTimeCommunicator):
         Returns:
             list(bool,float): 読み取り成功の真偽,室内機の熱負荷[kW]
         """
-        inst = 'analogInput:' + self._get_iu_objNum(oUnitIndex,iUnitIndex,self._member.HeatLoad.value)
-        return await self.read_present_value(self.target_ip,inst)
+        inst = self._get_iu_point(oUnitIndex,iUnitIndex,self._member.HeatLoad)
+        return await self.read_present_value(self.target_address,inst)
     
     async def get_outdoor_unit_heatload(self, oUnitIndex):
         """室外機の熱負荷[kW]を取得する
@@ -428,8 +482,8 @@ class VRFSystemCommunicator(DateTimeCommunicator.DateTimeCommunicator):
         Returns:
             list(bool,float): 読み取り成功の真偽,室外機の熱負荷[kW]
         """
-        inst = 'analogInput:' + self._get_ou_objNum(oUnitIndex,self._member.HeatLoad.value)
-        return await self.read_present_value(self.target_ip,inst)
+        inst = self._get_ou_point(oUnitIndex,self._member.HeatLoad)
+        return await self.read_present_value(self.target_address,inst)
 
 # endregion
 
@@ -443,8 +497,8 @@ class VRFSystemCommunicator(DateTimeCommunicator.DateTimeCommunicator):
         Returns:
             list(bool,float): 読み取り成功の真偽,室内機の消費電力[kW]
         """
-        inst = 'analogInput:' + self._get_iu_objNum(oUnitIndex,iUnitIndex,self._member.Electricity.value)
-        return await self.read_present_value(self.target_ip,inst)
+        inst = self._get_iu_point(oUnitIndex,iUnitIndex,self._member.Electricity)
+        return await self.read_present_value(self.target_address,inst)
     
     async def get_outdoor_unit_electricity(self, oUnitIndex):
         """室外機の消費電力[kW]を取得する
@@ -453,13 +507,43 @@ class VRFSystemCommunicator(DateTimeCommunicator.DateTimeCommunicator):
         Returns:
             list(bool,float): 読み取り成功の真偽,室外機の消費電力[kW]
         """
-        inst = 'analogInput:' + self._get_ou_objNum(oUnitIndex,self._member.Electricity.value)
-        return await self.read_present_value(self.target_ip,inst)
+        inst = self._get_ou_point(oUnitIndex,self._member.Electricity)
+        return await self.read_present_value(self.target_address,inst)
 
 # endregion
 
 # region 補助メソッド
 
+    # 設定のオブジェクトの種別と、それに対応する状態のオブジェクトの種別
+    _STATUS_OBJECT_TYPES = {
+        'binary-output': 'binaryInput',
+        'binary-value': 'binaryInput',
+        'multi-state-output': 'multiStateInput',
+        'analog-value': 'analogInput',
+    }
+
+    def _get_affected_objects(self, objid):
+        # 設定を書き込むと次の番号の状態のオブジェクトも変わる
+        objids = super()._get_affected_objects(objid)
+        status_type = self._STATUS_OBJECT_TYPES.get(str(objid[0]))
+        if status_type is not None:
+            objids.append(ObjectIdentifier((status_type, objid[1] + 1)))
+        return objids
+
+    def _get_iu_point(self,oUnitIndex,iUnitIndex,member):
+        point = self._iu_points.get((oUnitIndex,iUnitIndex,member))
+        return point if point is not None else self._make_iu_point(oUnitIndex,iUnitIndex,member)
+
+    def _get_ou_point(self,oUnitIndex,member):
+        point = self._ou_points.get((oUnitIndex,member))
+        return point if point is not None else self._make_ou_point(oUnitIndex,member)
+
+    def _make_iu_point(self,oUnitIndex,iUnitIndex,member):
+        return ObjectIdentifier((self._MEMBER_OBJECT_TYPES[member], int(self._get_iu_objNum(oUnitIndex,iUnitIndex,member.value))))
+
+    def _make_ou_point(self,oUnitIndex,member):
+        return ObjectIdentifier((self._MEMBER_OBJECT_TYPES[member], int(self._get_ou_objNum(oUnitIndex,member.value))))
+
     def _get_iu_objNum(self,oUnitIndex,iUnitIndex,mem_id):
         return str(1000 * oUnitIndex + 100 * iUnitIndex + mem_id)
     
@@ -481,6 +565,9 @@ async def main():
 
     # 熱負荷と電力
     await read_state(vrfCom)
+
+    # 還空気温度（全室内機を並行して読み取る）
+    await read_return_air_temperatures(vrfCom)
     
     # 無限ループで待機
     while True:
@@ -535,6 +622,16 @@ async def read_state(vrfCom):
         print('Electricity of vrf' + str(i + 1) + (' = ' + '{:.1f}kW'.format(val[1]) if val[0] else ' 通信失敗'))
 
 
+async def read_return_air_temperatures(vrfCom):
+    # 各系統の室内機の台数
+    i_unit_num = [5,4,5,4]
+
+    units = [(i + 1, j + 1) for i in range(len(i_unit_num)) for j in range(i_unit_num[i])]
+    vals = await asyncio.gather(*[vrfCom.get_return_air_temperature(o, i) for o, i in units])
+    for (o, i), val in zip(units, vals):
+        print('Return air temperature of vrf' + str(o) + '-' + str(i) + (' = ' + '{:.1f}C'.format(val[1]) if val[0] else ' 通信失敗'))
+
+
 if __name__ == "__main__":
     asyncio.run(main())
 
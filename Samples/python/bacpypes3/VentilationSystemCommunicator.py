@@ -2,13 +2,17 @@ import time
 import asyncio
 
 from enum import Enum
-from bacpypes3.primitivedata import Enumerated, Unsigned
+from types import MappingProxyType
+from bacpypes3.pdu import Address
+from bacpypes3.primitivedata import Enumerated, Unsigned, ObjectIdentifier
 
-import sys,os
-sys.path.append(os.path.dirname(__file__))
-import DateTimeCommunicator
+if __package__:
+    from .DateTimeCommunicator import DateTimeCommunicator
+else:
+    # スクリプトとして直接読み込まれた場合
+    from DateTimeCommunicator import DateTimeCommunicator
 
-class VentilationSystemCommunicator(DateTimeCommunicator.DateTimeCommunicator):
+class VentilationSystemCommunicator(DateTimeCommunicator):
 
 # region 定数宣言
 
@@ -42,9 +46,32 @@ class VentilationSystemCommunicator(DateTimeCommunicator.DateTimeCommunicator):
 
 # endregion
 
+# region オブジェクトの種別
+
+    _MEMBER_OBJECT_TYPES = {
+        _member.SouthCO2Level: 'analogInput',
+        _member.NorthCO2Level: 'analogInput',
+        _member.HexOnOff: 'binaryOutput',
+        _member.HexBypassEnabled: 'binaryOutput',
+        _member.HexFanSpeed: 'multiStateOutput',
+    }
+
+    # テナント単位のオブジェクト
+    _TENANT_MEMBERS = (_member.SouthCO2Level, _member.NorthCO2Level)
+
+    # 事前にオブジェクトIDを用意する室外機・室内機の台数
+    MAX_OUTDOOR_UNIT_NUMBER = 4
+    MAX_INDOOR_UNIT_NUMBER = 5
+
+    # 事前に解析したオブジェクトID（全インスタンスで共有し、最初のインスタンスの作成時に用意する）
+    _points = None
+    _iu_points = None
+
+# endregion
+
 # region コンストラクタ
 
-    def __init__(self, id, name='vntComm', device_ip='127.0.0.1', emulator_ip='127.0.0.1', time_out_sec=1.0):
+    def __init__(self, id, name='vntComm', device_ip='127.0.0.1', emulator_ip='127.0.0.1', time_out_sec=1.0, hub=None):
         """インスタンスを初期化する
 
         Args:
@@ -52,10 +79,24 @@ class VentilationSystemCommunicator(DateTimeCommunicator.DateTimeCommunicator):
             name (str): 通信用のDeviceの名前
             device_ip (str): 通信に使うDeviceのIP Address（xxx.xxx.xxx.xxx）
             emulator_ip (str): エミュレータのIP Address（xxx.xxx.xxx.xxx）
+            hub (BACnetHub): 共有するBACnet通信の窓口。Noneの場合には専用のものを用意する
         """
-        super().__init__(id, name, device_ip, emulator_ip, time_out_sec)
+        super().__init__(id, name, device_ip, emulator_ip, time_out_sec, hub)
         self.target_ip = emulator_ip + ':' + str(self.VENTCTRL_EXCLUSIVE_PORT)
 
+        # 通信先のアドレスとオブジェクトIDは事前に解析しておく（オブジェクトIDは全インスタンスで共有する）
+        self.target_address = Address(self.target_ip)
+        if VentilationSystemCommunicator._points is None:
+            VentilationSystemCommunicator._points = MappingProxyType({
+                mem: ObjectIdentifier((self._MEMBER_OBJECT_TYPES[mem], mem.value)) for mem in self._TENANT_MEMBERS
+            })
+            VentilationSystemCommunicator._iu_points = MappingProxyType({
+                (o, i, mem): self._make_iu_point(o, i, mem)
+                for o in range(1, self.MAX_OUTDOOR_UNIT_NUMBER + 1)
+                for i in range(1, self.MAX_INDOOR_UNIT_NUMBER + 1)
+                for mem in self._member if mem not in self._TENANT_MEMBERS
+            })
+
 # endregion
 
 # region テナント別の処理
@@ -65,8 +106,8 @@ class VentilationSystemCommunicator(DateTimeCommunicator.DateTimeCommunicator):
         Returns:
             list: 読み取り成功の真偽,南側テナントのCO2濃度[ppm]
         """        
-        inst = 'analogInput:' + str(self._member.SouthCO2Level.value)
-        return await self.read_present_value(self.target_ip,inst)
+        inst = self._points[self._member.SouthCO2Level]
+        return await self.read_present_value(self.target_address,inst)
     
 
     async def get_north_tenant_CO2_level(self):
@@ -74,8 +115,8 @@ class VentilationSystemCommunicator(DateTimeCommunicator.DateTimeCommunicator):
         Returns:
             list: 読み取り成功の真偽,北側テナントのCO2濃度[ppm]
         """        
-        inst = 'analogInput:' + str(self._member.NorthCO2Level.value)
-        return await self.read_present_value(self.target_ip,inst)
+        inst = self._points[self._member.NorthCO2Level]
+        return await self.read_present_value(self.target_address,inst)
 
 # endregion    
 
@@ -89,8 +130,8 @@ class VentilationSystemCommunicator(DateTimeCommunicator.DateTimeCommunicator):
         Returns:
             bool:命令が成功したか否か
         """        
-        inst = 'binaryOutput:' + self._get_instance_number(oUnitIndex,iUnitIndex,self._member.HexOnOff.value)
-        return await self.write_present_value(self.target_ip,inst,Enumerated(1))
+        inst = self._get_iu_point(oUnitIndex,iUnitIndex,self._member.HexOnOff)
+        return await self.write_present_value(self.target_address,inst,Enumerated(1))
     
 
     async def stop_ventilation(self, oUnitIndex, iUnitIndex):
@@ -101,8 +142,8 @@ class VentilationSystemCommunicator(DateTimeCommunicator.DateTimeCommunicator):
         Returns:
             bool:命令が成功したか否か
         """        
-        inst = 'binaryOutput:' + self._get_instance_number(oUnitIndex,iUnitIndex,self._member.HexOnOff.value)
-        return await self.write_present_value(self.target_ip,inst,Enumerated(0))
+        inst = self._get_iu_point(oUnitIndex,iUnitIndex,self._member.HexOnOff)
+        return await self.write_present_value(self.target_address,inst,Enumerated(0))
     
 
     async def enable_bypass_control(self, oUnitIndex, iUnitIndex):
@@ -113,8 +154,8 @@ class VentilationSystemCommunicator(DateTimeCommunicator.DateTimeCommunicator):
         Returns:
             bool:命令が成功したか否か
         """        
-        inst = 'binaryOutput:' + self._get_instance_number(oUnitIndex,iUnitIndex,self._member.HexBypassEnabled.value)
-        return await self.write_present_value(self.target_ip,inst,Enumerated(1))
+        inst = self._get_iu_point(oUnitIndex,iUnitIndex,self._member.HexBypassEnabled)
+        return await self.write_present_value(self.target_address,inst,Enumerated(1))
     
 
     async def disable_bypass_control(self, oUnitIndex, iUnitIndex):
@@ -125,8 +166,8 @@ class VentilationSystemCommunicator(DateTimeCommunicator.DateTimeCommunicator):
         Returns:
             bool:命令が成功したか否か
         """        
-        inst = 'binaryOutput:' + self._get_instance_number(oUnitIndex,iUnitIndex,self._member.HexBypassEnabled.value)
-        return await self.write_present_value(self.target_ip,inst,Enumerated(0))
+        inst = self._get_iu_point(oUnitIndex,iUnitIndex,self._member.HexBypassEnabled)
+        return await self.write_present_value(self.target_address,inst,Enumerated(0))
 
 
     async def change_fan_speed(self, oUnitIndex, iUnitIndex, speed):
@@ -138,8 +179,8 @@ class VentilationSystemCommunicator(DateTimeCommunicator.DateTimeCommunicator):
         Returns:
             bool:命令が成功したか否か
         """        
-        inst = 'multiStateOutput:' + self._get_instance_number(oUnitIndex,iUnitIndex,self._member.HexFanSpeed.value)
-        return await self.write_present_value(self.target_ip,inst,Unsigned(speed.value))
+        inst = self._get_iu_point(oUnitIndex,iUnitIndex,self._member.HexFanSpeed)
+        return await self.write_present_value(self.target_address,inst,Unsigned(speed.value))
     
 
     async def get_fan_speed(self, oUnitIndex, iUnitIndex):
@@ -150,8 +191,8 @@ class VentilationSystemCommunicator(DateTimeCommunicator.DateTimeCommunicator):
         Returns:
             list(bool,FanSpeed): 読み取り成功の真偽,ファン風量
         """        
-        inst = 'multiStateOutput:' + self._get_instance_number(oUnitIndex,iUnitIndex,self._member.HexFanSpeed.value)
-        val = await self.read_present_value(self.target_ip,inst)
+        inst = self._get_iu_point(oUnitIndex,iUnitIndex,self._member.HexFanSpeed)
+        val = await self.read_present_value(self.target_address,inst)
 
         return val[0], self.FanSpeed.Low if val[1] == 1 else (self.FanSpeed.Middle if val[1] == 2 else self.FanSpeed.High)
 
@@ -159,6 +200,13 @@ class VentilationSystemCommunicator(DateTimeCommunicator.DateTimeCommunicator):
 
 # region 補助メソッド
 
+    def _get_iu_point(self,oUnitIndex,iUnitIndex,member):
+        point = self._iu_points.get((oUnitIndex,iUnitIndex,member))
+        return point if point is not None else self._make_iu_point(oUnitIndex,iUnitIndex,member)
+
+    def _make_iu_point(self,oUnitIndex,iUnitIndex,member):
+        return ObjectIdentifier((self._MEMBER_OBJECT_TYPES[member], int(self._get_instance_number(oUnitIndex,iUnitIndex,member.value))))
+
     def _get_instance_number(self,oUnitIndex,iUnitIndex,mem_id):
         return str(1000 * oUnitIndex + 100 * iUnitIndex + mem_id)
 
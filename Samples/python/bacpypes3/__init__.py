@@ -1,6 +1,47 @@
-from .PresentValueReadWriter import PresentValueReadWriter
-from .DateTimeCommunicator import DateTimeCommunicator
-from .VRFSystemCommunicator import VRFSystemCommunicator
-from .EnvironmentCommunicator import EnvironmentCommunicator
-from .OccupantCommunicator import OccupantCommunicator
-from .VentilationSystemCommunicator import VentilationSystemCommunicator
\ No newline at end of file
+import importlib
+import sys
+
+# 公開するクラスと、それを定義するモジュール
+# モジュールは最初に参照された際に読み込む（パッケージの読み込みを速くするため）
+_EXPORTS = {
+    'BACnetHub': 'BACnetHub',
+    'RequestStatistics': 'RequestStatistics',
+    'PresentValueReadWriter': 'PresentValueReadWriter',
+    'RetryPolicy': 'PresentValueReadWriter',
+    'COVSubscriptionManager': 'COVSubscriptionManager',
+    'SubscriptionHealth': 'COVSubscriptionManager',
+    'DateTimeCommunicator': 'DateTimeCommunicator',
+    'SimulationClock': 'SimulationClock',
+    'ClockSnapshot': 'SimulationClock',
+    'ControllerSupervisor': 'ControllerSupervisor',
+    'VRFSystemCommunicator': 'VRFSystemCommunicator',
+    'EnvironmentCommunicator': 'EnvironmentCommunicator',
+    'OccupantCommunicator': 'OccupantCommunicator',
+    'VentilationSystemCommunicator': 'VentilationSystemCommunicator',
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name:str):
+    """公開するクラスを最初に参照された際に読み込む
+
+    Args:
+        name (str): クラス名
+
+    Returns:
+        type: クラス
+    """
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError('module ' + repr(__name__) + ' has no attribute ' + repr(name))
+    importlib.import_module('.' + module_name, __name__)
+
+    # サブモジュールの読み込みでパッケージの属性がモジュールに置き換わるため、読み込み済みのクラスで上書きする
+    for export_name, export_module in _EXPORTS.items():
+        module = sys.modules.get(__name__ + '.' + export_module)
+        if module is not None and hasattr(module, export_name):
+            globals()[export_name] = getattr(module, export_name)
+    return globals()[name]
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))